@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+""" Compare two sets of benchmark results and report regressions.
+
+    Usage:
+
+        python benchmarks/compare.py baseline.json current.json
+                                     [--threshold 1.2]
+                                     [--memory-threshold 1.2]
+                                     [--min-seconds 0.001]
+
+    Works on the JSON written by parse_benchmark.py and dav_benchmark.py.
+    Results are matched on their name. A result has regressed if its best
+    time is more than threshold times the baseline's (and longer by at
+    least min-seconds, so timer noise on tiny measurements is ignored), or
+    if its peak memory is more than memory-threshold times the baseline's.
+    The exit status is 1 if anything has regressed, so this can fail a
+    build.
+
+    The benchmarks write their results with write_results, so they all
+    share this format.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+
+DEFAULT_THRESHOLD = 1.2
+DEFAULT_MEMORY_THRESHOLD = 1.2
+DEFAULT_MIN_SECONDS = 0.001
+
+
+def git_commit():
+    """ Return the commit being benchmarked, or None outside a checkout
+    """
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=open(os.devnull, 'w')).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(path, results, **meta):
+    """ Write a list of results to a JSON file, along with the commit,
+        date, Python version and platform they were taken on and any other
+        meta data given. Each result is a dict with at least a name, unique
+        within the run, and the best time taken in seconds.
+    """
+    meta.update(commit=git_commit(),
+                date=datetime.datetime.utcnow().isoformat(),
+                python=platform.python_version(),
+                platform=platform.platform())
+    results_fd = open(path, 'w')
+    try:
+        json.dump({'meta': meta, 'results': results}, results_fd, indent=2,
+                  sort_keys=True)
+    finally:
+        results_fd.close()
+
+
+def load_results(path):
+    """ Return the results in a JSON file, keyed on name
+    """
+    results_fd = open(path)
+    try:
+        report = json.load(results_fd)
+    finally:
+        results_fd.close()
+    return dict((entry['name'], entry) for entry in report['results'])
+
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD,
+                    memory_threshold=DEFAULT_MEMORY_THRESHOLD,
+                    min_seconds=DEFAULT_MIN_SECONDS):
+    """ Compare two sets of results, as returned by load_results.
+
+        Returns a list of (name, measure, baseline value, current value,
+        ratio, regressed) tuples, one for each time and peak memory found
+        in both, with measure 'seconds' or 'peak_kb'. Results that failed
+        in either set are left out.
+    """
+    rows = []
+    for name in sorted(set(baseline) & set(current)):
+        old, new = baseline[name], current[name]
+        if old.get('error') or new.get('error'):
+            continue
+        if old.get('seconds') and new.get('seconds') is not None:
+            ratio = new['seconds'] / old['seconds']
+            regressed = (ratio > threshold and
+                         new['seconds'] - old['seconds'] >= min_seconds)
+            rows.append((name, 'seconds', old['seconds'], new['seconds'],
+                         ratio, regressed))
+        if old.get('peak_kb') and new.get('peak_kb') is not None:
+            ratio = float(new['peak_kb']) / old['peak_kb']
+            rows.append((name, 'peak_kb', old['peak_kb'], new['peak_kb'],
+                         ratio, ratio > memory_threshold))
+    return rows
+
+
+def format_comparison(rows):
+    """ Return the rows from compare_results as a table of text
+    """
+    lines = ['%-40s %-8s %12s %12s %8s' % ('benchmark', 'measure',
+                                            'baseline', 'current', 'ratio')]
+    for name, measure, old, new, ratio, regressed in rows:
+        lines.append('%-40s %-8s %12.4f %12.4f %7.2fx%s' % (
+            name, measure, old, new, ratio,
+            '  REGRESSED' if regressed else ''))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    arg_parser.add_argument('baseline')
+    arg_parser.add_argument('current')
+    arg_parser.add_argument('--threshold', type=float,
+                            default=DEFAULT_THRESHOLD)
+    arg_parser.add_argument('--memory-threshold', type=float,
+                            default=DEFAULT_MEMORY_THRESHOLD)
+    arg_parser.add_argument('--min-seconds', type=float,
+                            default=DEFAULT_MIN_SECONDS)
+    args = arg_parser.parse_args(argv)
+
+    rows = compare_results(load_results(args.baseline),
+                           load_results(args.current),
+                           threshold=args.threshold,
+                           memory_threshold=args.memory_threshold,
+                           min_seconds=args.min_seconds)
+    print format_comparison(rows)
+    return 1 if any(row[-1] for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+""" Generate PROPFIND multistatus documents for benchmarking the parsers.
+
+    Usage:
+
+        python benchmarks/corpus.py --directory corpus
+                                    [--entries 1000,100000,1000000]
+                                    [--kinds flat,locks,vendor,dead]
+
+    Each kind of document is written to <directory>/<kind>-<entries>.xml.
+    The kinds are:
+
+        * flat - A plain listing, as Apache mod_dav sends it, with a
+          collection every 50 entries
+        * locks - Every resource advertises many lockentries and holds an
+          active lock
+        * vendor - Properties from the namespaces of other servers
+          (Microsoft, ownCloud, Nextcloud, SabreDAV), declared on each
+          response with a different prefix for DAV:
+        * dead - Dead properties with text and XML values, and a 404
+          propstat for properties the server doesn't have
+
+    The documents are the same every time they are generated, so timings
+    taken from them can be compared across commits. They are written a
+    response at a time, so the 1000000 entry listings (around a gigabyte)
+    never have to be held in memory to be made.
+"""
+import argparse
+import os
+
+KINDS = ['flat', 'locks', 'vendor', 'dead']
+
+HEADER = ('<?xml version="1.0" encoding="utf-8"?>\n'
+          '<D:multistatus xmlns:D="DAV:">\n')
+FOOTER = '</D:multistatus>\n'
+
+# A collection is listed every this many entries
+COLLECTION_EVERY = 50
+
+LOCKENTRY = ('<D:lockentry><D:lockscope><D:%s/></D:lockscope>'
+             '<D:locktype><D:write/></D:locktype></D:lockentry>\n')
+
+FLAT_TEMPLATE = '''<D:response xmlns:lp1="DAV:" xmlns:lp2="http://apache.org/dav/props/">
+<D:href>/webdav/%(name)s</D:href>
+<D:propstat>
+<D:prop>
+<lp1:resourcetype>%(resourcetype)s</lp1:resourcetype>
+<lp1:creationdate>2009-09-02T20:31:52Z</lp1:creationdate>
+<lp1:getcontentlength>%(number)d</lp1:getcontentlength>
+<lp1:getlastmodified>Wed, 02 Sep 2009 20:31:52 GMT</lp1:getlastmodified>
+<lp1:getetag>"%(number)x-7-4729e2837fe00"</lp1:getetag>
+<lp2:executable>F</lp2:executable>
+<D:supportedlock>
+%(lockentries)s</D:supportedlock>
+<D:lockdiscovery>%(lockdiscovery)s</D:lockdiscovery>
+<D:getcontenttype>text/plain</D:getcontenttype>
+</D:prop>
+<D:status>HTTP/1.1 200 OK</D:status>
+</D:propstat>
+</D:response>
+'''
+
+ACTIVELOCK = '''
+<D:activelock><D:locktype><D:write/></D:locktype>
+<D:lockscope><D:exclusive/></D:lockscope><D:depth>0</D:depth>
+<D:owner><D:href>mailto:user%(number)d@example.com</D:href></D:owner>
+<D:timeout>Second-3600</D:timeout>
+<D:locktoken><D:href>opaquelocktoken:%(number)08x-0000-0000-0000-000000000000</D:href></D:locktoken>
+</D:activelock>
+'''
+
+VENDOR_TEMPLATE = '''<d:response xmlns:d="DAV:" xmlns:oc="http://owncloud.org/ns" xmlns:nc="http://nextcloud.org/ns" xmlns:s="http://sabredav.org/ns" xmlns:ms="urn:schemas-microsoft-com:">
+<d:href>/remote.php/dav/files/user/%(name)s</d:href>
+<d:propstat>
+<d:prop>
+<d:getlastmodified>Wed, 02 Sep 2009 20:31:52 GMT</d:getlastmodified>
+<d:getcontentlength>%(number)d</d:getcontentlength>
+<d:resourcetype>%(resourcetype)s</d:resourcetype>
+<d:getetag>&quot;%(number)032x&quot;</d:getetag>
+<d:getcontenttype>text/plain</d:getcontenttype>
+<oc:id>%(number)08docinstanceid</oc:id>
+<oc:fileid>%(number)d</oc:fileid>
+<oc:permissions>RGDNVW</oc:permissions>
+<oc:size>%(number)d</oc:size>
+<oc:owner-display-name>User %(number)d</oc:owner-display-name>
+<oc:share-types/>
+<nc:has-preview>false</nc:has-preview>
+<nc:mount-type/>
+<s:sync-token>%(number)d</s:sync-token>
+<ms:Win32FileAttributes>00000020</ms:Win32FileAttributes>
+<ms:Win32CreationTime>Wed, 02 Sep 2009 20:31:52 GMT</ms:Win32CreationTime>
+</d:prop>
+<d:status>HTTP/1.1 200 OK</d:status>
+</d:propstat>
+</d:response>
+'''
+
+DEAD_TEMPLATE = '''<D:response xmlns:Z="urn:example:dead-properties">
+<D:href>/webdav/%(name)s</D:href>
+<D:propstat>
+<D:prop>
+<D:resourcetype>%(resourcetype)s</D:resourcetype>
+<D:getcontentlength>%(number)d</D:getcontentlength>
+<D:getetag>"%(number)x"</D:getetag>
+%(dead)s</D:prop>
+<D:status>HTTP/1.1 200 OK</D:status>
+</D:propstat>
+<D:propstat>
+<D:prop><D:getcontentlanguage/><Z:missing/></D:prop>
+<D:status>HTTP/1.1 404 Not Found</D:status>
+</D:propstat>
+</D:response>
+'''
+
+DEAD_PROPERTY = ('<Z:property%(index)d>Value %(index)d of entry %(number)d '
+                 '&amp; some &lt;escaped&gt; text</Z:property%(index)d>\n')
+
+DEAD_XML_PROPERTY = ('<Z:tags><Z:tag level="%(index)d">alpha</Z:tag>'
+                     '<Z:tag>beta</Z:tag><Z:author><Z:name>User %(number)d'
+                     '</Z:name></Z:author></Z:tags>\n')
+
+
+def _entry_fields(number):
+    """ The name and resourcetype of an entry
+    """
+    if number % COLLECTION_EVERY == 0:
+        return 'dir%07d/' % number, '<D:collection/>'
+    return 'file%07d.txt' % number, ''
+
+
+def _response(kind, number, lockentries=16, dead_properties=10):
+    name, resourcetype = _entry_fields(number)
+    fields = {'name': name, 'number': number, 'resourcetype': resourcetype}
+    if kind == 'flat':
+        fields['lockentries'] = (LOCKENTRY % 'exclusive' +
+                                 LOCKENTRY % 'shared')
+        fields['lockdiscovery'] = ''
+        return FLAT_TEMPLATE % fields
+    if kind == 'locks':
+        fields['lockentries'] = ''.join(
+            LOCKENTRY % ('exclusive', 'shared')[index % 2]
+            for index in range(lockentries))
+        fields['lockdiscovery'] = ACTIVELOCK % fields
+        return FLAT_TEMPLATE % fields
+    if kind == 'vendor':
+        fields['resourcetype'] = resourcetype.replace('D:', 'd:')
+        return VENDOR_TEMPLATE % fields
+    if kind == 'dead':
+        dead = [DEAD_PROPERTY % {'index': index, 'number': number}
+                for index in range(dead_properties)]
+        dead.append(DEAD_XML_PROPERTY % {'index': 0, 'number': number})
+        fields['dead'] = ''.join(dead)
+        return DEAD_TEMPLATE % fields
+    raise ValueError('Unknown kind of corpus: %s' % kind)
+
+
+def iter_corpus(kind, entries, **options):
+    """ Yield a multistatus document of a kind listing a number of entries
+        a piece at a time
+
+        :param kind: One of KINDS
+        :type kind: String
+
+        :param entries: Number of responses in the document
+        :type entries: int
+
+        The locks kind takes a lockentries option, the number of
+        lockentries per resource (16), and the dead kind a dead_properties
+        option, the number of text dead properties per resource (10).
+    """
+    yield HEADER
+    for number in xrange(entries):
+        yield _response(kind, number, **options)
+    yield FOOTER
+
+
+def make_corpus(kind, entries, **options):
+    """ Return a multistatus document of a kind listing a number of
+        entries. See iter_corpus.
+    """
+    return ''.join(iter_corpus(kind, entries, **options))
+
+
+def corpus_path(directory, kind, entries):
+    return os.path.join(directory, '%s-%d.xml' % (kind, entries))
+
+
+def write_corpus(directory, kind, entries, **options):
+    """ Write a document to the corpus directory, unless it is already
+        there, and return its path
+    """
+    path = corpus_path(directory, kind, entries)
+    if os.path.exists(path):
+        return path
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    # Written under another name first, so an interrupted run doesn't
+    # leave a truncated document to be picked up by the next one
+    temp_path = path + '.tmp'
+    corpus_fd = open(temp_path, 'wb')
+    try:
+        for data in iter_corpus(kind, entries, **options):
+            corpus_fd.write(data)
+    finally:
+        corpus_fd.close()
+    os.rename(temp_path, path)
+    return path
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    arg_parser.add_argument('--directory', default='corpus',
+                            help='Directory to write the documents to')
+    arg_parser.add_argument('--entries', default='1000,100000,1000000',
+                            help='Comma separated listing sizes')
+    arg_parser.add_argument('--kinds', default=','.join(KINDS),
+                            help='Comma separated kinds of document')
+    args = arg_parser.parse_args(argv)
+
+    for kind in args.kinds.split(','):
+        for entries in [int(size) for size in args.entries.split(',')]:
+            path = write_corpus(args.directory, kind, entries)
+            print '%s %d bytes' % (path, os.path.getsize(path))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+""" End-to-end benchmarks against a WebDAV server running in this process.
+
+    Usage:
+
+        python benchmarks/dav_benchmark.py [--ls-sizes 10,100,1000]
+                                           [--parse-sizes 10,100,1000]
+                                           [--file-sizes 1024,1048576]
+                                           [--locks 200] [--repeat 3]
+                                           [--only ls,transfer,lock,parse]
+                                           [--output results.json]
+
+    The server is the one the tests use (tests/dav_server.py), serving a
+    temporary directory on localhost, so the numbers measure the client
+    and a real HTTP exchange without any network in between. It measures:
+
+        * ls - Client.ls and Client.iter_ls on collections of each size,
+          split into time on the wire and time parsing
+        * get / put - Throughput of whole-file GETs and PUTs of each size
+        * lock - Latency of a LOCK followed by an UNLOCK
+        * parse - Each parser on the server's PROPFIND reply for
+          collections of each size
+
+    The best of the repeats is reported. With --output the results are
+    also written as JSON, for comparing one commit with another (see
+    compare.py).
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+sys.path.insert(0, os.path.join(HERE, '..', 'tests'))
+
+import python_webdav.client
+import python_webdav.connection
+import python_webdav.instrument as instrument
+import python_webdav.parse
+from dav_server import DavServer
+from compare import write_results
+from parse_benchmark import find_parsers
+
+BENCHMARKS = ['ls', 'transfer', 'lock', 'parse']
+
+DEFAULT_LS_SIZES = '10,100,1000,10000,100000'
+# SoupParser takes about a minute a go on 100000 entries, so the parsers
+# stop short of the largest listing unless asked
+DEFAULT_PARSE_SIZES = '10,100,1000,10000'
+DEFAULT_FILE_SIZES = '1024,65536,1048576,16777216'
+
+
+def best_of(repeat, func, *args):
+    """ Run func repeat times and return the shortest time it took, in
+        seconds, and the list of all of the times
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.time()
+        func(*args)
+        times.append(time.time() - start)
+    return min(times), times
+
+
+def result(name, group, params, best, times, **extra):
+    """ Build one entry of the results. name is unique within a run, so
+        results from two runs can be matched up on it.
+    """
+    entry = {'name': name, 'group': group, 'params': params,
+             'seconds': best, 'mean': sum(times) / len(times),
+             'runs': times}
+    entry.update(extra)
+    return entry
+
+
+class Benchmark(object):
+    """ Runs the benchmarks against a DavServer serving a temporary
+        directory
+
+        :param repeat: Number of times each measurement is taken
+        :type repeat: int
+    """
+    def __init__(self, repeat=3):
+        self.repeat = repeat
+        self.root = tempfile.mkdtemp(prefix='dav-benchmark-')
+        self.server = DavServer(self.root).start()
+        self.collector = instrument.Collector()
+        self.client = python_webdav.client.Client(
+            self.server.url, webdav_path='/', port=0,
+            connection_settings={'hooks': [self.collector]})
+        self.client.set_connection()
+        self.connection = self.client.connection
+        self.results = []
+
+    def close(self):
+        self.server.stop()
+        shutil.rmtree(self.root)
+
+    def _add(self, entry):
+        self.results.append(entry)
+        extra = ''
+        if 'mb_per_second' in entry:
+            extra = '%10.1f MB/s' % entry['mb_per_second']
+        elif 'entries_per_second' in entry:
+            extra = '%10d entries/s' % entry['entries_per_second']
+        print '%-32s %10.4f %10.4f %s' % (entry['name'], entry['seconds'],
+                                          entry['mean'], extra)
+        sys.stdout.flush()
+
+    def _make_collection(self, entries):
+        """ Create a collection of entries empty files on the server and
+            return its path
+        """
+        name = 'ls%d' % entries
+        directory = os.path.join(self.root, name)
+        os.mkdir(directory)
+        for number in range(entries):
+            open(os.path.join(directory, 'file%06d.txt' % number),
+                 'w').close()
+        return '/%s/' % name
+
+    def _split(self, method):
+        """ Mean seconds per call on the wire and parsing since the
+            collector was last reset
+        """
+        summary = self.collector.summary()
+        request = summary.get((instrument.REQUEST, method))
+        parse = summary.get((instrument.PARSE, method))
+        return (request and request['mean'], parse and parse['mean'])
+
+    def run_ls(self, sizes):
+        for entries in sizes:
+            path = self._make_collection(entries)
+            for name, func in (
+                    ('ls', lambda: self.client.ls(path, display=False)),
+                    ('iter_ls', lambda: list(self.client.iter_ls(path)))):
+                self.collector.reset()
+                best, times = best_of(self.repeat, func)
+                wire, parse = self._split('PROPFIND')
+                self._add(result('%s[%d]' % (name, entries), 'ls',
+                                 {'entries': entries, 'call': name},
+                                 best, times, wire_mean=wire,
+                                 parse_mean=parse,
+                                 entries_per_second=entries / best))
+            shutil.rmtree(os.path.join(self.root, path.strip('/')))
+
+    def run_transfer(self, sizes):
+        for size in sizes:
+            data = os.urandom(size)
+            path = '/transfer%d.bin' % size
+            best, times = best_of(self.repeat, self.connection.send_put,
+                                  path, data)
+            self._add(result('put[%d]' % size, 'transfer',
+                             {'bytes': size, 'method': 'PUT'}, best, times,
+                             mb_per_second=size / best / 1024 / 1024))
+            best, times = best_of(self.repeat, self.connection.send_get,
+                                  path)
+            self._add(result('get[%d]' % size, 'transfer',
+                             {'bytes': size, 'method': 'GET'}, best, times,
+                             mb_per_second=size / best / 1024 / 1024))
+            os.remove(os.path.join(self.root, path.lstrip('/')))
+
+    def run_lock(self, count):
+        self.connection.send_put('/locked.txt', 'locked')
+
+        def lock_unlock():
+            for _ in range(count):
+                resp, content, lock_token = self.connection.send_lock(
+                    '/locked.txt')
+                self.connection.send_unlock('/locked.txt', lock_token)
+
+        best, times = best_of(self.repeat, lock_unlock)
+        self._add(result('lock_unlock[%d]' % count, 'lock',
+                         {'count': count}, best, times,
+                         latency=best / count))
+
+    def run_parse(self, sizes, parser_names):
+        for entries in sizes:
+            path = self._make_collection(entries)
+            resp, data = self.connection.send_propfind(path)
+            for name in parser_names:
+                parser_class = getattr(python_webdav.parse, name)
+                best, times = best_of(
+                    self.repeat, lambda: parser_class().parse(data))
+                self._add(result('parse[%s,%d]' % (name, entries), 'parse',
+                                 {'entries': entries, 'parser': name,
+                                  'bytes': len(data)}, best, times,
+                                 entries_per_second=entries / best))
+            shutil.rmtree(os.path.join(self.root, path.strip('/')))
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    arg_parser.add_argument('--ls-sizes', default=DEFAULT_LS_SIZES,
+                            help='Comma separated collection sizes')
+    arg_parser.add_argument('--parse-sizes', default=DEFAULT_PARSE_SIZES,
+                            help='Comma separated listing sizes to parse')
+    arg_parser.add_argument('--file-sizes', default=DEFAULT_FILE_SIZES,
+                            help='Comma separated file sizes in bytes')
+    arg_parser.add_argument('--locks', type=int, default=200,
+                            help='LOCK/UNLOCK pairs per measurement')
+    arg_parser.add_argument('--parsers', default=','.join(find_parsers()),
+                            help='Comma separated parser class names')
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    arg_parser.add_argument('--only', default=','.join(BENCHMARKS),
+                            help='Comma separated benchmarks to run')
+    arg_parser.add_argument('--output', help='File to write JSON results to')
+    args = arg_parser.parse_args(argv)
+
+    def sizes(value):
+        return [int(size) for size in value.split(',') if size]
+
+    only = args.only.split(',')
+    benchmark = Benchmark(repeat=args.repeat)
+    print '%-32s %10s %10s' % ('benchmark', 'best', 'mean')
+    try:
+        if 'ls' in only:
+            benchmark.run_ls(sizes(args.ls_sizes))
+        if 'transfer' in only:
+            benchmark.run_transfer(sizes(args.file_sizes))
+        if 'lock' in only:
+            benchmark.run_lock(args.locks)
+        if 'parse' in only:
+            benchmark.run_parse(sizes(args.parse_sizes),
+                                args.parsers.split(','))
+    finally:
+        benchmark.close()
+
+    if args.output:
+        write_results(args.output, benchmark.results, repeat=args.repeat)
+    return benchmark.results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+""" Compare the speed and memory use of the multistatus parsers.
+
+    Usage:
+
+        python benchmarks/parse_benchmark.py [--entries 1000,10000]
+                                             [--kinds flat,locks,...]
+                                             [--repeat 3] [--parsers ...]
+                                             [--corpus-dir corpus]
+                                             [--in-process]
+                                             [--output results.json]
+                                             [--compare baseline.json]
+
+    A document of each kind in corpus.py is generated for each number of
+    entries, then parsed by each parser. By default every class in
+    python_webdav.parse whose name ends in Parser is benchmarked, so new
+    parsers are picked up without any change here.
+
+    Each parser is run in a process of its own. The growth of the peak
+    resident set size of that process while parsing is reported as the
+    parser's peak memory (tracemalloc doesn't exist on Python 2, and
+    wouldn't see lxml's allocations anyway). --in-process runs everything
+    in this process instead, which is quicker but measures no memory.
+
+    The best time of the repeats is reported, as entries and megabytes per
+    second. With --output the results are written as JSON. With --compare
+    they are compared with an earlier run (see compare.py), and the exit
+    status is 1 if any parser has got slower or bigger, so a regression in
+    the parse path can fail a build.
+
+    100000 and 1000000 entry corpora work too, but SoupParser takes about
+    a minute per 100000 entries, so leave it out of those with --parsers.
+"""
+import argparse
+import gc
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+
+import python_webdav.parse
+import corpus
+import compare
+
+
+def find_parsers():
+    """ Return the names of the parser classes in python_webdav.parse:
+        every class with a parse method whose name ends in Parser
+    """
+    return sorted(name for name, value in vars(python_webdav.parse).items()
+                  if name.endswith('Parser') and isinstance(value, type) and
+                  hasattr(value, 'parse'))
+
+
+def make_listing(entries):
+    """ Build a plain multistatus reply listing a number of entries
+    """
+    return corpus.make_corpus('flat', entries)
+
+
+def _max_rss_kb():
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        # Bytes rather than kilobytes
+        max_rss /= 1024
+    return max_rss
+
+
+def measure(path, parser_name, repeat):
+    """ Parse the document at path repeat times. Returns a dict of the
+        times of the runs, the number of resources read and the growth of
+        the peak RSS, in kilobytes, during the first run.
+    """
+    corpus_fd = open(path, 'rb')
+    data = corpus_fd.read()
+    corpus_fd.close()
+    parser_class = getattr(python_webdav.parse, parser_name)
+    gc.collect()
+    before = _max_rss_kb()
+    runs = []
+    peak_kb = resources = None
+    for _ in range(repeat):
+        start = time.time()
+        responses = parser_class().parse(data)
+        runs.append(time.time() - start)
+        if peak_kb is None:
+            peak_kb = _max_rss_kb() - before
+            resources = len(responses)
+        del responses
+    return {'runs': runs, 'peak_kb': peak_kb, 'resources': resources}
+
+
+def measure_in_child(path, parser_name, repeat):
+    """ measure() in a new process, so the peak RSS is the parser's own
+    """
+    child = subprocess.Popen([sys.executable, os.path.abspath(__file__),
+                              '--child', path, parser_name, str(repeat)],
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    output, errors = child.communicate()
+    if child.returncode:
+        lines = errors.strip().splitlines() or ['exit status %d' %
+                                                child.returncode]
+        return {'error': lines[-1]}
+    return json.loads(output)
+
+
+def run(kinds, sizes, parser_names, repeat, corpus_dir, in_process=False):
+    """ Benchmark each parser on each corpus and return the results
+    """
+    results = []
+    print '%-8s %8s %-12s %10s %12s %8s %10s' % (
+        'kind', 'entries', 'parser', 'seconds', 'entries/s', 'MB/s',
+        'peak MB')
+    for kind in kinds:
+        for entries in sizes:
+            path = corpus.write_corpus(corpus_dir, kind, entries)
+            size = os.path.getsize(path)
+            for parser_name in parser_names:
+                if in_process:
+                    try:
+                        outcome = measure(path, parser_name, repeat)
+                        outcome['peak_kb'] = None
+                    except Exception, err:
+                        outcome = {'error': '%s: %s' % (
+                            err.__class__.__name__, err)}
+                else:
+                    outcome = measure_in_child(path, parser_name, repeat)
+                entry = {'name': 'parse[%s,%d,%s]' % (kind, entries,
+                                                      parser_name),
+                         'group': 'parse',
+                         'params': {'kind': kind, 'entries': entries,
+                                    'parser': parser_name, 'bytes': size}}
+                if 'error' in outcome:
+                    entry['error'] = outcome['error']
+                    print '%-8s %8d %-12s FAILED %s' % (
+                        kind, entries, parser_name, outcome['error'])
+                    results.append(entry)
+                    continue
+                runs = outcome['runs']
+                best = min(runs)
+                entry.update(seconds=best, mean=sum(runs) / len(runs),
+                             runs=runs, peak_kb=outcome['peak_kb'],
+                             resources=outcome['resources'],
+                             entries_per_second=entries / best,
+                             mb_per_second=size / best / 1024 / 1024)
+                results.append(entry)
+                peak = '-'
+                if entry['peak_kb'] is not None:
+                    peak = '%.1f' % (entry['peak_kb'] / 1024.0)
+                print '%-8s %8d %-12s %10.4f %12d %8.1f %10s' % (
+                    kind, entries, parser_name, best,
+                    entry['entries_per_second'], entry['mb_per_second'],
+                    peak)
+                sys.stdout.flush()
+    return results
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    arg_parser.add_argument('--entries', default='1000,10000',
+                            help='Comma separated listing sizes')
+    arg_parser.add_argument('--kinds', default=','.join(corpus.KINDS),
+                            help='Comma separated kinds of document')
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    arg_parser.add_argument('--parsers', default=','.join(find_parsers()),
+                            help='Comma separated parser class names')
+    arg_parser.add_argument('--corpus-dir',
+                            help='Directory to keep the generated documents '
+                                 'in. A temporary one is used if not given.')
+    arg_parser.add_argument('--in-process', action='store_true',
+                            help="Don't start a process per parser, or "
+                                 'measure memory')
+    arg_parser.add_argument('--output', help='File to write JSON results to')
+    arg_parser.add_argument('--compare',
+                            help='Results of an earlier run to compare with')
+    arg_parser.add_argument('--threshold', type=float,
+                            default=compare.DEFAULT_THRESHOLD,
+                            help='Slow down that counts as a regression')
+    arg_parser.add_argument('--child', nargs=3, help=argparse.SUPPRESS)
+    args = arg_parser.parse_args(argv)
+
+    if args.child:
+        path, parser_name, repeat = args.child
+        print json.dumps(measure(path, parser_name, int(repeat)))
+        return 0
+
+    corpus_dir = args.corpus_dir or tempfile.mkdtemp(prefix='dav-corpus-')
+    try:
+        results = run(args.kinds.split(','),
+                      [int(size) for size in args.entries.split(',')],
+                      args.parsers.split(','), args.repeat, corpus_dir,
+                      in_process=args.in_process)
+    finally:
+        if not args.corpus_dir:
+            shutil.rmtree(corpus_dir)
+
+    if args.output:
+        compare.write_results(args.output, results, repeat=args.repeat)
+    if args.compare:
+        rows = compare.compare_results(
+            compare.load_results(args.compare),
+            dict((entry['name'], entry) for entry in results),
+            threshold=args.threshold)
+        print
+        print compare.format_comparison(rows)
+        if any(row[-1] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
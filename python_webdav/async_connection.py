@@ -0,0 +1,255 @@
+""" async_connection.py
+    This file contains AsyncConnection and AsyncClient, non-blocking
+    counterparts of connection.Connection and connection.Client.
+
+    Each request is queued and the call returns at once with an AsyncResult
+    (see multiprocessing.pool). Call get() on it to wait for the reply, or
+    pass a callback to be told when it arrives. Requests are sent by a
+    fixed number of worker threads sharing one session, whose connection
+    pool is the same size, so any number of operations can be queued
+    without a thread or a new connection for each one.
+"""
+from multiprocessing.pool import ThreadPool
+
+import python_webdav.connection as conn
+
+# Number of requests sent at once, and connections kept open for them
+DEFAULT_MAX_WORKERS = 10
+
+
+def gather(results, timeout=None):
+    """ Wait for a number of AsyncResults and return their values in the
+        same order. The first request that failed has its exception raised.
+
+        :param results: AsyncResults returned by AsyncConnection or
+                        AsyncClient
+        :type results: List
+
+        :param timeout: Seconds to wait for each result
+        :type timeout: int
+    """
+    return [result.get(timeout) for result in results]
+
+
+class AsyncConnection(object):
+    """ A Connection whose send_* methods return AsyncResults instead of
+        waiting for the server.
+
+        :param settings: The settings required for the connection to be
+                         established, as for Connection
+        :type settings: Dict
+
+        :param max_workers: Number of requests sent at once. Unless the
+                            settings give a pool_maxsize, the connection
+                            pool keeps this many connections open to the
+                            server.
+        :type max_workers: int
+    """
+    def __init__(self, settings, max_workers=DEFAULT_MAX_WORKERS):
+        settings = dict(settings)
+        settings.setdefault('pool_maxsize', max_workers)
+        self.connection = conn.Connection(settings)
+        self.max_workers = max_workers
+        self._pool = ThreadPool(max_workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def host(self):
+        return self.connection.host
+
+    @property
+    def path(self):
+        return self.connection.path
+
+    def submit(self, func, *args, **kwargs):
+        """ Queue func(*args, **kwargs) to be run by a worker. A callback
+            keyword argument is taken off and called with the return value
+            once it is ready.
+
+            Returns an AsyncResult.
+        """
+        callback = kwargs.pop('callback', None)
+        return self._pool.apply_async(func, args, kwargs, callback)
+
+    def close(self):
+        """ Wait for the queued requests to finish, then close the
+            connections
+        """
+        self._pool.close()
+        self._pool.join()
+        self.connection.httpcon.close()
+
+    def send_get(self, path, headers=None, stream=False,
+                 chunk_size=conn.DEFAULT_CHUNK_SIZE, callback=None):
+        """ Send a GET request. See Connection.send_get. With stream set,
+            the body is read by whoever iterates over the content.
+        """
+        return self.submit(self.connection.send_get, path, headers=headers,
+                           stream=stream, chunk_size=chunk_size,
+                           callback=callback)
+
+    def send_put(self, path, body, headers=None,
+                 chunk_size=conn.DEFAULT_CHUNK_SIZE, compress=None,
+                 callback=None):
+        """ Send a PUT request. See Connection.send_put. File like objects
+            and iterables are streamed by the worker.
+        """
+        return self.submit(self.connection.send_put, path, body,
+                           headers=headers, chunk_size=chunk_size,
+                           compress=compress, callback=callback)
+
+    def send_propfind(self, path, body='', extra_headers=None, depth='1',
+                      stream=False, callback=None):
+        """ Send a PROPFIND request. See Connection.send_propfind.
+        """
+        return self.submit(self.connection.send_propfind, path, body=body,
+                           extra_headers=extra_headers, depth=depth,
+                           stream=stream, callback=callback)
+
+    def send_lock(self, path, callback=None):
+        """ Send a LOCK request. See Connection.send_lock.
+        """
+        return self.submit(self.connection.send_lock, path,
+                           callback=callback)
+
+    def send_unlock(self, path, lock_token, callback=None):
+        """ Send an UNLOCK request. See Connection.send_unlock.
+        """
+        return self.submit(self.connection.send_unlock, path, lock_token,
+                           callback=callback)
+
+    def send_mkcol(self, path, callback=None):
+        """ Send a MKCOL request. See Connection.send_mkcol.
+        """
+        return self.submit(self.connection.send_mkcol, path,
+                           callback=callback)
+
+    def send_rmcol(self, path, callback=None):
+        """ Send a DELETE request for a collection. See
+            Connection.send_rmcol.
+        """
+        return self.submit(self.connection.send_rmcol, path,
+                           callback=callback)
+
+    def send_copy(self, path, destination, depth='infinity', overwrite=True,
+                  callback=None):
+        """ Send a COPY request. See Connection.send_copy.
+        """
+        return self.submit(self.connection.send_copy, path, destination,
+                           depth=depth, overwrite=overwrite,
+                           callback=callback)
+
+    def send_move(self, path, destination, overwrite=True, callback=None):
+        """ Send a MOVE request. See Connection.send_move.
+        """
+        return self.submit(self.connection.send_move, path, destination,
+                           overwrite=overwrite, callback=callback)
+
+    def send_delete(self, path, callback=None):
+        """ Send a DELETE request. See Connection.send_delete.
+        """
+        return self.submit(self.connection.send_delete, path,
+                           callback=callback)
+
+
+class AsyncClient(object):
+    """ The operations of connection.Client, queued on an AsyncConnection.
+        Each method returns an AsyncResult holding what the
+        connection.Client method returns.
+
+        :param async_connection: Connection to send the requests over
+        :type async_connection: AsyncConnection
+
+        :param client: connection.Client to use. A new one is made if not
+                       given. Give one with a PropertyCache to share the
+                       cache.
+        :type client: Client
+    """
+    def __init__(self, async_connection, client=None):
+        self.async_connection = async_connection
+        self.client = client or conn.Client()
+
+    def _submit(self, method, *args, **kwargs):
+        return self.async_connection.submit(
+            method, self.async_connection.connection, *args, **kwargs)
+
+    def get_properties(self, resource_uri, properties=None, depth='1',
+                       callback=None):
+        """ See Client.get_properties
+        """
+        return self._submit(self.client.get_properties, resource_uri,
+                            properties, depth=depth, callback=callback)
+
+    def get_property(self, resource_uri, property_name, callback=None):
+        """ See Client.get_property
+        """
+        return self._submit(self.client.get_property, resource_uri,
+                            property_name, callback=callback)
+
+    def get_properties_many(self, resource_uris, properties, callback=None):
+        """ See Client.get_properties_many
+        """
+        return self._submit(self.client.get_properties_many, resource_uris,
+                            properties, callback=callback)
+
+    def stat(self, resource_uri, head=False, callback=None):
+        """ See Client.stat
+        """
+        return self._submit(self.client.stat, resource_uri, head=head,
+                            callback=callback)
+
+    def get_file(self, resource_uri, local_file_name, extra_headers=None,
+                 stream=True, callback=None):
+        """ See Client.get_file. The download is streamed by default so
+            that many of them at once don't fill memory.
+        """
+        return self._submit(self.client.get_file, resource_uri,
+                            local_file_name, extra_headers=extra_headers,
+                            stream=stream, callback=callback)
+
+    def send_file(self, resource_uri, local_file_path, extra_headers=None,
+                  callback=None):
+        """ See Client.send_file
+        """
+        return self._submit(self.client.send_file, resource_uri,
+                            local_file_path, extra_headers=extra_headers,
+                            callback=callback)
+
+    def copy_resource(self, resource_path, resource_destination,
+                      depth='infinity', overwrite=True, callback=None):
+        """ See Client.copy_resource
+        """
+        return self._submit(self.client.copy_resource, resource_path,
+                            resource_destination, depth=depth,
+                            overwrite=overwrite, callback=callback)
+
+    def move_resource(self, resource_path, resource_destination,
+                      overwrite=True, callback=None):
+        """ See Client.move_resource
+        """
+        return self._submit(self.client.move_resource, resource_path,
+                            resource_destination, overwrite=overwrite,
+                            callback=callback)
+
+    def delete_resource(self, resource_uri, callback=None):
+        """ See Client.delete_resource
+        """
+        return self._submit(self.client.delete_resource, resource_uri,
+                            callback=callback)
+
+    def make_collection(self, resource_uri, callback=None):
+        """ See Client.make_collection
+        """
+        return self._submit(self.client.make_collection, resource_uri,
+                            callback=callback)
+
+    def remove_collection(self, resource_uri, callback=None):
+        """ See Client.remove_collection
+        """
+        return self._submit(self.client.remove_collection, resource_uri,
+                            callback=callback)
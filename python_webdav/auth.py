@@ -0,0 +1,226 @@
+""" auth.py
+    This file contains DigestAuth, an HTTP Digest authentication handler
+    for requests that shares the server's nonce between every thread using
+    it.
+
+    requests' own HTTPDigestAuth keeps the nonce per thread, so every new
+    thread starts with a request that is refused with 401 and sent again.
+    For a streamed PUT that means the body is uploaded twice, or can't be
+    sent again at all. DigestAuth keeps one challenge for everyone, counts
+    the nonce uses (nc) under a lock, and can be primed with small requests
+    before a body that can't be resent goes out.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+import urlparse
+
+import requests.auth
+import requests.cookies
+import requests.utils
+
+# Requests DigestAuth sends, in turn, to fetch a challenge before a
+# streamed request, until one of them is refused with one. Many servers
+# answer OPTIONS without authentication, so a Depth 0 PROPFIND of the
+# target follows it.
+PRIME_REQUESTS = (('OPTIONS', {}), ('PROPFIND', {'Depth': '0'}))
+
+_DIGEST_PREFIX = re.compile(r'^\s*digest\s+', re.IGNORECASE)
+
+
+def _hash_function(algorithm):
+    """ Return the hex digest function for a Digest algorithm name, or None
+        if it isn't supported
+    """
+    algorithm = (algorithm or 'MD5').upper()
+    if algorithm in ('MD5', 'MD5-SESS'):
+        hash_class = hashlib.md5
+    elif algorithm == 'SHA':
+        hash_class = hashlib.sha1
+    elif algorithm in ('SHA-256', 'SHA-256-SESS'):
+        hash_class = hashlib.sha256
+    elif algorithm in ('SHA-512', 'SHA-512-SESS'):
+        hash_class = hashlib.sha512
+    else:
+        return None
+
+    def hex_digest(value):
+        if isinstance(value, unicode):
+            value = value.encode('utf-8')
+        return hash_class(value).hexdigest()
+    return hex_digest
+
+
+class DigestAuth(requests.auth.AuthBase):
+    """ HTTP Digest authentication whose challenge is shared between
+        threads. Once a nonce has been seen, every request carries an
+        Authorization header from the start, with its own nonce count, so
+        it isn't refused first.
+
+        :param username: User name
+        :type username: String
+
+        :param password: Password
+        :type password: String
+    """
+    def __init__(self, username, password):
+        self.username = username
+        self.password = password
+        self._lock = threading.Lock()
+        self._challenge = None
+        self._nonce_count = 0
+        # Number of 401 replies seen, for tests and tuning
+        self.challenges = 0
+
+    @property
+    def primed(self):
+        """ Whether a challenge has been received yet
+        """
+        return self._challenge is not None
+
+    def prime(self, connection, path='/'):
+        """ Fetch a challenge, if there isn't one yet, with small requests
+            that can safely be sent twice (see PRIME_REQUESTS). Call this
+            before a request with a body that can't be sent again, such as
+            a streamed PUT.
+
+            :param connection: Connection to send the requests over
+            :type connection: Connection
+
+            :param path: Path to send the requests to
+            :type path: String
+
+            Returns whether there is a challenge now. If there isn't, the
+            server let every priming request through without asking for
+            authentication, and may still ask for it for the request that
+            follows.
+        """
+        for method, headers in PRIME_REQUESTS:
+            if self.primed:
+                break
+            connection._send_request(method, path, headers=dict(headers))
+        return self.primed
+
+    def _set_challenge(self, header):
+        challenge = requests.utils.parse_dict_header(
+            _DIGEST_PREFIX.sub('', header, count=1))
+        with self._lock:
+            if self._challenge is None or \
+                    challenge.get('nonce') != self._challenge.get('nonce'):
+                self._nonce_count = 0
+            self._challenge = challenge
+            self.challenges += 1
+
+    def _next_nonce(self):
+        """ Return the challenge and the next nonce count to use with it
+        """
+        with self._lock:
+            self._nonce_count += 1
+            return self._challenge, self._nonce_count
+
+    def build_header(self, method, url):
+        """ Return the Authorization header for a request, or None if there
+            is no challenge to answer yet or it can't be answered
+        """
+        if self._challenge is None:
+            return None
+        challenge, nonce_count = self._next_nonce()
+        realm = challenge.get('realm', '')
+        nonce = challenge.get('nonce', '')
+        qop = challenge.get('qop')
+        algorithm = challenge.get('algorithm')
+        opaque = challenge.get('opaque')
+
+        hex_digest = _hash_function(algorithm)
+        if hex_digest is None:
+            return None
+
+        parsed = urlparse.urlparse(url)
+        path = parsed.path or '/'
+        if parsed.query:
+            path += '?' + parsed.query
+
+        ha1 = hex_digest('%s:%s:%s' % (self.username, realm, self.password))
+        ha2 = hex_digest('%s:%s' % (method, path))
+        nc_value = '%08x' % nonce_count
+        cnonce = hashlib.sha1('%d%s%s%s' % (nonce_count, nonce, time.time(),
+                                            os.urandom(8))).hexdigest()[:16]
+        if algorithm and algorithm.upper().endswith('-SESS'):
+            ha1 = hex_digest('%s:%s:%s' % (ha1, nonce, cnonce))
+
+        if not qop:
+            response = hex_digest('%s:%s:%s' % (ha1, nonce, ha2))
+        elif 'auth' in [value.strip() for value in qop.split(',')]:
+            response = hex_digest('%s:%s:%s:%s:%s:%s' % (
+                ha1, nonce, nc_value, cnonce, 'auth', ha2))
+        else:
+            # auth-int would need the whole body hashed before sending
+            return None
+
+        header = ('username="%s", realm="%s", nonce="%s", uri="%s", '
+                  'response="%s"' % (self.username, realm, nonce, path,
+                                     response))
+        if opaque:
+            header += ', opaque="%s"' % opaque
+        if algorithm:
+            header += ', algorithm="%s"' % algorithm
+        if qop:
+            header += ', qop="auth", nc=%s, cnonce="%s"' % (nc_value, cnonce)
+        return 'Digest ' + header
+
+    def __call__(self, request):
+        header = self.build_header(request.method, request.url)
+        if header:
+            request.headers['Authorization'] = header
+        try:
+            request._digest_body_position = request.body.tell()
+        except AttributeError:
+            request._digest_body_position = None
+        request.register_hook('response', self.handle_401)
+        return request
+
+    def handle_401(self, response, **kwargs):
+        """ If the server sent a (new) challenge, take it and send the
+            request again, as long as its body can be sent again
+        """
+        if response.status_code != 401:
+            return response
+        header = response.headers.get('www-authenticate', '')
+        if not _DIGEST_PREFIX.match(header):
+            return response
+        self._set_challenge(header)
+
+        request = response.request
+        if getattr(request, '_digest_retried', False):
+            return response
+        body = request.body
+        if body is not None and not isinstance(body, basestring):
+            position = getattr(request, '_digest_body_position', None)
+            if position is None:
+                # A streamed body has been used up. The challenge is kept,
+                # so the caller can send it again and it will go through.
+                return response
+            try:
+                body.seek(position)
+            except IOError:
+                # Nor can one read from a source that can't be rewound
+                return response
+
+        # Use up the reply so the connection can be reused
+        response.content
+        response.close()
+        retry = request.copy()
+        requests.cookies.extract_cookies_to_jar(retry._cookies, request,
+                                                response.raw)
+        retry.prepare_cookies(retry._cookies)
+        header = self.build_header(retry.method, retry.url)
+        if header is None:
+            return response
+        retry.headers['Authorization'] = header
+        retry._digest_retried = True
+        retry_response = response.connection.send(retry, **kwargs)
+        retry_response.history.append(response)
+        retry_response.request = retry
+        return retry_response
@@ -0,0 +1,381 @@
+""" cache.py
+    This file contains the PropertyCache object, which keeps the results of
+    PROPFIND requests for a while so that hot collections don't have to be
+    listed again on every call.
+
+    A PropertyCache is handed to connection.Client, which looks results up
+    in it before sending a PROPFIND and drops the entries for a path (and
+    its parent collection) whenever it changes that path on the server.
+
+    It also contains the ContentCache object, which keeps copies of
+    downloaded files on disk along with their ETag and Last-Modified
+    values. client.Client uses it to make repeat downloads conditional, so
+    an unchanged file costs a 304 reply instead of the whole body.
+"""
+import errno
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+# Number of seconds a cached result is used for before it is fetched again
+DEFAULT_TTL = 30
+
+# Number of results kept before the least recently used is dropped
+DEFAULT_MAX_ENTRIES = 1024
+
+# Number of bytes of file content kept on disk before the least recently
+# used files are dropped
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+
+def normalise_path(path):
+    """ Make the different spellings of a path (with or without leading and
+        trailing slashes) into one cache key
+    """
+    return '/' + path.strip('/')
+
+
+def parent_path(path):
+    """ Return the normalised path of the collection holding path
+    """
+    path = normalise_path(path)
+    return path.rsplit('/', 1)[0] or '/'
+
+
+class PropertyCache(object):
+    """ A size bounded, least recently used cache of PROPFIND results.
+
+        :param ttl: Seconds a result is used for before it expires
+        :type ttl: int
+
+        :param max_entries: Number of results to keep
+        :type max_entries: int
+
+        :param validate: If True, an expired result in which every
+                         resource had an ETag is checked before being
+                         thrown away, with a PROPFIND of the same depth
+                         asking for the ETags alone. If none of the
+                         resources has changed ETag (and none has come or
+                         gone), the result is used for another ttl seconds.
+                         The ETag of a collection alone says nothing about
+                         changes to its members, so listings are checked
+                         member by member.
+        :type validate: Boolean
+    """
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES,
+                 validate=False):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.validate = validate
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+
+        # key -> (time stored, etag, result), least recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def make_key(connection, path, depth, properties, variant=None):
+        """ Build the key a result is stored under
+
+            :param connection: Connection the PROPFIND was sent over
+            :type connection: Connection
+
+            :param path: Path of the resource / collection
+            :type path: String
+
+            :param depth: Depth of the PROPFIND
+            :type depth: String
+
+            :param properties: Property names requested, or None for all
+            :type properties: List
+
+            :param variant: Anything else that changes the shape of the
+                            result, such as the parser used
+        """
+        if properties is not None:
+            properties = tuple(properties)
+        return (connection.host, connection.port, normalise_path(path),
+                depth, properties, variant)
+
+    def get(self, key):
+        """ Return the result stored under key, or None if there isn't one
+            or it has expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] < self.ttl:
+                del self._entries[key]
+                self._entries[key] = entry
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+            return None
+
+    def get_stale_etag(self, key):
+        """ Return the ETags stored with an expired result, if it is worth
+            checking whether it is still current. Returns None otherwise.
+        """
+        if not self.validate:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            return entry[1]
+
+    def refresh(self, key):
+        """ Mark an expired result as current again and return it. Returns
+            None if it has been dropped in the meantime.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+            self._entries[key] = (time.time(), entry[1], entry[2])
+            self.revalidations += 1
+            # The lookup that led here counted as a miss
+            self.misses -= 1
+            self.hits += 1
+            return entry[2]
+
+    def set(self, key, result, etag=None):
+        """ Store a result
+
+            :param key: Key from make_key
+            :type key: Tuple
+
+            :param result: The resource objects to keep
+            :type result: List
+
+            :param etag: ETags of the resources in the result, used to
+                         check the result is still current once it expires,
+                         such as a tuple of (href, ETag) pairs. None if
+                         the result can't be checked.
+            :type etag: Tuple
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.time(), etag, result)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, path, host=None):
+        """ Drop every result for path, anything below it and the collection
+            holding it, since a change to path shows up in all of them
+
+            :param path: Path that has changed on the server
+            :type path: String
+
+            :param host: If given, only drop results from this host
+            :type host: String
+        """
+        path = normalise_path(path)
+        parent = parent_path(path)
+        prefix = path.rstrip('/') + '/'
+        with self._lock:
+            for key in list(self._entries):
+                if host is not None and key[0] != host:
+                    continue
+                if (key[2] == path or key[2] == parent or
+                        key[2].startswith(prefix)):
+                    del self._entries[key]
+
+    def clear(self):
+        """ Drop every result
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """ Return the counters as a dict
+        """
+        return dict(hits=self.hits, misses=self.misses,
+                    revalidations=self.revalidations,
+                    evictions=self.evictions, entries=len(self._entries))
+
+
+class ContentCache(object):
+    """ An on-disk cache of downloaded files, keyed by URL. Each file is
+        kept as a .data file holding the body and a .meta file holding the
+        ETag and Last-Modified values it was served with. Once the .data
+        files add up to more than max_size bytes, the least recently used
+        ones are removed.
+
+        :param directory: Directory to keep the files in. It is created if
+                          it doesn't exist.
+        :type directory: String
+
+        :param max_size: Number of bytes of content to keep
+        :type max_size: int
+    """
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+
+        # Downloads served from the cache, and downloads of the whole body
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def _paths(self, url):
+        """ Return the paths of the .data and .meta files for url
+        """
+        name = hashlib.sha1(url).hexdigest()
+        base = os.path.join(self.directory, name)
+        return base + '.data', base + '.meta'
+
+    def _read_meta(self, url):
+        data_path, meta_path = self._paths(url)
+        try:
+            meta_fd = open(meta_path, 'r')
+            try:
+                meta = json.load(meta_fd)
+            finally:
+                meta_fd.close()
+        except (IOError, ValueError):
+            return None
+        if not os.path.exists(data_path) or meta.get('url') != url:
+            return None
+        return meta
+
+    def conditional_headers(self, url):
+        """ Return the headers that make a GET of url conditional on the
+            copy held here, or an empty dict if there isn't one
+        """
+        meta = self._read_meta(url)
+        headers = {}
+        if meta is None:
+            return headers
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        return headers
+
+    def copy_to(self, url, local_file_name):
+        """ Write the copy of url held here to local_file_name. Returns
+            False if there isn't one.
+        """
+        data_path = self._paths(url)[0]
+        try:
+            shutil.copyfile(data_path, local_file_name)
+        except IOError, err:
+            if err.errno != errno.ENOENT:
+                raise
+            return False
+        # The modification time of the data file records when it was last
+        # used, for eviction
+        try:
+            os.utime(data_path, None)
+        except OSError:
+            pass
+        self.hits += 1
+        return True
+
+    def store(self, url, local_file_name, etag=None, last_modified=None):
+        """ Keep a copy of a downloaded file. Nothing is kept if the reply
+            had neither an ETag nor a Last-Modified value, or the file is
+            larger than the whole cache.
+
+            :param url: URL the file was downloaded from
+            :type url: String
+
+            :param local_file_name: Path of the downloaded file
+            :type local_file_name: String
+
+            :param etag: ETag the file was served with
+            :type etag: String
+
+            :param last_modified: Last-Modified value the file was served
+                                  with
+            :type last_modified: String
+
+            Returns True if the file was kept.
+        """
+        self.misses += 1
+        if not etag and not last_modified:
+            self.forget(url)
+            return False
+        if os.path.getsize(local_file_name) > self.max_size:
+            self.forget(url)
+            return False
+
+        data_path, meta_path = self._paths(url)
+        # Write to temporary files and rename them into place, so a
+        # reader never sees half a file
+        temp_fd, temp_data = tempfile.mkstemp(dir=self.directory)
+        os.close(temp_fd)
+        shutil.copyfile(local_file_name, temp_data)
+        temp_fd, temp_meta = tempfile.mkstemp(dir=self.directory)
+        meta_fd = os.fdopen(temp_fd, 'w')
+        try:
+            json.dump(dict(url=url, etag=etag, last_modified=last_modified),
+                      meta_fd)
+        finally:
+            meta_fd.close()
+        with self._lock:
+            os.rename(temp_data, data_path)
+            os.rename(temp_meta, meta_path)
+            self._evict()
+        return True
+
+    def forget(self, url):
+        """ Drop the copy of url, if there is one
+        """
+        for path in self._paths(url):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def size(self):
+        """ Return the number of bytes of content held
+        """
+        return sum(size for mtime, size, path in self._data_files())
+
+    def _data_files(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.data'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def _evict(self):
+        """ Remove the least recently used files until the cache fits in
+            max_size
+        """
+        files = sorted(self._data_files())
+        total = sum(size for mtime, size, path in files)
+        for mtime, size, path in files:
+            if total <= self.max_size:
+                break
+            for remove_path in (path, path[:-len('.data')] + '.meta'):
+                try:
+                    os.remove(remove_path)
+                except OSError:
+                    pass
+            total -= size
+            self.evictions += 1
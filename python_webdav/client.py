@@ -3,33 +3,84 @@ Client Module
 =============
 
 """
+import fnmatch
 import os
+import posixpath
+import urllib
 import urllib2
 import python_webdav.connection as conn
-import python_webdav.file_wrapper as file_wrapper
+import python_webdav.sync as sync
 from array import array
 
+# Map of ls format symbols to resource properties
+FORMAT_MAP = {'T': 'resourcetype',
+              'D': 'creationdate',
+              'F': 'href',
+              'M': 'getlastmodified',
+              'A': 'executable',
+              'E': 'getetag',
+              'C': 'getcontenttype'}
+
+
+def format_properties(list_format):
+    """ Return the names of the properties needed to show an ls format.
+        The href comes with every resource, so it is never asked for.
+        resourcetype always is, so that the list is never empty (which
+        would ask for every property).
+
+        :param list_format: ls format symbols
+        :type list_format: List
+    """
+    properties = ['resourcetype']
+    for symbol in list_format:
+        name = FORMAT_MAP[symbol]
+        if name != 'href' and name not in properties:
+            properties.append(name)
+    return properties
+
+
 class Client(object):
     """ This is used for accessing a WebDAV service using similar commands
         that might be found in a CLI
     """
 
-    def __init__(self, webdav_server_uri, webdav_path='.', port=80, realm='', allow_bad_cert=False):
+    def __init__(self, webdav_server_uri, webdav_path='.', port=80, realm='',
+                 allow_bad_cert=False, cache=None, content_cache=None,
+                 connection_settings=None):
         """
 
 The Client module is not yet ready for use. The purpose of this module is to
 make WebDAV use easier. The Connection.Client object is for lower level use
 while this top level module will hopefully aid in quicker development.
 
+            :param cache: Optional cache for directory listings and
+                          properties (see python_webdav.cache.PropertyCache)
+            :type cache: PropertyCache
+
+            :param content_cache: Optional on-disk cache of downloaded files.
+                                  Repeat downloads are then made conditional
+                                  and served from it when the server replies
+                                  304 Not Modified (see
+                                  python_webdav.cache.ContentCache).
+            :type content_cache: ContentCache
+
+            :param connection_settings: Any further Connection settings,
+                                        such as pool_maxsize or share_pool
+            :type connection_settings: Dict
+
         """
         self._connection_settings = dict(host=webdav_server_uri,
                                          path=webdav_path,
                                          port=port,
                                          realm=realm,
                                          allow_bad_cert=allow_bad_cert)
+        if connection_settings:
+            self._connection_settings.update(connection_settings)
         path = self._connection_settings['path']
         if path[-1] != '/' and path != '.':
             self._connection_settings['path'] += '/'
+        self.cache = cache
+        self.content_cache = content_cache
         self.connection = None
         self.client = None
 
@@ -43,7 +94,7 @@ while this top level module will hopefully aid in quicker development.
         """
         if not dir_path.startswith('/'):
             dir_path = self.connection.path + '/' + dir_path
-        self.connection.send_rmcol(dir_path)
+        self.client.remove_collection(self.connection, dir_path)
 
     def set_connection(self, username='', password=''):
         """ Set up the connection object
@@ -58,9 +109,11 @@ while this top level module will hopefully aid in quicker development.
         self._connection_settings['username'] = username
         self._connection_settings['password'] = password
         self.connection = conn.Connection(self._connection_settings)
-        self.client = conn.Client()
+        self.client = conn.Client(cache=self.cache)
 
-    def download_file(self, file_path, dest_path='.'):
+    def download_file(self, file_path, dest_path='.', stream=False,
+                      chunk_size=conn.DEFAULT_CHUNK_SIZE, segments=1,
+                      resume=False):
         """ Download a file from file_path to dest_path
 
             :param file_path: Path to the resource to download
@@ -69,22 +122,104 @@ while this top level module will hopefully aid in quicker development.
             :param dest_path: Path to where the downloaded file should be saved
             :type dest_path: String
 
+            :param stream: If True, write the file to disk chunk by chunk as
+                           it is received instead of reading it all into
+                           memory first. The content returned is then None.
+            :type stream: Boolean
+
+            :param chunk_size: Size of the blocks to read when streaming
+            :type chunk_size: int
+
+            :param segments: If more than 1, the file is fetched as this many
+                             byte ranges at the same time (see
+                             Connection.Client.get_file_segmented). The
+                             content returned is then None.
+            :type segments: int
+
+            :param resume: If True, pick up an earlier interrupted download of
+                           the file where it left off (see
+                           Connection.Client.get_file_resumable). The
+                           content returned is then None.
+            :type resume: Boolean
+
         """
         resource_path = "%s/%s" % (
             self.connection.path.rstrip('/'), file_path.lstrip('/'))
-        resp, content = self.connection.send_get(resource_path)
         file_name = os.path.basename(file_path)
         write_to_path = os.path.join(dest_path, file_name)
 
+        if segments > 1:
+            resp = self.client.get_file_segmented(
+                self.connection, resource_path, write_to_path,
+                segments=segments, chunk_size=chunk_size)
+            return resp, None
+        if resume:
+            resp = self.client.get_file_resumable(
+                self.connection, resource_path, write_to_path,
+                chunk_size=chunk_size)
+            return resp, None
+        if self.content_cache is not None:
+            return self._download_cached(resource_path, write_to_path,
+                                         stream, chunk_size)
+
+        resp, content = self.connection.send_get(resource_path, stream=stream,
+                                                 chunk_size=chunk_size)
+        return resp, self._write_download(resp, content, write_to_path,
+                                          stream)
+
+    def _download_cached(self, resource_path, write_to_path, stream,
+                         chunk_size):
+        """ Download a file with a conditional GET, using the copy in the
+            content cache if it is still current
+        """
+        url = "%s/%s" % (self.connection.host.rstrip('/'),
+                         resource_path.lstrip('/'))
+        headers = self.content_cache.conditional_headers(url)
+        resp, content = self.connection.send_get(resource_path,
+                                                 headers=headers,
+                                                 stream=stream,
+                                                 chunk_size=chunk_size)
+        if resp.status_code == 304:
+            if stream:
+                resp.close()
+            if self.content_cache.copy_to(url, write_to_path):
+                if not stream:
+                    file_fd = open(write_to_path, 'rb')
+                    try:
+                        content = file_fd.read()
+                    finally:
+                        file_fd.close()
+                return resp, content
+            # The cached copy has gone since the headers were made
+            resp, content = self.connection.send_get(resource_path,
+                                                     stream=stream,
+                                                     chunk_size=chunk_size)
+
+        content = self._write_download(resp, content, write_to_path, stream)
+        if resp.status_code == 200:
+            self.content_cache.store(url, write_to_path,
+                                     resp.headers.get('etag'),
+                                     resp.headers.get('last-modified'))
+        return resp, content
+
+    def _write_download(self, resp, content, write_to_path, stream):
+        """ Write the body of a GET to write_to_path. Returns the content,
+            or None if it was streamed.
+        """
+        file_fd = open(write_to_path, 'wb')
         try:
-            file_fd = open(write_to_path, 'wb')
-            file_fd.write(content)
-        except IOError:
-            raise
+            if stream:
+                for chunk in content:
+                    file_fd.write(chunk)
+                content = None
+            else:
+                file_fd.write(content)
         finally:
             file_fd.close()
+            if stream:
+                resp.close()
 
-        return resp, content
+        return content
 
     def chdir(self, directory):
         """ Change directory from whatever current dir is to directory specified
@@ -109,10 +244,10 @@ while this top level module will hopefully aid in quicker development.
         """
         if not path.startswith('/'):
             path = self.connection.path + '/' + path
-        self.connection.send_mkcol(path)
+        self.client.make_collection(self.connection, path)
 
     def ls(self, path='', list_format=('F', 'C', 'M'), separator='\t',
-           display=True):
+           display=True, allprop=False):
         """
             :param path: Path of the directory to list
             :type path: String
@@ -136,37 +271,205 @@ while this top level module will hopefully aid in quicker development.
             :param display: Whether or not to print the output
             :type display: Boolean
 
-        """
-        # Format Map
-        format_map = {'T': 'resourcetype',
-                      'D': 'creationdate',
-                      'F': 'href',
-                      'M': 'getlastmodified',
-                      'A': 'executable',
-                      'E': 'getetag',
-                      'C': 'getcontenttype'}
+            :param allprop: If True, every property of each resource is
+                            asked for, rather than only those needed for
+                            list_format
+            :type allprop: Boolean
 
+        """
         # Get the properties for the given path
         if not path:
             path  = self.connection.path
-        props = self.client.get_properties(self.connection, path)
+        properties = None if allprop else format_properties(list_format)
+        props = self.client.get_properties(self.connection, path,
+                                           properties)
         property_lists = []
         for prop in props:
-            format_string = ''
-            formatted_list = []
-            for symbol in list_format:
-                str_prop = getattr(prop, format_map[symbol], None)
-                if not str_prop:
-                    str_prop = ''
-                if symbol == 'E':
-                    str_prop = str_prop.strip('"')
-                formatted_list.append(str_prop)
+            formatted_list = self._format_entry(prop, list_format)
             property_lists.append(formatted_list)
             format_string = separator.join(formatted_list)
             if display:
                 print format_string
         return property_lists
 
+    def iter_ls(self, path='', list_format=('F', 'C', 'M'), separator='\t',
+                display=False, allprop=False):
+        """ Generator version of ls. Each entry is yielded (and printed, if
+            display is True) as soon as it has been read from the server,
+            instead of after the whole listing has arrived.
+
+            :param path: Path of the directory to list
+            :type path: String
+
+            :param list_format: The format for the directory listing. See ls
+                                for the format symbols.
+            :type list_format: List
+
+            :param separator: Separator to use for formatting output
+            :type separator: String
+
+            :param display: Whether or not to print the output
+            :type display: Boolean
+
+            :param allprop: If True, every property of each resource is
+                            asked for, as for ls
+            :type allprop: Boolean
+
+        """
+        if not path:
+            path = self.connection.path
+        properties = None if allprop else format_properties(list_format)
+        for prop in self.client.iter_properties(self.connection, path,
+                                                properties):
+            formatted_list = self._format_entry(prop, list_format)
+            if display:
+                print separator.join(formatted_list)
+            yield formatted_list
+
+    def walk(self, path='', workers=conn.DEFAULT_WALK_WORKERS,
+             depth_infinity=True, properties=None):
+        """ Generator giving a resource object for path and everything below
+            it. See Connection.Client.walk for how the tree is fetched.
+
+            :param path: Path of the directory to walk
+            :type path: String
+
+            :param workers: Number of directories listed at once when the
+                            server won't list the whole tree in one go
+            :type workers: int
+
+            :param depth_infinity: Set to False to skip asking for the whole
+                                   tree in one go
+            :type depth_infinity: Boolean
+
+            :param properties: Names of the properties to get for each
+                               resource, as for Connection.Client's
+                               get_properties. All of them if not given.
+            :type properties: List
+
+        """
+        if not path:
+            path = self.connection.path
+        return self.client.walk(self.connection, path, properties,
+                                workers=workers,
+                                depth_infinity=depth_infinity)
+
+    def find(self, path='', pattern=None, resource_type=None,
+             workers=conn.DEFAULT_WALK_WORKERS):
+        """ Generator giving the hrefs of everything below path (and path
+            itself) that matches, like the find command
+
+            :param path: Path of the directory to search
+            :type path: String
+
+            :param pattern: Shell style pattern, such as '*.txt', matched
+                            against the name of each resource
+            :type pattern: String
+
+            :param resource_type: 'd' for directories only, 'f' for files
+                                  only
+            :type resource_type: String
+
+            :param workers: Number of directories listed at once when the
+                            server won't list the whole tree in one go
+            :type workers: int
+
+        """
+        # Only the href and the type are looked at
+        for resource in self.walk(path, workers=workers,
+                                  properties=['resourcetype']):
+            is_dir = resource.resourcetype == 'collection'
+            if resource_type == 'd' and not is_dir:
+                continue
+            if resource_type == 'f' and is_dir:
+                continue
+            if pattern is not None:
+                name = posixpath.basename(
+                    urllib.unquote(resource.href).rstrip('/'))
+                if not fnmatch.fnmatchcase(name, pattern):
+                    continue
+            yield resource.href
+
+    def sync_push(self, local_dir, path='', delete=False, dry_run=False,
+                  workers=sync.DEFAULT_SYNC_WORKERS):
+        """ Make a remote directory match a local one, uploading only the
+            files that are new or have changed
+
+            :param local_dir: Path of the local directory
+            :type local_dir: String
+
+            :param path: Path of the remote directory. Defaults to the
+                         working directory.
+            :type path: String
+
+            :param delete: If True, remote files that aren't in local_dir
+                           are deleted
+            :type delete: Boolean
+
+            :param dry_run: If True, nothing is changed. The plan is only
+                            worked out and returned.
+            :type dry_run: Boolean
+
+            :param workers: Number of files uploaded at once
+            :type workers: int
+
+            Returns a list of python_webdav.sync.SyncAction objects
+
+        """
+        if not path:
+            path = self.connection.path
+        syncer = sync.Sync(self.connection, local_dir, path,
+                           client=self.client, workers=workers,
+                           delete=delete)
+        return syncer.push(dry_run=dry_run)
+
+    def sync_pull(self, local_dir, path='', delete=False, dry_run=False,
+                  workers=sync.DEFAULT_SYNC_WORKERS):
+        """ Make a local directory match a remote one, downloading only the
+            files that are new or have changed
+
+            :param local_dir: Path of the local directory
+            :type local_dir: String
+
+            :param path: Path of the remote directory. Defaults to the
+                         working directory.
+            :type path: String
+
+            :param delete: If True, local files that aren't on the server
+                           are deleted
+            :type delete: Boolean
+
+            :param dry_run: If True, nothing is changed. The plan is only
+                            worked out and returned.
+            :type dry_run: Boolean
+
+            :param workers: Number of files downloaded at once
+            :type workers: int
+
+            Returns a list of python_webdav.sync.SyncAction objects
+
+        """
+        if not path:
+            path = self.connection.path
+        syncer = sync.Sync(self.connection, local_dir, path,
+                           client=self.client, workers=workers,
+                           delete=delete)
+        return syncer.pull(dry_run=dry_run)
+
+    def _format_entry(self, prop, list_format):
+        """ Turn a resource object into a list of strings, one for each
+            symbol in list_format
+        """
+        formatted_list = []
+        for symbol in list_format:
+            str_prop = getattr(prop, FORMAT_MAP[symbol], None)
+            if not str_prop:
+                str_prop = ''
+            if symbol == 'E':
+                str_prop = str_prop.strip('"')
+            formatted_list.append(str_prop)
+        return formatted_list
+
 # ------------ EXPERIMENTAL -------------- #
     def pwd(self):
         """ Return the working directory
@@ -176,12 +479,21 @@ while this top level module will hopefully aid in quicker development.
         else:
             return None
 
-    def upload_file(self, src_file, path=None):
+    def upload_file(self, src_file, path=None, part_size=None, resume=False):
         """ Upload a file to the server
 
             :param src_file: File to be sent.
             :type src_file: file or String
 
+            :param part_size: If given, send the file in parts of this size,
+                              each retried on its own (see
+                              Connection.Client.send_file_in_parts)
+            :type part_size: int
+
+            :param resume: Only used with part_size. Carry on an earlier
+                           upload from the last part the server confirmed.
+            :type resume: Boolean
+
         """
 
         # Is the file a file name or file object?
@@ -192,12 +504,14 @@ while this top level module will hopefully aid in quicker development.
             src_file.close()
         else:
             file_name = src_file
-        fileobj = file_wrapper.FileWrapper(file_name, 'rb')
 
         if not path:
             path = os.path.join(self.connection.path, file_name)
 
-        resp, content = self.connection.send_put(path, fileobj)
-        fileobj.close()
+        if part_size:
+            return self.client.send_file_in_parts(self.connection, path,
+                                                  file_name,
+                                                  part_size=part_size,
+                                                  resume=resume)
 
-        return resp, content
\ No newline at end of file
+        return self.client.send_file(self.connection, path, file_name)
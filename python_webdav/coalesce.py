@@ -0,0 +1,83 @@
+""" coalesce.py
+    This file contains the SingleFlight object, which lets threads asking
+    for the same thing at the same moment share one answer.
+
+    A Connection made with the coalesce setting keeps one, and passes its
+    GET and PROPFIND requests (and connection.Client the parsing of its
+    PROPFIND replies) through it. When dozens of threads ask for the same
+    listing at once, the first sends the request and the rest wait for its
+    result, rather than each sending a request of their own.
+"""
+import sys
+import threading
+
+
+class _Call(object):
+    """ A call in flight, and what it came to
+    """
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """ Runs at most one call for each key at a time. Callers that arrive
+        with a key while a call for it is in flight wait for that call and
+        are given its result (or its exception) rather than making the call
+        again. Nothing is kept once the call has finished, so this is not a
+        cache: a caller arriving afterwards makes a new call.
+    """
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+
+        # key -> _Call, for the calls in flight
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args, **kwargs):
+        """ Return func(*args, **kwargs), or the result of the call already
+            in flight for key
+
+            :param key: Identifies the call. Two calls with equal keys must
+                        be interchangeable.
+            :type key: Hashable
+
+            :param func: The function to call
+            :type func: Function
+
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                self.calls += 1
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error[0], call.error[1], call.error[2]
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except BaseException:
+            call.error = sys.exc_info()
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        """ Return the counters as a dict: calls made, callers given the
+            result of another's call, and calls in flight
+        """
+        return dict(calls=self.calls, shared=self.shared,
+                    in_flight=len(self._calls))
@@ -1,9 +1,135 @@
 """ Connection Module
 """
+import email.utils
+import json
+import os
+import posixpath
+import Queue
+import threading
+import time
+import urllib
+import urlparse
+from multiprocessing.pool import ThreadPool
+
 import requests
+import requests.adapters
 
+import python_webdav.auth
+import python_webdav.coalesce
 import python_webdav.parse
 import python_webdav.file_wrapper as file_wrapper
+import python_webdav.instrument as instrument
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Size of the blocks read from (or sent to) the network when a transfer is
+# streamed rather than held in memory in one go
+DEFAULT_CHUNK_SIZE = file_wrapper.DEFAULT_CHUNK_SIZE
+
+# Size of the parts a file is split into when it is uploaded in parts
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+
+# A resumable download keeps the ETag of the resource being fetched in a
+# file with this suffix next to the partial local file
+RESUME_ETAG_SUFFIX = '.partial-etag'
+
+# An upload in parts keeps a record of the file being sent and of how much
+# of it the server has confirmed in a file with this suffix next to the
+# local file, so that resuming can tell whether the parts already sent are
+# still good
+RESUME_UPLOAD_SUFFIX = '.partial-upload'
+
+# Content codings asked for on GET and PROPFIND replies. urllib3 undoes
+# them as the body is read, so callers and parsers only ever see the
+# decoded data. br is only offered when brotli is installed.
+ACCEPT_ENCODING = 'gzip, deflate'
+if brotli is not None:
+    ACCEPT_ENCODING += ', br'
+
+# Namespaces of the properties outside DAV: that can be asked for by name
+# alone. Any other property can be asked for in Clark notation,
+# {namespace}name.
+PROPERTY_NAMESPACES = {'executable': python_webdav.parse.APACHE_NS}
+
+# Properties asked for by Client.stat
+STAT_PROPERTIES = ['getcontentlength', 'getcontenttype', 'getetag',
+                   'getlastmodified', 'creationdate']
+
+# Number of hosts a connection keeps a pool of connections for, and the
+# number of connections kept open to each
+DEFAULT_POOL_CONNECTIONS = requests.adapters.DEFAULT_POOLSIZE
+DEFAULT_POOL_MAXSIZE = requests.adapters.DEFAULT_POOLSIZE
+
+# Connection pools shared between Connection objects, keyed on the host and
+# pool settings
+_shared_adapters = {}
+_shared_adapters_lock = threading.Lock()
+
+# Number of requests a bulk operation keeps in flight at once. This matches
+# the default pool size, so every request has a connection to use.
+DEFAULT_BULK_WORKERS = DEFAULT_POOL_MAXSIZE
+
+# Number of PROPFIND requests a tree walk keeps in flight at once
+DEFAULT_WALK_WORKERS = 4
+
+# Replies to a Depth: infinity PROPFIND meaning the server won't do it, so
+# the tree has to be walked a collection at a time
+INFINITY_REFUSED = (400, 403, 501)
+
+def _host_prefix(host):
+    """ Return the scheme://netloc part of a host setting
+    """
+    parts = urlparse.urlparse(host)
+    return '%s://%s' % (parts.scheme.lower(), parts.netloc.lower())
+
+
+def get_adapter(host, pool_connections=DEFAULT_POOL_CONNECTIONS,
+                pool_maxsize=DEFAULT_POOL_MAXSIZE, pool_block=False,
+                max_retries=0, shared=False):
+    """ Return a requests HTTPAdapter with the given pool settings. If
+        shared is True, every call for the same host and settings returns
+        the same adapter, so the connections it holds open are reused by
+        every session it is mounted on.
+
+        :param host: URL of the server
+        :type host: String
+
+        :param pool_connections: Number of hosts to keep pools for
+        :type pool_connections: int
+
+        :param pool_maxsize: Number of connections kept open to a host
+        :type pool_maxsize: int
+
+        :param pool_block: If True, a request waits for a free connection
+                           when pool_maxsize are in use, instead of opening
+                           one that is thrown away afterwards
+        :type pool_block: Boolean
+
+        :param max_retries: Number of times a failed connection is retried
+        :type max_retries: int
+
+        :param shared: Whether to use the shared adapter for the host
+        :type shared: Boolean
+
+    """
+    if not shared:
+        return instrument.TimedHTTPAdapter(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+            pool_block=pool_block, max_retries=max_retries)
+    key = (_host_prefix(host), pool_connections, pool_maxsize, pool_block,
+           max_retries)
+    with _shared_adapters_lock:
+        adapter = _shared_adapters.get(key)
+        if adapter is None:
+            adapter = instrument.TimedHTTPAdapter(
+                pool_connections=pool_connections,
+                pool_maxsize=pool_maxsize, pool_block=pool_block,
+                max_retries=max_retries)
+            _shared_adapters[key] = adapter
+        return adapter
 
 
 class Connection(object):
@@ -16,6 +142,54 @@ class Connection(object):
                              be established
             :type settings: Dict
 
+            The optional auth setting is 'basic' (the default), 'digest' or
+            a requests authentication object. Digest authentication shares
+            the server's nonce between threads, and fetches one before a
+            streamed PUT so the body is never sent twice (see
+            python_webdav.auth.DigestAuth). If the server won't give one
+            ahead of the PUT, the body is copied to a temporary file so it
+            can be sent again should the PUT be refused.
+
+            Optional settings for the pool of connections kept open to the
+            server:
+
+                * pool_connections - Number of hosts to keep pools for
+                * pool_maxsize - Number of connections kept open to the host.
+                  Set this to at least the number of threads using the
+                  connection, or the extra connections are closed after
+                  each request.
+                * pool_block - If True, wait for a free connection rather
+                  than open one more than pool_maxsize
+                * keep_alive - Set to False to close the connection after
+                  each request
+                * max_retries - Number of times a failed connection is
+                  retried
+                * share_pool - If True, the pool is shared with every other
+                  Connection to the same host with the same pool settings.
+                  Closing one of them only closes the idle connections.
+
+            Optional compression settings:
+
+                * compression - Ask for compressed GET and PROPFIND replies
+                  (the default). Set to False to ask for them uncompressed.
+                * compress_uploads - Send PUT bodies gzip compressed, with
+                  Content-Encoding: gzip. Only use this with servers that
+                  accept it.
+                * compress_level - zlib level for compressed uploads
+
+            The optional hooks setting is a list of instrumentation hooks.
+            See add_hook.
+
+            If the optional coalesce setting is True, identical GET and
+            PROPFIND requests made by several threads at once share one
+            request to the server (see python_webdav.coalesce). GETs match
+            if their path and headers do, PROPFINDs if their path, depth,
+            headers and body do, and connection.Client.get_properties
+            calls if their arguments do, in which case they share the
+            parsed result as well. Streamed requests are never shared. The
+            callers are handed the same response and result objects, so
+            they should not be changed.
+
         """
         # Get network settings
         self.username = settings['username']
@@ -34,11 +208,92 @@ class Connection(object):
         #self.httpcon = httplib2.Http()
         #self.httpcon.add_credentials(self.username, self.password)
         self.httpcon = requests.session()
-        self.httpcon.auth = (self.username, self.password)
+        auth = settings.get('auth', 'basic')
+        if auth == 'basic':
+            auth = (self.username, self.password)
+        elif auth == 'digest':
+            auth = python_webdav.auth.DigestAuth(self.username, self.password)
+        self.httpcon.auth = auth
         self.httpcon.verify = verify
 
+        adapter = get_adapter(
+            self.host,
+            pool_connections=settings.get('pool_connections',
+                                          DEFAULT_POOL_CONNECTIONS),
+            pool_maxsize=settings.get('pool_maxsize', DEFAULT_POOL_MAXSIZE),
+            pool_block=settings.get('pool_block', False),
+            max_retries=settings.get('max_retries', 0),
+            shared=settings.get('share_pool', False))
+        self.httpcon.mount(_host_prefix(self.host) + '/', adapter)
+        if not settings.get('keep_alive', True):
+            self.httpcon.headers['Connection'] = 'close'
+
+        if settings.get('compression', True):
+            self.accept_encoding = ACCEPT_ENCODING
+        else:
+            self.accept_encoding = 'identity'
+        self.compress_uploads = settings.get('compress_uploads', False)
+        self.compress_level = settings.get('compress_level',
+                                           file_wrapper.DEFAULT_COMPRESS_LEVEL)
+        self.hooks = list(settings.get('hooks', []))
+        self.single_flight = None
+        if settings.get('coalesce', False):
+            self.single_flight = python_webdav.coalesce.SingleFlight()
+
+    def add_hook(self, hook):
+        """ Install an instrumentation hook. From now on it is called with
+            a python_webdav.instrument.Timing for every request sent over
+            this connection and for every PROPFIND reply parsed from it. It
+            is called in the thread that made the request, so it must be
+            thread safe if the connection is shared between threads.
+
+            :param hook: Callable taking a Timing, such as a
+                         python_webdav.instrument.Collector
+            :type hook: Function
+        """
+        # Replaced rather than changed, so requests in flight in other
+        # threads keep the list they started with
+        self.hooks = self.hooks + [hook]
+
+    def remove_hook(self, hook):
+        """ Uninstall an instrumentation hook added with add_hook
+        """
+        self.hooks = [other for other in self.hooks if other is not hook]
+
+    def _emit(self, timing):
+        """ Hand a Timing to every hook
+        """
+        for hook in self.hooks:
+            hook(timing)
+
+    def _accept_encoding(self, headers):
+        """ Add the Accept-Encoding for a reply to headers, unless the
+            caller has chosen one. A Range refers to the unencoded bytes, so
+            ranged requests always ask for the identity coding.
+        """
+        if 'Accept-Encoding' not in headers:
+            if 'Range' in headers:
+                headers['Accept-Encoding'] = 'identity'
+            else:
+                headers['Accept-Encoding'] = self.accept_encoding
+        return headers
+
+    def _send_shared_request(self, request_method, path, body='',
+                             headers=None, stream=False):
+        """ _send_request, sharing the request with any identical one in
+            flight when the connection coalesces requests
+        """
+        if self.single_flight is None or stream:
+            return self._send_request(request_method, path, body=body,
+                                      headers=headers, stream=stream)
+        key = (request_method, path, body,
+               tuple(sorted((headers or {}).items())))
+        return self.single_flight.do(key, self._send_request,
+                                     request_method, path, body=body,
+                                     headers=headers)
+
     def _send_request(self, request_method, path, body='', headers=None,
-                      callback=None):
+                      callback=None, stream=False):
         """ Send a request over http to the webdav server
 
             :param request_method: HTML / WebDAV request method
@@ -55,18 +310,74 @@ class Connection(object):
                             for the request can be added
             :type headers: Dict
 
+            :param stream: Keyword argument. If True, the body of the reply is
+                           left unread and None is returned in place of the
+                           content. The caller is then responsible for
+                           consuming (or closing) the response.
+            :type stream: Boolean
+
         """
         if not headers:
             headers = {}
         uri = "%s/%s" % (self.host.rstrip('/'), path.lstrip('/'))
+        if self.hooks:
+            return self._send_timed_request(request_method, path, uri, body,
+                                            headers, stream)
         try:
             resp = self.httpcon.request(request_method, uri,
-                                        data=body, headers=headers)
+                                        data=body, headers=headers,
+                                        stream=stream)
         except requests.ConnectionError:
             raise
 
+        if stream:
+            return resp, None
         return resp, resp.content
 
+    def _send_timed_request(self, request_method, path, uri, body, headers,
+                            stream):
+        """ _send_request for a connection with hooks installed. The request
+            is timed and the Timing handed to the hooks once the reply (or
+            its headers, when it is streamed) has arrived.
+        """
+        timing = instrument.Timing(instrument.REQUEST, request_method, path)
+        sent = None
+        if isinstance(body, basestring):
+            timing.bytes_sent = len(body)
+        elif not isinstance(body, file_wrapper.ChunkedReader) and \
+                not hasattr(body, 'read'):
+            # A chunked body; count it as it goes out
+            sent = [0]
+            body = _count_chunks(body, sent)
+
+        instrument.reset_connect_time()
+        start = time.time()
+        try:
+            resp = self.httpcon.request(request_method, uri,
+                                        data=body, headers=headers,
+                                        stream=stream)
+            content = None if stream else resp.content
+        except requests.RequestException, err:
+            timing.error = err
+            timing.total_time = time.time() - start
+            timing.connect_time = instrument.last_connect_time()
+            self._emit(timing)
+            raise
+
+        timing.total_time = time.time() - start
+        timing.connect_time = instrument.last_connect_time()
+        timing.ttfb = resp.elapsed.total_seconds()
+        timing.status = resp.status_code
+        if isinstance(body, file_wrapper.ChunkedReader):
+            timing.bytes_sent = body.bytes_read
+        elif sent is not None:
+            timing.bytes_sent = sent[0]
+        if not stream:
+            # The bytes read off the network, before any decompression
+            timing.bytes_received = resp.raw.tell() or len(content)
+        self._emit(timing)
+        return resp, content
+
     def send_delete(self, path):
         """ Send a DELETE request
 
@@ -80,7 +391,25 @@ class Connection(object):
         except requests.ConnectionError:
             raise
 
-    def send_get(self, path, headers=None, callback=False):
+    def send_head(self, path, headers=None):
+        """ Send a HEAD request
+
+            :param path: The path (without host) to the resource
+            :type path: String
+
+            :param headers: Additional headers for the request
+            :type headers: Dict
+
+        """
+        try:
+            resp, content = self._send_request('HEAD', path,
+                                               headers=headers)
+            return resp, content
+        except requests.ConnectionError:
+            raise
+
+    def send_get(self, path, headers=None, callback=False, stream=False,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
         """ Send a GET request
             NOTE: callback is not yet implimented. It's purpose is to allow
             the user to specify a callback so that when x percent of the file
@@ -98,37 +427,88 @@ class Connection(object):
                              keeping track ofupload progress.
             :type callback: Method or Function
 
+            :param stream: If True, the content returned is an iterator that
+                           reads the body from the network in chunk_size
+                           blocks, rather than a string holding all of it.
+            :type stream: Boolean
+
+            :param chunk_size: Size of the blocks to read when streaming
+            :type chunk_size: int
+
         """
-        if not headers:
-            headers = {}
+        headers = self._accept_encoding(dict(headers or {}))
 
         try:
-            resp, content = self._send_request('GET', path, headers=headers,
-                                               callback=callback)
+            resp, content = self._send_shared_request('GET', path,
+                                                      headers=headers,
+                                                      stream=stream)
+            if stream:
+                content = resp.iter_content(chunk_size)
             return resp, content
         except requests.ConnectionError:
             raise
 
-    def send_put(self, path, body, headers=None):
+    def send_put(self, path, body, headers=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE, compress=None):
         """ This PUT request will put data files onto a webdav server.
-            However, please note that due to the way in which httplib2 sends
-            files, it is not currently possible to break a file up into chunks
-            and read it in. In other words, the whole file has to be read into
-            memory for sending. This could be problematic for large files.
+            The body may be a string, a file like object or any iterable of
+            strings. Anything other than a string is streamed to the server
+            in chunk_size blocks rather than being read into memory. If the
+            size of the data can be found (as it can for normal files) it is
+            sent with a Content-Length, otherwise chunked transfer-encoding is
+            used.
 
             :param path: The path (without host) to the desired file destination
             :type path: String
 
             :param body: Body of the request. This is the data which to send to
                          the destination file
-            :type body: String
+            :type body: String, file or iterable
 
             :param headers: Additional headers for the request may be added here
             :type headers: Dict
 
+            :param chunk_size: Size of the blocks the body is sent in when
+                               it is streamed
+            :type chunk_size: int
+
+            :param compress: If True the body is sent gzip compressed, with
+                             Content-Encoding: gzip. Defaults to the
+                             connection's compress_uploads setting. A
+                             partial PUT (with a Content-Range) is never
+                             compressed.
+            :type compress: Boolean
+
         """
-        if not headers:
-            headers = {}
+        headers = dict(headers or {})
+        if compress is None:
+            compress = self.compress_uploads
+        if 'Content-Range' in headers or 'Content-Encoding' in headers:
+            compress = False
+
+        if not isinstance(body, (basestring, file_wrapper.ChunkedReader)):
+            body = file_wrapper.ChunkedReader(body, chunk_size=chunk_size)
+            if body.length is None:
+                # No length, so let requests send it chunked
+                body = iter(body)
+            elif not body.length:
+                body = ''
+        if compress:
+            headers['Content-Encoding'] = 'gzip'
+            if isinstance(body, basestring):
+                body = ''.join(file_wrapper.gzip_chunks(
+                    [body], level=self.compress_level))
+            else:
+                # The compressed length isn't known until the end, so
+                # the body is sent chunked
+                body = file_wrapper.gzip_chunks(body,
+                                                level=self.compress_level)
+        spooled = None
+        if not isinstance(body, basestring) and not self._prime_auth(path):
+            # A streamed body can't be sent again if the server asks for
+            # authentication, and there is no challenge to answer ahead of
+            # it, so keep a copy that can be
+            body = spooled = file_wrapper.spool(body)
 
         try:
             resp, content = self._send_request('PUT', path, body=body,
@@ -136,8 +516,22 @@ class Connection(object):
             return resp, content
         except requests.ConnectionError:
             raise
+        finally:
+            if spooled is not None:
+                spooled.close()
+
+    def _prime_auth(self, path):
+        """ Fetch an authentication challenge ahead of a request whose
+            body can only be sent once, if the authentication in use needs
+            one. Returns False if it does but none could be had.
+        """
+        prime = getattr(self.httpcon.auth, 'prime', None)
+        if prime is None:
+            return True
+        return prime(self, path)
 
-    def send_propfind(self, path, body='', extra_headers=None):
+    def send_propfind(self, path, body='', extra_headers=None, depth='1',
+                      stream=False):
         """ Send a PROPFIND request
 
             :param path: Path (without host) to the resource from which
@@ -151,14 +545,26 @@ class Connection(object):
                                   may be added here
             :type extra_headers: Dict
 
+            :param depth: Value of the Depth header. '0' for the resource
+                          only, '1' to include its members as well
+            :type depth: String
+
+            :param stream: If True, the reply is left unread and None is
+                           returned for the content, so that it can be parsed
+                           as it arrives from resp.raw
+            :type stream: Boolean
+
         """
         if not extra_headers:
             extra_headers = {}
         try:
-            headers = {'Depth': '1'}
+            headers = {'Depth': depth}
             headers.update(extra_headers)
-            resp, content = self._send_request('PROPFIND', path, body=body,
-                                               headers=headers)
+            self._accept_encoding(headers)
+            resp, content = self._send_shared_request('PROPFIND', path,
+                                                      body=body,
+                                                      headers=headers,
+                                                      stream=stream)
             return resp, content
         except requests.ConnectionError:
             raise
@@ -178,7 +584,7 @@ class Connection(object):
                 self.host.rstrip('/'), path.lstrip('/'))
             body += '</D:owner></D:lockinfo>'
             resp, content = self._send_request('LOCK', path, body=body)
-            lock_token = LockToken(resp['lock-token'])
+            lock_token = LockToken(resp.headers['lock-token'])
             return resp, content, lock_token
         except requests.exceptions.ConnectionError:
             raise
@@ -236,7 +642,15 @@ class Connection(object):
         except requests.ConnectionError:
             raise
 
-    def send_copy(self, path, destination):
+    def _destination_headers(self, destination, overwrite):
+        """ Build the Destination and Overwrite headers for COPY and MOVE
+        """
+        full_destination = "%s/%s" % (self.host.rstrip('/'),
+                                      destination.lstrip('/'))
+        return {'Destination': requests.utils.requote_uri(full_destination),
+                'Overwrite': 'T' if overwrite else 'F'}
+
+    def send_copy(self, path, destination, depth='infinity', overwrite=True):
         """ Send a COPY request
 
             :param path: Path (without host) to the source resource to copy
@@ -246,16 +660,291 @@ class Connection(object):
                                 the copied resource
             :type destination: String
 
+            :param depth: 'infinity' (the default) to copy a collection and
+                          everything in it, '0' to copy the collection and
+                          its properties alone
+            :type depth: String
+
+            :param overwrite: If False, the server refuses (with 412
+                              Precondition Failed) to replace a resource
+                              already at destination
+            :type overwrite: Boolean
+
         """
         try:
-            full_destination = "%s/%s" % (self.host.rstrip('/'),
-                                          destination.lstrip('/'))
-            headers = {'Destination': full_destination}
+            headers = self._destination_headers(destination, overwrite)
+            headers['Depth'] = depth
             resp, content = self._send_request('COPY', path, headers=headers)
             return resp, content
         except requests.ConnectionError:
             raise
 
+    def send_move(self, path, destination, overwrite=True):
+        """ Send a MOVE request. The server renames the resource (or
+            collection, with everything in it) in place, so no data is
+            copied over the network.
+
+            :param path: Path (without host) to the resource to move
+            :type path: String
+
+            :param destination: Path (without host) to move the resource to
+            :type destination: String
+
+            :param overwrite: If False, the server refuses (with 412
+                              Precondition Failed) to replace a resource
+                              already at destination
+            :type overwrite: Boolean
+
+        """
+        # A MOVE of a collection always acts on the whole of it, so no Depth
+        # header is sent (RFC 4918 9.9.2)
+        try:
+            headers = self._destination_headers(destination, overwrite)
+            resp, content = self._send_request('MOVE', path, headers=headers)
+            return resp, content
+        except requests.ConnectionError:
+            raise
+
+def _count_chunks(chunks, sent):
+    """ Pass chunks through, adding up their length in sent[0]
+    """
+    for chunk in chunks:
+        sent[0] += len(chunk)
+        yield chunk
+
+
+def _timed_resources(connection, resp, path, resources):
+    """ Pass through the resources of a streamed PROPFIND reply, then give
+        the time spent reading them to the connection's hooks
+    """
+    timing = instrument.Timing(instrument.PARSE, 'PROPFIND', path,
+                               status=resp.status_code, parse_time=0.0,
+                               resources=0)
+    try:
+        while True:
+            start = time.time()
+            try:
+                resource = next(resources)
+            finally:
+                timing.parse_time += time.time() - start
+            timing.resources += 1
+            yield resource
+    except StopIteration:
+        pass
+    finally:
+        connection._emit(timing)
+
+
+def _property_name(prop):
+    """ Split a property name into its namespace and local name. The name
+        may be in Clark notation; otherwise it is in DAV:, unless it is in
+        PROPERTY_NAMESPACES.
+    """
+    if prop.startswith('{'):
+        namespace, name = prop[1:].split('}', 1)
+        return namespace, name
+    return PROPERTY_NAMESPACES.get(prop, python_webdav.parse.DAV_NS), prop
+
+
+def _propfind_body(properties):
+    """ Build the body of a PROPFIND request for a list of property names
+        (see _property_name), or for all properties if the list is empty.
+        resourcetype is always asked for along with the others, as the
+        parsers need it to tell collections from other resources.
+    """
+    body = '<?xml version="1.0" encoding="utf-8" ?>'
+    if not properties:
+        body += '<D:propfind xmlns:D="DAV:">'
+        body += '<D:allprop/>'
+        body += '</D:propfind>'
+        return body
+
+    names = []
+    for prop in ['resourcetype'] + list(properties):
+        name = _property_name(prop)
+        if name not in names:
+            names.append(name)
+    prefixes = {python_webdav.parse.DAV_NS: 'D'}
+    declarations = ''
+    for namespace, name in names:
+        if namespace not in prefixes:
+            prefixes[namespace] = 'N%d' % (len(prefixes) - 1)
+            declarations += ' xmlns:%s="%s"' % (prefixes[namespace],
+                                                namespace)
+    body += '<D:propfind xmlns:D="DAV:"%s>' % declarations
+    body += '<D:prop>'
+    for namespace, name in names:
+        body += '<%s:%s/>' % (prefixes[namespace], name)
+    body += '</D:prop>'
+    body += '</D:propfind>'
+    return body
+
+
+def _split_ranges(size, segments):
+    """ Split size bytes into a list of (start, end) byte ranges, with end
+        inclusive as it is in a Range header
+    """
+    segment_size = -(-size // segments)
+    return [(start, min(start + segment_size, size) - 1)
+            for start in range(0, size, segment_size)]
+
+
+def _content_range_start(resp):
+    """ Return the first byte position of the Content-Range of a response,
+        or None if it has no usable Content-Range header
+    """
+    content_range = resp.headers.get('content-range', '')
+    try:
+        return int(content_range.split()[1].split('-')[0])
+    except (IndexError, ValueError):
+        return None
+
+
+def _check_segment(resp, start, etag):
+    """ Make sure the reply to a ranged GET for a segment starting at start
+        is that segment of the version of the resource with the given ETag.
+        Anything else (such as a 200 carrying the whole of a resource that
+        has changed, or a 412) is closed and raised as an HTTPError.
+    """
+    if resp.status_code != 206 or _content_range_start(resp) != start or \
+            resp.headers.get('etag', etag) != etag:
+        resp.close()
+        raise requests.HTTPError([resp, None])
+
+
+def _write_chunks(resp, chunks, local_file_name, mode):
+    """ Write a streamed body to a local file and release the response
+    """
+    local_file_fd = open(local_file_name, mode)
+    try:
+        for chunk in chunks:
+            local_file_fd.write(chunk)
+    finally:
+        local_file_fd.close()
+        resp.close()
+
+
+def _write_segment(resp, chunks, local_file_name, start, end):
+    """ Write a streamed byte range at its offset in an existing local file,
+        checking that the whole range arrived
+    """
+    local_file_fd = open(local_file_name, 'r+b')
+    written = 0
+    try:
+        local_file_fd.seek(start)
+        for chunk in chunks:
+            local_file_fd.write(chunk)
+            written += len(chunk)
+    finally:
+        local_file_fd.close()
+        resp.close()
+    if written != end - start + 1:
+        raise requests.HTTPError(
+            'Expected %d bytes from offset %d but received %d' % (
+                end - start + 1, start, written))
+
+
+def _upload_journal(local_file_path, resource_uri, confirmed):
+    """ The record kept of an upload in parts while it is under way
+    """
+    return {'resource': resource_uri,
+            'size': os.path.getsize(local_file_path),
+            'mtime': os.path.getmtime(local_file_path),
+            'confirmed': confirmed}
+
+
+def _write_upload_journal(journal_file_name, journal):
+    journal_fd = open(journal_file_name, 'w')
+    try:
+        json.dump(journal, journal_fd)
+    finally:
+        journal_fd.close()
+
+
+def _read_upload_journal(journal_file_name):
+    """ Return the record of an earlier upload in parts, or None if there
+        isn't a readable one
+    """
+    try:
+        journal_fd = open(journal_file_name)
+    except IOError:
+        return None
+    try:
+        return json.load(journal_fd)
+    except ValueError:
+        return None
+    finally:
+        journal_fd.close()
+
+
+def error_status(err):
+    """ Return the status code of the response carried by an HTTPError
+        raised by this module, or None
+
+        :param err: The exception
+        :type err: requests.HTTPError
+    """
+    try:
+        return err.args[0][0].status_code
+    except (IndexError, TypeError, AttributeError):
+        return None
+
+
+def parse_http_date(value):
+    """ Turn an HTTP date (as in getlastmodified) into seconds since the
+        epoch, or None
+
+        :param value: The date, or None
+        :type value: String
+    """
+    if not value:
+        return None
+    parsed = email.utils.parsedate_tz(value)
+    if parsed is None:
+        return None
+    return email.utils.mktime_tz(parsed)
+
+
+def _result_etags(result):
+    """ The (href, ETag) pairs of the resources in a PROPFIND result, or
+        None if it is empty or any of them has no ETag, as then a change
+        to it can't be spotted from the ETags
+    """
+    etags = tuple((resource.href, getattr(resource, 'getetag', None))
+                  for resource in result)
+    if not etags or any(etag is None for href, etag in etags):
+        return None
+    return etags
+
+
+def href_to_path(connection, href):
+    """ Turn an href from a multistatus reply into a path that can be sent
+        over connection, by removing any path the host setting includes
+
+        :param connection: Connection the reply came over
+        :type connection: Connection
+
+        :param href: The href of a resource in the reply
+        :type href: String
+    """
+    href = urlparse.urlparse(href).path
+    prefix = urlparse.urlparse(connection.host).path.rstrip('/')
+    if prefix and href.startswith(prefix + '/'):
+        href = href[len(prefix):]
+    return href
+
+
+def _path_key(path):
+    """ A path in a form that can be compared with others, whatever its
+        quoting and slashes
+    """
+    return urllib.unquote(path).strip('/')
+
+
+def _same_path(path1, path2):
+    return _path_key(path1) == _path_key(path2)
+
+
 class LockToken(object):
     """ LockToken object. This is an object that contains information about a
         lock on a resource or collection
@@ -283,18 +972,141 @@ class Property(object):
         self.__dict__[property_name] = property_value
 
 
+class BulkResult(object):
+    """ The outcome of one item of a bulk operation
+
+        :param item: The path (or pair of paths) the item was for
+        :type item: String or Tuple
+
+        :param response: The response from the server, if one arrived
+        :type response: Response
+
+        :param error: The exception the item failed with, if any
+        :type error: Exception
+    """
+    def __init__(self, item, response=None, error=None):
+        self.item = item
+        self.response = response
+        self.error = error
+
+    @property
+    def status_code(self):
+        if self.response is None:
+            return None
+        return self.response.status_code
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        if self.ok:
+            return '<BulkResult %r %s>' % (self.item, self.status_code)
+        return '<BulkResult %r failed: %s>' % (self.item, self.error)
+
+
+class ResourceStat(object):
+    """ What Client.stat found out about a single resource
+
+        :param href: The path of the resource
+        :type href: String
+
+        :param is_collection: True for a collection, False for any other
+                              resource and None when it isn't known (a HEAD
+                              reply doesn't say)
+        :type is_collection: Boolean
+
+        :param size: Content length in bytes, or None
+        :type size: int
+
+        :param content_type: Content type, or None
+        :type content_type: String
+
+        :param etag: ETag, or None
+        :type etag: String
+
+        :param last_modified: Last modified time as the server sent it (an
+                              HTTP date), or None
+        :type last_modified: String
+
+        :param created: Creation date as the server sent it, or None
+        :type created: String
+    """
+    __slots__ = ('href', 'is_collection', 'size', 'content_type', 'etag',
+                 'last_modified', 'created')
+
+    def __init__(self, href, is_collection=None, size=None,
+                 content_type=None, etag=None, last_modified=None,
+                 created=None):
+        self.href = href
+        self.is_collection = is_collection
+        self.size = size
+        self.content_type = content_type
+        self.etag = etag
+        self.last_modified = last_modified
+        self.created = created
+
+    @classmethod
+    def from_resource(cls, resource):
+        """ Make a ResourceStat from a resource object read from a PROPFIND
+            reply
+        """
+        size = getattr(resource, 'getcontentlength', None)
+        try:
+            size = int(size)
+        except (TypeError, ValueError):
+            size = None
+        return cls(resource.href,
+                   is_collection=resource.resourcetype == 'collection',
+                   size=size,
+                   content_type=getattr(resource, 'getcontenttype', None),
+                   etag=getattr(resource, 'getetag', None),
+                   last_modified=getattr(resource, 'getlastmodified', None),
+                   created=getattr(resource, 'creationdate', None))
+
+    @classmethod
+    def from_headers(cls, href, headers):
+        """ Make a ResourceStat from the headers of a HEAD reply
+        """
+        size = headers.get('content-length')
+        try:
+            size = int(size)
+        except (TypeError, ValueError):
+            size = None
+        return cls(href, size=size,
+                   content_type=headers.get('content-type'),
+                   etag=headers.get('etag'),
+                   last_modified=headers.get('last-modified'))
+
+    @property
+    def mtime(self):
+        """ last_modified in seconds since the epoch, or None
+        """
+        return parse_http_date(self.last_modified)
+
+    def __repr__(self):
+        return '<ResourceStat %r %s>' % (self.href, self.size)
+
+
 class Client(object):
     """ This class is for interacting with webdav. Its main purpose is to be
         used by the client.py module but may also be used by developers
         who wish to use more direct webdav access.
     """
-    def __init__(self):
-        """ Stub
-        """
-        pass
+    def __init__(self, cache=None):
+        """ Set up the object
 
+            :param cache: If given, PROPFIND results are kept in and read
+                          from this cache, and the entries for a path are
+                          dropped whenever this client changes it on the
+                          server
+            :type cache: python_webdav.cache.PropertyCache
 
-    def get_properties(self, connection, resource_uri, properties=None):
+        """
+        self.cache = cache
+
+    def get_properties(self, connection, resource_uri, properties=None,
+                       depth='1', parser=None, compact=False):
         """ Get a list of property objects
 
             :param connection: Connection Object
@@ -305,40 +1117,173 @@ class Client(object):
             :type resource_uri: String
 
             :param properties: list of property names to get. If left empty,
-                               will get all
+                               will get all (allprop). Giving only the
+                               ones that are needed saves the server
+                               working out, and sending, the rest. DAV:
+                               properties are named alone ('getetag'), as
+                               are those in PROPERTY_NAMESPACES
+                               ('executable'). Others are named in Clark
+                               notation ('{namespace}name').
             :type properties: List
 
-            Returns a list of resource objects.
+            :param depth: '1' (the default) to list a collection and its
+                          members, '0' for the resource alone
+            :type depth: String
+
+            :param parser: The parser class used to read the reply, such as
+                           python_webdav.parse.FastParser. Defaults to
+                           python_webdav.parse.LxmlParser.
+            :type parser: Class
+
+            :param compact: If True, the reply is parsed as it arrives into a
+                            python_webdav.parse.ListingResult, which takes a
+                            fraction of the memory of a list of resource
+                            objects. The parser argument is then ignored.
+            :type compact: Boolean
+
+            Returns a list of resource objects. If the client has a cache,
+            the same objects are handed to every caller until they expire,
+            and if the connection coalesces requests, to every caller asking
+            at the same moment, so they should not be changed.
 
         """
-        if not properties:
-            properties = []
-        # Build body
-        body = '<?xml version="1.0" encoding="utf-8" ?>'
-        body += '<D:propfind xmlns:D="DAV:">'
-        if properties:
-            body += '<D:prop>'
-            for prop in properties:
-                body += '<D:' + prop + '/>'
-            body += '</D:prop>'
-        else:
-            body += '<D:allprop/>'
-        body += '</D:propfind>'
+        if parser is None:
+            parser = python_webdav.parse.LxmlParser
+        if self.cache is None:
+            return self._fetch_shared(connection, resource_uri, properties,
+                                      depth, parser, compact)
+
+        key = self.cache.make_key(connection, resource_uri, depth,
+                                  properties, (parser, compact))
+        result = self.cache.get(key)
+        if result is None:
+            result = self._revalidate(connection, resource_uri, depth, key)
+        if result is None:
+            result = self._fetch_shared(connection, resource_uri,
+                                        properties, depth, parser, compact)
+            self.cache.set(key, result, _result_etags(result))
+        return result
+
+    def _revalidate(self, connection, resource_uri, depth, key):
+        """ Check whether an expired cache entry is still current by asking
+            for the ETags alone, at the same depth, so a change to any
+            member of a collection is seen. Returns the entry if it is,
+            None otherwise.
+        """
+        etags = self.cache.get_stale_etag(key)
+        if etags is None:
+            return None
+        try:
+            current = self._fetch_properties(connection, resource_uri,
+                                             ['getetag'], depth,
+                                             python_webdav.parse.LxmlParser)
+        except requests.HTTPError:
+            return None
+        if _result_etags(current) == etags:
+            return self.cache.refresh(key)
+        return None
+
+    def _invalidate(self, connection, *resource_uris):
+        """ Drop the cached results affected by a change to resource_uris
+        """
+        if self.cache is None:
+            return
+        for resource_uri in resource_uris:
+            self.cache.invalidate(resource_uri, host=connection.host)
+
+    def _fetch_shared(self, connection, resource_uri, properties, depth,
+                      parser, compact):
+        """ _fetch_properties, sharing the request and the parsed result
+            with any identical call in flight when the connection coalesces
+            requests
+        """
+        if connection.single_flight is None:
+            return self._fetch_properties(connection, resource_uri,
+                                          properties, depth, parser, compact)
+        key = ('properties', resource_uri,
+               properties and tuple(properties), depth, parser, compact)
+        return connection.single_flight.do(
+            key, self._fetch_properties, connection, resource_uri,
+            properties, depth, parser, compact)
+
+    def _fetch_properties(self, connection, resource_uri, properties, depth,
+                          parser, compact=False):
+        """ Send the PROPFIND for get_properties, bypassing the cache
+        """
+        if compact:
+            return python_webdav.parse.ListingResult(
+                self.iter_properties(connection, resource_uri,
+                                     properties=properties, depth=depth))
+        body = _propfind_body(properties)
 
-        if resource_uri and resource_uri[-1] != '/':
+        if depth != '0' and resource_uri and resource_uri[-1] != '/':
             resource_uri += '/'
 
-        resp, prop_xml = connection.send_propfind(resource_uri, body=body)
+        resp, prop_xml = connection.send_propfind(resource_uri, body=body,
+                                                  depth=depth)
         if resp.status_code >= 200 and resp.status_code < 300:
             #parser = python_webdav.parse.Parser()
-            parser = python_webdav.parse.LxmlParser()
-            parser.parse(prop_xml)
+            parser = parser()
+            if connection.hooks:
+                start = time.time()
+                parser.parse(prop_xml)
+                connection._emit(instrument.Timing(
+                    instrument.PARSE, 'PROPFIND', resource_uri,
+                    status=resp.status_code, parse_time=time.time() - start,
+                    resources=len(parser.response_objects)))
+            else:
+                parser.parse(prop_xml)
             properties = parser.response_objects
             return properties
         else:
             #raise httplib2.HttpLib2Error([resp, prop_xml])
             raise requests.HTTPError([resp, prop_xml])
 
+    def iter_properties(self, connection, resource_uri, properties=None,
+                        depth='1'):
+        """ Generator version of get_properties. The reply is parsed as it
+            arrives from the server and a resource object is yielded for each
+            resource as soon as it has been read, so large collections never
+            have to be held in memory, either as XML or as objects.
+
+            :param connection: Connection Object
+            :type connection: Connection
+
+            :param resource_uri: the path of the resource / collection minus
+                                 the host section
+            :type resource_uri: String
+
+            :param properties: list of property names to get, as for
+                               get_properties. If left empty, will get all
+            :type properties: List
+
+            :param depth: '1' (the default) to list a collection and its
+                          members, '0' for the resource alone
+            :type depth: String
+
+        """
+        body = _propfind_body(properties)
+
+        if depth != '0' and resource_uri and resource_uri[-1] != '/':
+            resource_uri += '/'
+
+        resp, prop_xml = connection.send_propfind(resource_uri, body=body,
+                                                  depth=depth, stream=True)
+        if resp.status_code < 200 or resp.status_code >= 300:
+            raise requests.HTTPError([resp, resp.content])
+        try:
+            # Let urllib3 undo any Content-Encoding as it reads
+            resp.raw.decode_content = True
+            parser = python_webdav.parse.IterParser()
+            resources = parser.iterparse(resp.raw)
+            if connection.hooks:
+                resources = _timed_resources(connection, resp, resource_uri,
+                                             resources)
+            for resource in resources:
+                yield resource
+        finally:
+            resp.close()
+
     def get_property(self, connection, resource_uri, property_name):
         """ Get a property object
 
@@ -355,13 +1300,215 @@ class Client(object):
             Returns the property value as a string
 
         """
+        # Depth 0 on the exact path, so a property of one file in a large
+        # collection doesn't cost a listing of the collection
         property_obj = self.get_properties(connection, resource_uri,
-                                           [property_name])[0]
+                                           [property_name], depth='0')[0]
         requested_property_value = getattr(property_obj, property_name, '')
         return requested_property_value
 
+    def stat(self, connection, resource_uri, head=False):
+        """ Get the size, type, ETag and times of a single resource, with
+            one small request. A Depth 0 PROPFIND is sent for the exact
+            path given, asking only for STAT_PROPERTIES.
+
+            :param connection: Connection object
+            :type connection: Connection
+
+            :param resource_uri: the path of the resource / collection minus
+                                 the host section
+            :type resource_uri: String
+
+            :param head: If True, a HEAD request is sent instead. That is
+                         enough for the size, content type, ETag and last
+                         modified time of a file, and has no XML to parse,
+                         but won't say whether the resource is a
+                         collection, and has no creation date.
+            :type head: Boolean
+
+            Returns a ResourceStat. An HTTPError is raised if the resource
+            doesn't exist.
+
+        """
+        if head:
+            resp, content = connection.send_head(resource_uri)
+            if resp.status_code < 200 or resp.status_code >= 300:
+                raise requests.HTTPError([resp, content])
+            return ResourceStat.from_headers(resource_uri, resp.headers)
+        resource = self.get_properties(connection, resource_uri,
+                                       STAT_PROPERTIES, depth='0')[0]
+        return ResourceStat.from_resource(resource)
+
+    def get_properties_many(self, connection, resource_uris, properties,
+                            workers=DEFAULT_WALK_WORKERS):
+        """ Get properties of many resources with as few requests as
+            possible. The paths are grouped by the collection they are in,
+            and each collection holding more than one of them is listed with
+            a single Depth 1 PROPFIND. A path alone in its collection gets a
+            Depth 0 PROPFIND of its own, rather than a listing of the rest.
+
+            :param connection: Connection object
+            :type connection: Connection
+
+            :param resource_uris: paths of the resources minus the host
+                                  section
+            :type resource_uris: List
+
+            :param properties: list of property names to get, as for
+                               get_properties. Keep it short: the
+                               collections are listed with it, so every
+                               other member's properties come back too.
+            :type properties: List
+
+            :param workers: Number of PROPFIND requests in flight at once
+            :type workers: int
+
+            Returns a dict of resource objects keyed on the paths given.
+            Paths the server doesn't have are left out.
+
+        """
+        groups = {}
+        for resource_uri in resource_uris:
+            parent = posixpath.dirname(_path_key(resource_uri))
+            groups.setdefault(parent, []).append(resource_uri)
+
+        def fetch(paths):
+            if len(set(_path_key(path) for path in paths)) == 1:
+                uri, depth = paths[0], '0'
+            else:
+                parent = posixpath.dirname(paths[0].rstrip('/'))
+                uri, depth = parent.rstrip('/') + '/', '1'
+            try:
+                listing = self.get_properties(connection, uri, properties,
+                                              depth=depth)
+            except requests.HTTPError, err:
+                if error_status(err) != 404:
+                    raise
+                return []
+            found = dict((_path_key(href_to_path(connection, resource.href)),
+                          resource) for resource in listing)
+            return [(path, found[_path_key(path)]) for path in paths
+                    if _path_key(path) in found]
+
+        if not groups:
+            return {}
+        pool = ThreadPool(min(workers, len(groups)))
+        try:
+            results = pool.map(fetch, groups.values())
+        finally:
+            pool.close()
+            pool.join()
+        return dict(pair for pairs in results for pair in pairs)
+
+    def walk(self, connection, resource_uri, properties=None,
+             workers=DEFAULT_WALK_WORKERS, depth_infinity=True,
+             onerror=None):
+        """ Generator giving a resource object for resource_uri and for
+            everything below it.
+
+            The whole tree is asked for in one Depth: infinity PROPFIND
+            first, since that is the quickest way by far. Many servers
+            refuse those (Apache mod_dav does unless DavDepthInfinity is
+            on), in which case the collections are listed breadth first
+            with Depth 1 PROPFINDs, up to workers of them at a time.
+            Resources are yielded as each listing arrives, so the order
+            within a level depends on which replies come back first.
+
+            :param connection: Connection Object
+            :type connection: Connection
+
+            :param resource_uri: the path of the collection to walk, minus
+                                 the host section
+            :type resource_uri: String
+
+            :param properties: list of property names to get. If left empty,
+                               will get all. resourcetype is always added,
+                               since it is needed to find the collections.
+            :type properties: List
+
+            :param workers: Number of PROPFIND requests sent at once
+            :type workers: int
+
+            :param depth_infinity: Set to False to go straight to listing
+                                   one collection at a time
+            :type depth_infinity: Boolean
+
+            :param onerror: Function called with the error (an HTTPError or
+                            ConnectionError) if listing a collection fails.
+                            The walk then carries on without it. If not
+                            given, the error is raised.
+            :type onerror: function
+
+        """
+        if properties is not None and 'resourcetype' not in properties:
+            properties = list(properties) + ['resourcetype']
+
+        if depth_infinity:
+            listing = self.iter_properties(connection, resource_uri,
+                                           properties, depth='infinity')
+            try:
+                first = next(listing)
+            except StopIteration:
+                return
+            except requests.HTTPError, err:
+                if error_status(err) not in INFINITY_REFUSED:
+                    raise
+            else:
+                yield first
+                for resource in listing:
+                    yield resource
+                return
+
+        results = Queue.Queue()
+        pool = ThreadPool(workers)
+        try:
+            pending = 1
+            pool.apply_async(self._list_collection,
+                             (connection, resource_uri, properties),
+                             callback=results.put)
+            top = True
+            while pending:
+                collection_uri, listing, err = results.get()
+                pending -= 1
+                if err is not None:
+                    if (onerror is None or
+                            not isinstance(err, requests.RequestException)):
+                        raise err
+                    onerror(err)
+                    continue
+                for resource in listing:
+                    path = href_to_path(connection, resource.href)
+                    if _same_path(path, collection_uri):
+                        # Each collection is in its own listing as well as
+                        # its parent's. Only the top one is yielded from
+                        # its own.
+                        if not top:
+                            continue
+                    elif resource.resourcetype == 'collection':
+                        pending += 1
+                        pool.apply_async(self._list_collection,
+                                         (connection, path, properties),
+                                         callback=results.put)
+                    yield resource
+                top = False
+        finally:
+            pool.terminate()
+
+    def _list_collection(self, connection, collection_uri, properties):
+        """ List a collection for walk. Errors are handed back rather than
+            raised, so the walk can decide what to do with them (and isn't
+            left waiting for a reply that will never come).
+        """
+        try:
+            listing = self.get_properties(connection, collection_uri,
+                                          properties, depth='1')
+        except Exception, err:
+            return collection_uri, None, err
+        return collection_uri, listing, None
+
     def get_file(self, connection, resource_uri, local_file_name,
-                 extra_headers=None):
+                 extra_headers=None, stream=False,
+                 chunk_size=DEFAULT_CHUNK_SIZE, resume=False):
         """ Download file
 
             :param connection: Connection object
@@ -377,16 +1524,278 @@ class Client(object):
             :param extra_headers: Add any extra headers for the request here
             :type extra_headers: Dict
 
+            :param stream: If True, the resource is written to local_file_name
+                           chunk by chunk as it arrives, so memory use is
+                           bounded by chunk_size rather than the file size
+            :type stream: Boolean
+
+            :param chunk_size: Size of the blocks to read when streaming
+            :type chunk_size: int
+
+            :param resume: If True, the download is streamed and can be
+                           picked up where it left off if it is interrupted.
+                           See get_file_resumable.
+            :type resume: Boolean
+
+            Returns the response object.
+
+        """
+        if not extra_headers:
+            extra_headers = {}
+        if resume:
+            return self.get_file_resumable(connection, resource_uri,
+                                           local_file_name,
+                                           extra_headers=extra_headers,
+                                           chunk_size=chunk_size)
+        resp, data = connection.send_get(resource_uri, headers=extra_headers,
+                                         stream=stream, chunk_size=chunk_size)
+        file_fd = open(local_file_name, 'wb')
+        try:
+            if stream:
+                for chunk in data:
+                    file_fd.write(chunk)
+            else:
+                file_fd.write(data)
+        finally:
+            file_fd.close()
+            if stream:
+                resp.close()
+        return resp
+
+    def get_file_resumable(self, connection, resource_uri, local_file_name,
+                           extra_headers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        """ Download a file so that an interrupted download can be resumed.
+
+            While the download is in progress the ETag of the resource is
+            kept in local_file_name + RESUME_ETAG_SUFFIX. If that file is
+            found next to a partial local file, only the missing bytes are
+            asked for, with a Range header and an If-Range header holding the
+            ETag. Should the resource have changed since, the server sends the
+            whole of it and the local file is started again from scratch.
+            A partial file without a stored ETag (or with a weak one) cannot
+            be trusted and is always downloaded again in full.
+
+            :param connection: Connection object
+            :type connection: Connection
+
+            :param resource_uri: the path of the resource / collection minus
+                                 the host section
+            :type resource_uri: String
+
+            :param local_file_name: Local file where the resource will be saved
+            :type local_file_name: String
+
+            :param extra_headers: Add any extra headers for the request here
+            :type extra_headers: Dict
+
+            :param chunk_size: Size of the blocks to read from the network
+            :type chunk_size: int
+
+            Returns the response object.
+
+        """
+        if not extra_headers:
+            extra_headers = {}
+        etag_file_name = local_file_name + RESUME_ETAG_SUFFIX
+
+        offset = 0
+        etag = None
+        if os.path.exists(local_file_name) and os.path.exists(etag_file_name):
+            offset = os.path.getsize(local_file_name)
+            etag_file_fd = open(etag_file_name, 'r')
+            etag = etag_file_fd.read().strip()
+            etag_file_fd.close()
+
+        headers = dict(extra_headers)
+        if offset and etag:
+            headers['Range'] = 'bytes=%d-' % offset
+            headers['If-Range'] = etag
+            # Byte offsets refer to the unencoded resource
+            headers['Accept-Encoding'] = 'identity'
+
+        resp, chunks = connection.send_get(resource_uri, headers=headers,
+                                           stream=True, chunk_size=chunk_size)
+
+        if resp.status_code == 416 and 'Range' in headers:
+            # Nothing is left to fetch, the local file is already complete
+            resp.close()
+            os.remove(etag_file_name)
+            return resp
+        if resp.status_code < 200 or resp.status_code >= 300:
+            resp.close()
+            raise requests.HTTPError([resp, None])
+
+        if resp.status_code == 206 and 'Range' in headers:
+            if _content_range_start(resp) != offset:
+                resp.close()
+                raise requests.HTTPError([resp, None])
+            mode = 'ab'
+        else:
+            # Either a fresh download or the resource has changed
+            mode = 'wb'
+            etag = resp.headers.get('etag')
+            if not etag:
+                etag = self._fetch_properties(
+                    connection, resource_uri, ['getetag'], '0',
+                    python_webdav.parse.LxmlParser)[0].getetag
+            if etag and not etag.startswith('W/'):
+                etag_file_fd = open(etag_file_name, 'w')
+                etag_file_fd.write(etag)
+                etag_file_fd.close()
+            elif os.path.exists(etag_file_name):
+                os.remove(etag_file_name)
+
+        _write_chunks(resp, chunks, local_file_name, mode)
+        if os.path.exists(etag_file_name):
+            os.remove(etag_file_name)
+        return resp
+
+    def get_file_segmented(self, connection, resource_uri, local_file_name,
+                           segments=4, extra_headers=None,
+                           chunk_size=DEFAULT_CHUNK_SIZE,
+                           min_segment_size=1024 * 1024):
+        """ Download a file as several byte ranges fetched at the same time.
+            The size of the resource is taken from its getcontentlength
+            property, the local file is preallocated and each range is
+            written at its own offset as it arrives. If the server does not
+            honour the Range header the whole file is streamed in one go.
+
+            Every range is asked for with an If-Range header holding the
+            ETag read along with the size, so that a resource that changes
+            part way through is never pieced together from two versions:
+            the download is abandoned with an HTTPError instead, and the
+            local file removed. A resource without a strong ETag can't be
+            checked like that, so it is always streamed in one go.
+
+            Each segment uses its own connection from the pool of the
+            connection object, so segments should not exceed the pool size.
+
+            :param connection: Connection object
+            :type connection: Connection
+
+            :param resource_uri: the path of the resource / collection minus
+                                 the host section
+            :type resource_uri: String
+
+            :param local_file_name: Local file where the resource will be saved
+            :type local_file_name: String
+
+            :param segments: Number of ranges to fetch at the same time
+            :type segments: int
+
+            :param extra_headers: Add any extra headers for the request here
+            :type extra_headers: Dict
+
+            :param chunk_size: Size of the blocks to read from each segment
+            :type chunk_size: int
+
+            :param min_segment_size: Files are not split into segments
+                                     smaller than this
+            :type min_segment_size: int
+
+            Returns the response to the request for the first segment.
+
         """
         if not extra_headers:
             extra_headers = {}
-        resp, data = connection.send_get(resource_uri, headers=extra_headers)
-        file_fd = open(local_file_name, 'w')
-        file_fd.write(data)
-        file_fd.close()
+
+        resource = self._fetch_properties(connection, resource_uri,
+                                          ['getcontentlength', 'getetag'],
+                                          '0',
+                                          python_webdav.parse.LxmlParser)[0]
+        try:
+            size = int(resource.getcontentlength)
+        except (TypeError, ValueError):
+            size = 0
+        etag = getattr(resource, 'getetag', None)
+        segments = min(segments, size // max(min_segment_size, 1))
+        if segments < 2 or not etag or etag.startswith('W/'):
+            return self._get_single_stream(connection, resource_uri,
+                                           local_file_name, extra_headers,
+                                           chunk_size)
+
+        ranges = _split_ranges(size, segments)
+
+        # Ask for the first segment on its own to find out whether the
+        # server supports ranges before starting the others.
+        first_start, first_end = ranges[0]
+        resp, chunks = self._send_range_get(connection, resource_uri,
+                                            first_start, first_end,
+                                            extra_headers, chunk_size, etag)
+        if resp.status_code == 200:
+            # Either the Range header was ignored or the resource has
+            # changed since its size was read. Both ways, the whole of the
+            # current version is coming back.
+            _write_chunks(resp, chunks, local_file_name, 'wb')
+            return resp
+        _check_segment(resp, first_start, etag)
+
+        local_file_fd = open(local_file_name, 'wb')
+        local_file_fd.truncate(size)
+        local_file_fd.close()
+
+        try:
+            pool = ThreadPool(len(ranges) - 1)
+            try:
+                results = [pool.apply_async(self._get_segment,
+                                            (connection, resource_uri,
+                                             local_file_name, start, end,
+                                             extra_headers, chunk_size,
+                                             etag))
+                           for start, end in ranges[1:]]
+                pool.close()
+                _write_segment(resp, chunks, local_file_name, first_start,
+                               first_end)
+                for result in results:
+                    result.get()
+            finally:
+                pool.close()
+                pool.join()
+        except Exception:
+            # Whatever made it is no use on its own
+            os.remove(local_file_name)
+            raise
+        return resp
+
+    def _get_single_stream(self, connection, resource_uri, local_file_name,
+                           extra_headers, chunk_size):
+        """ Stream a whole resource to a local file, returning the response
+        """
+        resp, chunks = connection.send_get(resource_uri,
+                                           headers=extra_headers,
+                                           stream=True, chunk_size=chunk_size)
+        if resp.status_code != 200:
+            resp.close()
+            raise requests.HTTPError([resp, None])
+        _write_chunks(resp, chunks, local_file_name, 'wb')
+        return resp
+
+    def _get_segment(self, connection, resource_uri, local_file_name, start,
+                     end, extra_headers, chunk_size, etag):
+        """ Fetch bytes start to end (inclusive) of a resource and write them
+            at the same offset in the local file
+        """
+        resp, chunks = self._send_range_get(connection, resource_uri, start,
+                                            end, extra_headers, chunk_size,
+                                            etag)
+        _check_segment(resp, start, etag)
+        _write_segment(resp, chunks, local_file_name, start, end)
+
+    def _send_range_get(self, connection, resource_uri, start, end,
+                        extra_headers, chunk_size, etag):
+        """ Send a streamed GET for bytes start to end (inclusive) of the
+            version of the resource with the given ETag
+        """
+        headers = dict(extra_headers)
+        headers['Range'] = 'bytes=%d-%d' % (start, end)
+        headers['If-Range'] = etag
+        # Byte offsets refer to the unencoded resource
+        headers['Accept-Encoding'] = 'identity'
+        return connection.send_get(resource_uri, headers=headers, stream=True,
+                                   chunk_size=chunk_size)
 
     def send_file(self, connection, resource_uri, local_file_path,
-                  extra_headers=None):
+                  extra_headers=None, part_size=None, resume=False):
         """ Send file
 
             :param connection: Connection object
@@ -402,21 +1811,198 @@ class Client(object):
             :param extra_headers: Additional headers may be added here
             :type extra_headers: Dict
 
+            :param part_size: If given, the file is sent in parts of this
+                              size (see send_file_in_parts)
+            :type part_size: int
+
+            :param resume: Only used when sending in parts. Carry on from
+                           the last part the server has confirmed.
+            :type resume: Boolean
+
         """
 
-        # The file_wrapper is a file like object. It's purpose is to allow
-        # files to be sent in chunks, rather than read into memory as one
-        # whole thing. httplib2 currently does not support sending in parts
-        # well so this is a work around.
+        # send_put streams file objects in chunks, so the file is never
+        # read into memory as one whole thing.
         if not extra_headers:
             extra_headers = {}
 
-        local_file_fd = file_wrapper.FileWrapper(local_file_path, 'r')
-        data = local_file_fd.read()
-        resp, contents = connection.send_put(resource_uri, data)
+        if part_size:
+            return self.send_file_in_parts(connection, resource_uri,
+                                           local_file_path,
+                                           part_size=part_size, resume=resume,
+                                           extra_headers=extra_headers)
+
+        local_file_fd = open(local_file_path, 'rb')
+        try:
+            resp, contents = connection.send_put(resource_uri, local_file_fd,
+                                                 headers=extra_headers)
+        finally:
+            local_file_fd.close()
+            self._invalidate(connection, resource_uri)
+        return resp, contents
+
+    def send_file_in_parts(self, connection, resource_uri, local_file_path,
+                           part_size=DEFAULT_PART_SIZE, resume=False,
+                           retries=3, retry_delay=1, extra_headers=None):
+        """ Send a file as a series of PUT requests, each carrying one part.
+            The first part is a normal PUT, which replaces any existing
+            resource. The rest are sent with a Content-Range header so the
+            server writes them at their offset. This needs a server that
+            supports partial PUTs (Apache mod_dav and others do); servers
+            that don't should reject the Content-Range with a 400.
+
+            Each part is retried on its own if the connection fails or the
+            server answers with a 5xx error. While the upload is under way,
+            the size and modification time of the local file and the number
+            of bytes the server has confirmed are kept in
+            local_file_path + RESUME_UPLOAD_SUFFIX. If the upload is
+            abandoned, it can be carried on later with resume=True. Sending
+            then starts from the end of the confirmed parts, as long as the
+            record is for the same resource, the local file hasn't changed
+            since and the server still holds at least that much. Otherwise
+            the whole file is sent again.
+
+            Once the last part has been sent, the length of the remote
+            resource is checked against that of the local file, and an
+            HTTPError is raised if they differ (as they do when a server
+            ignores Content-Range and takes each part for the whole file).
+
+            :param connection: Connection object
+            :type connection: Connection
+
+            :param resource_uri: the path of the resource / collection minus
+                                 the host section
+            :type resource_uri: String
+
+            :param local_file_path: the path of the local file
+            :type local_file_path: String
+
+            :param part_size: Size of each part
+            :type part_size: int
+
+            :param resume: If True, skip the parts the server already has
+            :type resume: Boolean
+
+            :param retries: Number of times a part is resent before giving up
+            :type retries: int
+
+            :param retry_delay: Seconds to wait before the first retry. This
+                                grows with each further retry of a part.
+            :type retry_delay: int
+
+            :param extra_headers: Additional headers may be added here
+            :type extra_headers: Dict
+
+            Returns the response to the last part sent.
+
+        """
+        if not extra_headers:
+            extra_headers = {}
+        total = os.path.getsize(local_file_path)
+        if not total:
+            self._invalidate(connection, resource_uri)
+            return connection.send_put(resource_uri, '', headers=extra_headers)
+
+        journal_file_name = local_file_path + RESUME_UPLOAD_SUFFIX
+        journal = _upload_journal(local_file_path, resource_uri, 0)
+        start = 0
+        if resume:
+            start = self._confirmed_length(connection, resource_uri, journal,
+                                           _read_upload_journal(
+                                               journal_file_name))
+            # Always send at least the last part, so there is a response
+            start = min(start, ((total - 1) // part_size) * part_size)
+        if not start and os.path.exists(journal_file_name):
+            # Left by an earlier upload; none of it can be used now
+            os.remove(journal_file_name)
+
+        local_file_fd = open(local_file_path, 'rb')
+        try:
+            for part_start in range(start, total, part_size):
+                part_end = min(part_start + part_size, total) - 1
+                resp, contents = self._send_part(
+                    connection, resource_uri, local_file_fd, part_start,
+                    part_end, total, extra_headers, retries, retry_delay)
+                journal['confirmed'] = part_end + 1
+                _write_upload_journal(journal_file_name, journal)
+        finally:
+            local_file_fd.close()
+            self._invalidate(connection, resource_uri)
+
+        length = self._remote_length(connection, resource_uri)
+        os.remove(journal_file_name)
+        if length is not None and length != total:
+            raise requests.HTTPError(
+                'Sent %d bytes in parts but the server holds %d' % (
+                    total, length))
         return resp, contents
 
-    def copy_resource(self, connection, resource_path, resource_destination):
+    def _remote_length(self, connection, resource_uri):
+        """ Return the getcontentlength of a resource as an int, or None if
+            the server doesn't give one
+        """
+        try:
+            resource = self._fetch_properties(
+                connection, resource_uri, ['getcontentlength'], '0',
+                python_webdav.parse.LxmlParser)[0]
+            return int(resource.getcontentlength)
+        except (requests.HTTPError, IndexError, TypeError, ValueError):
+            return None
+
+    def _confirmed_length(self, connection, resource_uri, journal,
+                          previous):
+        """ Work out where an upload in parts can carry on from, using the
+            record kept of the previous attempt and the length of what the
+            server holds so far
+        """
+        if previous is None:
+            return 0
+        confirmed = previous.get('confirmed', 0)
+        for name in ('resource', 'size', 'mtime'):
+            if previous.get(name) != journal[name]:
+                # A different upload, or the local file has changed since
+                return 0
+        length = self._remote_length(connection, resource_uri)
+        if length is None or length < confirmed or length > journal['size']:
+            # Whatever is there now, it isn't what was sent
+            return 0
+        return confirmed
+
+    def _send_part(self, connection, resource_uri, local_file_fd, start, end,
+                   total, extra_headers, retries, retry_delay):
+        """ PUT bytes start to end (inclusive) of a file, retrying on
+            connection failures and server errors
+        """
+        headers = dict(extra_headers)
+        if start:
+            headers['Content-Range'] = 'bytes %d-%d/%d' % (start, end, total)
+        attempt = 0
+        while True:
+            local_file_fd.seek(start)
+            body = file_wrapper.ChunkedReader(local_file_fd,
+                                              length=end - start + 1)
+            try:
+                resp, contents = connection.send_put(resource_uri, body,
+                                                     headers=headers)
+            except requests.ConnectionError:
+                if attempt >= retries:
+                    raise
+            else:
+                if resp.status_code >= 200 and resp.status_code < 300:
+                    return resp, contents
+                # With Digest authentication a 401 means the nonce went
+                # stale while the part was being sent. The new one has
+                # been kept, so sending the part again will work.
+                stale = (resp.status_code == 401 and isinstance(
+                    connection.httpcon.auth, python_webdav.auth.DigestAuth))
+                if (resp.status_code < 500 and not stale) or \
+                        attempt >= retries:
+                    raise requests.HTTPError([resp, contents])
+            attempt += 1
+            time.sleep(retry_delay * attempt)
+
+    def copy_resource(self, connection, resource_path, resource_destination,
+                      depth='infinity', overwrite=True):
         """ Copy a resource from point a to point b on the server
 
             :param connection: Connection object
@@ -428,9 +2014,44 @@ class Client(object):
             :param resource_destination: Destination of the copied resource
             :type resource_destination: String
 
+            :param depth: 'infinity' (the default) to copy a collection and
+                          everything in it, '0' for the collection alone
+            :type depth: String
+
+            :param overwrite: If False, a resource already at the
+                              destination is left alone and the copy fails
+            :type overwrite: Boolean
+
         """
         resp, contents = connection.send_copy(resource_path,
-                                              resource_destination)
+                                              resource_destination,
+                                              depth=depth,
+                                              overwrite=overwrite)
+        self._invalidate(connection, resource_destination)
+        return resp, contents
+
+    def move_resource(self, connection, resource_path, resource_destination,
+                      overwrite=True):
+        """ Move (rename) a resource or collection on the server
+
+            :param connection: Connection object
+            :type connection: Connection
+
+            :param resource_path: Path to the required resource
+            :type resource_path: String
+
+            :param resource_destination: Where the resource is moved to
+            :type resource_destination: String
+
+            :param overwrite: If False, a resource already at the
+                              destination is left alone and the move fails
+            :type overwrite: Boolean
+
+        """
+        resp, contents = connection.send_move(resource_path,
+                                              resource_destination,
+                                              overwrite=overwrite)
+        self._invalidate(connection, resource_path, resource_destination)
         return resp, contents
 
     def delete_resource(self, connection, resource_uri):
@@ -444,8 +2065,178 @@ class Client(object):
 
         """
         resp, contents = connection.send_delete(resource_uri)
+        self._invalidate(connection, resource_uri)
+        return resp, contents
+
+    def make_collection(self, connection, resource_uri):
+        """ Make a collection (directory)
+
+            :param connection: Connection object
+            :type connection: Connection
+
+            :param resource_uri: URI of the new collection
+            :type resource_uri: String
+
+        """
+        resp, contents = connection.send_mkcol(resource_uri)
+        self._invalidate(connection, resource_uri)
+        return resp, contents
+
+    def remove_collection(self, connection, resource_uri):
+        """ Remove a collection (directory) and everything in it
+
+            :param connection: Connection object
+            :type connection: Connection
+
+            :param resource_uri: URI of the collection
+            :type resource_uri: String
+
+        """
+        resp, contents = connection.send_rmcol(resource_uri)
+        self._invalidate(connection, resource_uri)
         return resp, contents
 
+    def _bulk(self, method, connection, items, workers):
+        """ Call method(connection, item) for each item on a thread pool,
+            returning a BulkResult for each, in the same order
+        """
+        def run(item):
+            args = item if isinstance(item, tuple) else (item,)
+            try:
+                resp, contents = method(connection, *args)
+            except requests.RequestException, err:
+                return BulkResult(item, error=err)
+            error = None
+            # A 207 to DELETE, COPY or MOVE means some of the members of a
+            # collection failed
+            if resp.status_code < 200 or resp.status_code >= 300 or \
+                    resp.status_code == 207:
+                error = requests.HTTPError([resp, contents])
+            return BulkResult(item, resp, error)
+
+        items = list(items)
+        if not items:
+            return []
+        pool = ThreadPool(min(workers, len(items)))
+        try:
+            return pool.map(run, items)
+        finally:
+            pool.close()
+            pool.join()
+
+    def bulk_delete(self, connection, resource_uris,
+                    workers=DEFAULT_BULK_WORKERS):
+        """ Delete a number of resources, several at a time. A failure
+            doesn't stop the rest.
+
+            :param connection: Connection object
+            :type connection: Connection
+
+            :param resource_uris: URIs of the resources
+            :type resource_uris: List
+
+            :param workers: Number of requests sent at once
+            :type workers: int
+
+            Returns a list of BulkResult objects, one for each URI in the
+            same order
+
+        """
+        return self._bulk(self.delete_resource, connection, resource_uris,
+                          workers)
+
+    def bulk_copy(self, connection, resource_pairs,
+                  workers=DEFAULT_BULK_WORKERS, depth='infinity',
+                  overwrite=True):
+        """ Copy a number of resources, several at a time. A failure
+            doesn't stop the rest.
+
+            :param connection: Connection object
+            :type connection: Connection
+
+            :param resource_pairs: (source, destination) path pairs
+            :type resource_pairs: List
+
+            :param workers: Number of requests sent at once
+            :type workers: int
+
+            :param depth: Depth of each copy, as for copy_resource
+            :type depth: String
+
+            :param overwrite: Whether resources already at a destination
+                              are replaced, as for copy_resource
+            :type overwrite: Boolean
+
+            Returns a list of BulkResult objects, one for each pair in the
+            same order
+
+        """
+        def copy(connection, source, destination):
+            return self.copy_resource(connection, source, destination,
+                                      depth=depth, overwrite=overwrite)
+        return self._bulk(copy, connection,
+                          [tuple(pair) for pair in resource_pairs], workers)
+
+    def bulk_move(self, connection, resource_pairs,
+                  workers=DEFAULT_BULK_WORKERS, overwrite=True):
+        """ Move a number of resources, several at a time. A failure
+            doesn't stop the rest.
+
+            :param connection: Connection object
+            :type connection: Connection
+
+            :param resource_pairs: (source, destination) path pairs
+            :type resource_pairs: List
+
+            :param workers: Number of requests sent at once
+            :type workers: int
+
+            :param overwrite: Whether resources already at a destination
+                              are replaced, as for move_resource
+            :type overwrite: Boolean
+
+            Returns a list of BulkResult objects, one for each pair in the
+            same order
+
+        """
+        def move(connection, source, destination):
+            return self.move_resource(connection, source, destination,
+                                      overwrite=overwrite)
+        return self._bulk(move, connection,
+                          [tuple(pair) for pair in resource_pairs], workers)
+
+    def bulk_mkdir(self, connection, resource_uris,
+                   workers=DEFAULT_BULK_WORKERS):
+        """ Make a number of collections. The collections at each level are
+            made together, and a level is only started once the one above
+            it is done, so a collection can be listed along with its
+            parents.
+
+            :param connection: Connection object
+            :type connection: Connection
+
+            :param resource_uris: URIs of the new collections
+            :type resource_uris: List
+
+            :param workers: Number of requests sent at once
+            :type workers: int
+
+            Returns a list of BulkResult objects, one for each URI in the
+            same order
+
+        """
+        resource_uris = list(resource_uris)
+        levels = {}
+        for resource_uri in resource_uris:
+            level = resource_uri.strip('/').count('/')
+            levels.setdefault(level, []).append(resource_uri)
+        results = {}
+        for level in sorted(levels):
+            for result in self._bulk(self.make_collection, connection,
+                                     levels[level], workers):
+                results[result.item] = result
+        return [results[resource_uri] for resource_uri in resource_uris]
+
     def get_lock(self, resource_uri, connection):
         """ Get a file lock
 
@@ -9,8 +9,47 @@
     This object also helps to get around the problem of getting progress
     back from httplib2 and httplib. It is possible to provide a callback
     function and a callback size.
+
+    ChunkedReader is used to stream request bodies. It wraps either a file
+    like object or any iterable of strings and hands the data out a block at
+    a time, so the body never has to be held in memory.
+
+    gzip_chunks compresses a body for a PUT sent with Content-Encoding:
+    gzip, a block at a time.
+
+    spool copies a streamed body into a temporary file, for when it may
+    have to be sent more than once.
 """
 import os
+import tempfile
+import zlib
+
+# Size of the blocks that streamed request and response bodies are broken
+# into
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# zlib compression level used for gzip encoded request bodies
+DEFAULT_COMPRESS_LEVEL = 6
+
+
+def gzip_chunks(chunks, level=DEFAULT_COMPRESS_LEVEL):
+    """ Compress an iterable of strings into the gzip format, yielding the
+        compressed data as it is produced
+
+        :param chunks: The data to compress
+        :type chunks: iterable
+
+        :param level: zlib compression level, from 1 (fastest) to 9
+        :type level: int
+    """
+    # A window size of 16 + MAX_WBITS gives a gzip header and trailer
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
 
 class FileWrapper(file):
     """ This is currently required because httplib2 does not allow easy use of
@@ -74,3 +113,132 @@ class FileWrapper(file):
             self.callback(percent)
 
         return data
+
+
+class ChunkedReader(object):
+    """ A file like object that reads its data from a file like object or
+        any iterable of strings in chunks. If the length of the data is
+        known (or can be worked out from the file), only that many bytes will
+        ever be read, which also stops a rewinding FileWrapper from being
+        sent twice. If the source is a seekable file like object, the reader
+        can be rewound with seek, so that the body can be sent again.
+
+        :param source: File like object or iterable providing the data
+        :type source: file or iterable
+
+        :param chunk_size: Size of the blocks handed out when iterating
+        :type chunk_size: int
+
+        :param length: Number of bytes that will be read from source. If not
+                       given, it is worked out for seekable file like
+                       objects and left as None otherwise.
+        :type length: int
+    """
+    def __init__(self, source, chunk_size=DEFAULT_CHUNK_SIZE, length=None):
+        self.source = source
+        self.chunk_size = chunk_size
+        if length is None:
+            length = self._find_length(source)
+        self.length = length
+        self.bytes_read = 0
+
+        self._buffer = ''
+        # Where the data starts in a seekable source, or None if it can't
+        # be rewound
+        self._start = None
+        if hasattr(source, 'read'):
+            self._iterator = None
+            try:
+                self._start = source.tell()
+            except (AttributeError, IOError, OSError):
+                pass
+        else:
+            self._iterator = iter(source)
+
+    @staticmethod
+    def _find_length(source):
+        """ Work out how much data is left in a file like object, or return
+            None if that can't be done without reading it
+        """
+        if not hasattr(source, 'read'):
+            return None
+        try:
+            return os.fstat(source.fileno()).st_size - source.tell()
+        except (AttributeError, IOError, OSError):
+            pass
+        try:
+            position = source.tell()
+            source.seek(0, os.SEEK_END)
+            end = source.tell()
+            source.seek(position)
+            return end - position
+        except (AttributeError, IOError, OSError):
+            return None
+
+    def __len__(self):
+        if self.length is None:
+            raise TypeError('Length of the source is not known')
+        return self.length
+
+    def __iter__(self):
+        while True:
+            data = self.read(self.chunk_size)
+            if not data:
+                break
+            yield data
+
+    def tell(self):
+        """ Return the number of bytes read so far
+        """
+        return self.bytes_read
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        """ Go back (or forward) to offset bytes from the start of the data.
+            Raises IOError if the source can't be rewound.
+        """
+        if whence != os.SEEK_SET:
+            raise IOError('Only seeking from the start is supported')
+        if self._start is None:
+            raise IOError('The source can not be rewound')
+        self.source.seek(self._start + offset)
+        self.bytes_read = offset
+
+    def read(self, size=-1):
+        """ Read up to size bytes. If size is negative, a single chunk is
+            returned rather than the whole of the source.
+        """
+        if size is None or size < 0:
+            size = self.chunk_size
+        if self.length is not None:
+            size = min(size, self.length - self.bytes_read)
+        if size <= 0:
+            return ''
+
+        if self._iterator is None:
+            data = self.source.read(size)
+        else:
+            while len(self._buffer) < size:
+                try:
+                    self._buffer += next(self._iterator)
+                except StopIteration:
+                    break
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+
+        self.bytes_read += len(data)
+        return data
+
+
+def spool(chunks):
+    """ Copy an iterable of strings into a temporary file and return the
+        file, rewound to its start. Unlike the iterable, the file can be
+        read again to send it more than once. It is deleted when closed.
+    """
+    spool_fd = tempfile.TemporaryFile()
+    try:
+        for chunk in chunks:
+            spool_fd.write(chunk)
+        spool_fd.seek(0)
+    except Exception:
+        spool_fd.close()
+        raise
+    return spool_fd
@@ -0,0 +1,265 @@
+""" instrument.py
+    This file contains the records handed to the instrumentation hooks of a
+    Connection, and Collector, a hook that adds them up.
+
+    A hook is any callable taking one Timing. Install it with
+    Connection.add_hook, or in the hooks setting. Every request sent over
+    the connection is then timed, and so is the parsing of every PROPFIND
+    reply. Nothing is timed or recorded while a connection has no hooks.
+
+    Usage::
+
+        collector = Collector()
+        connection.add_hook(collector)
+        client.ls()
+        print collector.report()
+"""
+import threading
+import time
+
+import requests.adapters
+from requests.packages.urllib3.connection import HTTPConnection
+from requests.packages.urllib3.connection import HTTPSConnection
+from requests.packages.urllib3.connectionpool import HTTPConnectionPool
+from requests.packages.urllib3.connectionpool import HTTPSConnectionPool
+
+# Kinds of Timing
+REQUEST = 'request'
+PARSE = 'parse'
+
+# Seconds the last new connection took to open, per thread. The
+# connection is opened in the thread sending the request, so this is read
+# back by Connection._send_request once the reply has arrived.
+_connect_times = threading.local()
+
+
+def reset_connect_time():
+    """ Forget the time the last connection in this thread took to open
+    """
+    _connect_times.seconds = None
+
+
+def last_connect_time():
+    """ Return the seconds the last connection opened in this thread took,
+        or None if none has been opened since reset_connect_time
+    """
+    return getattr(_connect_times, 'seconds', None)
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        start = time.time()
+        HTTPConnection.connect(self)
+        _connect_times.seconds = time.time() - start
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        start = time.time()
+        HTTPSConnection.connect(self)
+        _connect_times.seconds = time.time() - start
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(requests.adapters.HTTPAdapter):
+    """ An HTTPAdapter whose connections note how long they took to open
+        (see last_connect_time). This costs two calls to time.time() per
+        new connection and nothing per request.
+    """
+    def init_poolmanager(self, *args, **kwargs):
+        requests.adapters.HTTPAdapter.init_poolmanager(self, *args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool}
+
+
+class Timing(object):
+    """ What a request, or the parsing of a reply, cost. Times are in
+        seconds, and are None where they don't apply or weren't measured.
+
+        :param kind: REQUEST or PARSE
+        :type kind: String
+
+        :param method: Request method, such as PROPFIND
+        :type method: String
+
+        :param path: Path (without host) the request was sent to
+        :type path: String
+
+        Request timings have:
+
+            * status - Status code of the reply, None if it failed
+            * bytes_sent - Size of the request body. None for a streamed
+              body that hadn't been fully read.
+            * bytes_received - Size of the reply body as it came over the
+              network, before any Content-Encoding was undone. None for a
+              streamed reply, which is read after the timing is handed out.
+            * connect_time - Time taken to open a new connection, or None
+              if one from the pool was used
+            * ttfb - Time until the headers of the reply had arrived
+            * total_time - Time until the whole reply had been read, or
+              until its headers had arrived for a streamed reply
+            * error - The exception raised, if the request failed
+
+        Parse timings have the status, the parse_time and the number of
+        resources read. For a reply parsed as it is streamed, the
+        parse_time includes the time spent waiting for the network.
+    """
+    __slots__ = ('kind', 'method', 'path', 'status', 'bytes_sent',
+                 'bytes_received', 'connect_time', 'ttfb', 'total_time',
+                 'parse_time', 'resources', 'error')
+
+    def __init__(self, kind, method, path, status=None, bytes_sent=None,
+                 bytes_received=None, connect_time=None, ttfb=None,
+                 total_time=None, parse_time=None, resources=None,
+                 error=None):
+        self.kind = kind
+        self.method = method
+        self.path = path
+        self.status = status
+        self.bytes_sent = bytes_sent
+        self.bytes_received = bytes_received
+        self.connect_time = connect_time
+        self.ttfb = ttfb
+        self.total_time = total_time
+        self.parse_time = parse_time
+        self.resources = resources
+        self.error = error
+
+    @property
+    def seconds(self):
+        """ The total_time of a request or the parse_time of a parse
+        """
+        if self.kind == PARSE:
+            return self.parse_time
+        return self.total_time
+
+    def __repr__(self):
+        if self.kind == PARSE:
+            return '<Timing parse %s %s %d resources %.6fs>' % (
+                self.method, self.path, self.resources or 0,
+                self.parse_time or 0)
+        return '<Timing %s %s %s %.6fs>' % (self.method, self.path,
+                                             self.status,
+                                             self.total_time or 0)
+
+
+class _Totals(object):
+    """ Running totals for one kind and method in a Collector
+    """
+    __slots__ = ('count', 'errors', 'connects', 'bytes_sent',
+                 'bytes_received', 'resources', 'seconds', 'ttfb',
+                 'connect_time', 'minimum', 'maximum', 'statuses')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.connects = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.resources = 0
+        self.seconds = 0.0
+        self.ttfb = 0.0
+        self.connect_time = 0.0
+        self.minimum = None
+        self.maximum = None
+        self.statuses = {}
+
+    def add(self, timing):
+        self.count += 1
+        if timing.error is not None:
+            self.errors += 1
+        if timing.connect_time is not None:
+            self.connects += 1
+            self.connect_time += timing.connect_time
+        self.bytes_sent += timing.bytes_sent or 0
+        self.bytes_received += timing.bytes_received or 0
+        self.resources += timing.resources or 0
+        self.ttfb += timing.ttfb or 0
+        seconds = timing.seconds or 0
+        self.seconds += seconds
+        if self.minimum is None or seconds < self.minimum:
+            self.minimum = seconds
+        if self.maximum is None or seconds > self.maximum:
+            self.maximum = seconds
+        self.statuses[timing.status] = self.statuses.get(timing.status,
+                                                         0) + 1
+
+    def as_dict(self):
+        return {'count': self.count,
+                'errors': self.errors,
+                'connects': self.connects,
+                'bytes_sent': self.bytes_sent,
+                'bytes_received': self.bytes_received,
+                'resources': self.resources,
+                'total': self.seconds,
+                'mean': self.seconds / self.count,
+                'min': self.minimum,
+                'max': self.maximum,
+                'mean_ttfb': self.ttfb / self.count,
+                'connect_time': self.connect_time,
+                'statuses': dict(self.statuses)}
+
+
+class Collector(object):
+    """ A hook that adds up the timings it is given, per kind and method.
+        It can be shared by several connections and threads.
+
+        :param keep: Number of the latest timings to keep in the timings
+                     attribute, as well as adding them up. 0 keeps none.
+        :type keep: int
+    """
+    def __init__(self, keep=0):
+        self.keep = keep
+        self.timings = []
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, timing):
+        with self._lock:
+            key = (timing.kind, timing.method)
+            totals = self._totals.get(key)
+            if totals is None:
+                totals = self._totals[key] = _Totals()
+            totals.add(timing)
+            if self.keep:
+                self.timings.append(timing)
+                del self.timings[:-self.keep]
+
+    def reset(self):
+        """ Forget everything collected so far
+        """
+        with self._lock:
+            self._totals = {}
+            self.timings = []
+
+    def summary(self):
+        """ Return the totals as a dict keyed on (kind, method). Each value
+            is a dict of count, errors, connects, bytes_sent,
+            bytes_received, resources, total, mean, min, max, mean_ttfb,
+            connect_time and statuses (a count of each status code).
+        """
+        with self._lock:
+            return dict((key, totals.as_dict())
+                        for key, totals in self._totals.items())
+
+    def report(self):
+        """ Return the totals as a table of text, one line per kind and
+            method
+        """
+        lines = ['%-8s %-10s %7s %6s %12s %12s %10s %10s %10s' % (
+            'kind', 'method', 'count', 'errors', 'sent', 'received',
+            'total', 'mean', 'max')]
+        for (kind, method), totals in sorted(self.summary().items()):
+            lines.append('%-8s %-10s %7d %6d %12d %12d %10.4f %10.4f %10.4f' %
+                         (kind, method, totals['count'], totals['errors'],
+                          totals['bytes_sent'], totals['bytes_received'],
+                          totals['total'], totals['mean'], totals['max']))
+        return '\n'.join(lines)
@@ -2,10 +2,39 @@
     Module for some of the webdav response parsing requirements
 """
 import re
+from array import array
+from StringIO import StringIO
 
-from lxml.etree import ElementTree, HTML
+from lxml.etree import ElementTree, HTML, XMLParser, fromstring, iterparse
 from BeautifulSoup import BeautifulStoneSoup
 
+DAV_NS = 'DAV:'
+APACHE_NS = 'http://apache.org/dav/props/'
+
+# Clark notation ({namespace}name) tags, as used by lxml
+HREF = '{DAV:}href'
+STATUS = '{DAV:}status'
+RESPONSE = '{DAV:}response'
+PROPSTAT = '{DAV:}propstat'
+PROP = '{DAV:}prop'
+RESOURCETYPE = '{DAV:}resourcetype'
+COLLECTION = '{DAV:}collection'
+SUPPORTEDLOCK = '{DAV:}supportedlock'
+LOCKENTRY = '{DAV:}lockentry'
+LOCKSCOPE = '{DAV:}lockscope'
+LOCKTYPE = '{DAV:}locktype'
+
+# Properties whose text is stored as it is, and the Response attribute
+# each one is stored in
+TEXT_PROPERTIES = {
+    '{DAV:}creationdate': 'creationdate',
+    '{DAV:}getcontentlength': 'getcontentlength',
+    '{DAV:}getlastmodified': 'getlastmodified',
+    '{DAV:}getetag': 'getetag',
+    '{DAV:}getcontenttype': 'getcontenttype',
+    '{%s}executable' % APACHE_NS: 'executable',
+}
+
 
 class Response(object):
     """ Response objects are for storing information about resources
@@ -38,6 +67,120 @@ class Lock(object):
         self.lockscope = None
 
 
+class ListingRow(object):
+    """ A view of one resource in a ListingResult. It has the same
+        attributes as a Response object, read from the columns of the
+        listing when they are asked for.
+    """
+    __slots__ = ('_listing', '_index')
+
+    def __init__(self, listing, index):
+        self._listing = listing
+        self._index = index
+
+    def __getattr__(self, name):
+        return self._listing.get_value(name, self._index)
+
+    @property
+    def locks(self):
+        """ A list of Lock objects for the resource
+        """
+        locks = []
+        for locktype, lockscope in self._listing.lock_column[self._index]:
+            lock_obj = Lock()
+            lock_obj.locktype = locktype
+            lock_obj.lockscope = lockscope
+            locks.append(lock_obj)
+        return locks
+
+
+class ListingResult(object):
+    """ A compact, column oriented store for the resources of a listing.
+        Rather than one Response object (with its own __dict__) per
+        resource, there is one list per property. Values that repeat from
+        resource to resource, such as content types, status lines and lock
+        entries, are only stored once, and content lengths are kept in an
+        array of numbers.
+
+        Iterating over a ListingResult, or indexing it, gives ListingRow
+        objects which can be used just like Response objects.
+
+        :param responses: Response objects to add to the listing
+        :type responses: iterable
+    """
+    # Columns holding values that are shared between many resources
+    SHARED_COLUMNS = ('resourcetype', 'getcontenttype', 'executable',
+                      'status')
+    UNIQUE_COLUMNS = ('href', 'creationdate', 'getlastmodified', 'getetag')
+
+    def __init__(self, responses=None):
+        self.columns = {}
+        for name in self.SHARED_COLUMNS + self.UNIQUE_COLUMNS:
+            self.columns[name] = []
+        # Content lengths, with -1 standing for no content length. Doubles
+        # rather than longs, which are only 32 bits on some platforms (and
+        # there is no 64 bit integer type code in Python 2). They hold
+        # every length up to 2 ** 53 exactly.
+        self.length_column = array('d')
+        self.lock_column = []
+        self._shared_values = {}
+
+        if responses is not None:
+            for response in responses:
+                self.append(response)
+
+    def _shared(self, value):
+        return self._shared_values.setdefault(value, value)
+
+    def append(self, response):
+        """ Add a resource to the listing
+
+            :param response: The resource to add
+            :type response: Response
+
+        """
+        for name in self.SHARED_COLUMNS:
+            self.columns[name].append(self._shared(getattr(response, name)))
+        for name in self.UNIQUE_COLUMNS:
+            self.columns[name].append(getattr(response, name))
+
+        length = response.getcontentlength
+        try:
+            self.length_column.append(int(length))
+        except (TypeError, ValueError):
+            self.length_column.append(-1)
+
+        self.lock_column.append(self._shared(tuple(
+            (lock.locktype, lock.lockscope) for lock in response.locks)))
+
+    def get_value(self, name, index):
+        """ Get the value of a property for the resource at index
+        """
+        if name == 'getcontentlength':
+            length = self.length_column[index]
+            if length < 0:
+                return None
+            return str(int(length))
+        try:
+            return self.columns[name][index]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __len__(self):
+        return len(self.length_column)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError('ListingResult index out of range')
+        return ListingRow(self, index)
+
+    def __iter__(self):
+        for index in xrange(len(self)):
+            yield ListingRow(self, index)
+
+
 class LxmlParser(object):
     """ Parser for the Webdav replies
     """
@@ -138,9 +281,16 @@ class SoupParser(object):
             new_response.href = response.find(re.compile(r'(?i)[a-z0-9]:href'))
 
             # Figure out if this response is for a file (resource) or a
-            # directory (collection).
-            new_response.resourcetype = response.find(
-                re.compile(r'(?i)[a-z0-9]:resourcetype')).findChild().name.split(':')[-1]
+            # directory (collection). An empty resourcetype has no child,
+            # and BeautifulStoneSoup nests the properties that follow a
+            # self-closed one inside it, so look for the collection.
+            resourcetype = response.find(
+                re.compile(r'(?i)[a-z0-9]:resourcetype'))
+            if resourcetype is not None and resourcetype.find(
+                    re.compile(r'(?i)[a-z0-9]:collection')) is not None:
+                new_response.resourcetype = 'collection'
+            else:
+                new_response.resourcetype = 'resource'
 
             if new_response.resourcetype == 'resource':
                 new_response.executable = getattr(
@@ -171,3 +321,148 @@ class SoupParser(object):
             self.response_objects.append(new_response)
 
         return self.response_objects
+
+
+def _local_name(tag):
+    """ Strip the namespace from a Clark notation tag
+    """
+    return tag.rsplit('}', 1)[-1]
+
+
+def response_from_element(element):
+    """ Build a Response object from a DAV:response element, visiting each
+        of its descendants once and dispatching on their (namespaced) tag.
+
+        :param element: A {DAV:}response element
+        :type element: lxml.etree._Element
+
+        :return: Response
+    """
+    new_response = Response()
+    new_response.resourcetype = 'resource'
+    for child in element:
+        tag = child.tag
+        if tag == HREF:
+            if new_response.href is None:
+                new_response.href = child.text
+        elif tag == PROPSTAT:
+            for propstat_child in child:
+                if propstat_child.tag == PROP:
+                    _read_properties(new_response, propstat_child)
+                elif (propstat_child.tag == STATUS and
+                      new_response.status is None):
+                    new_response.status = propstat_child.text
+        elif tag == STATUS and new_response.status is None:
+            new_response.status = child.text
+
+    if new_response.resourcetype == 'collection':
+        new_response.executable = None
+    return new_response
+
+
+def _read_properties(new_response, prop_element):
+    """ Copy the properties in a DAV:prop element on to a Response
+    """
+    for prop in prop_element:
+        tag = prop.tag
+        name = TEXT_PROPERTIES.get(tag)
+        if name is not None:
+            setattr(new_response, name, prop.text)
+        elif tag == RESOURCETYPE:
+            for resource_type in prop:
+                if resource_type.tag == COLLECTION:
+                    new_response.resourcetype = 'collection'
+        elif tag == SUPPORTEDLOCK:
+            for lockentry in prop:
+                if lockentry.tag != LOCKENTRY:
+                    continue
+                lock_obj = Lock()
+                for lock_child in lockentry:
+                    if lock_child.tag == LOCKTYPE and len(lock_child):
+                        lock_obj.locktype = _local_name(lock_child[-1].tag)
+                    elif lock_child.tag == LOCKSCOPE and len(lock_child):
+                        lock_obj.lockscope = _local_name(lock_child[-1].tag)
+                new_response.locks.append(lock_obj)
+
+
+class FastParser(object):
+    """ Parser for the Webdav replies. The reply is parsed as XML (with
+        namespaces) and each response element is read in a single pass
+        over its children, dispatching on the tag of each one. This is
+        much quicker than LxmlParser on large listings, which searches
+        the document for every property of every response, but unlike it
+        the reply must be well formed XML.
+    """
+    def __init__(self):
+        """ No inputs
+
+        """
+        self.response_objects = []
+        self._xml_parser = XMLParser(resolve_entities=False, no_network=True,
+                                     huge_tree=True)
+
+    def parse(self, data):
+        """ Parse a webdav reply. Retrieve any resources as objects
+            and return them as a list.
+
+            :param data: The webdav reply to parse
+            :type data: String
+
+
+            :return: self.response_objects
+
+        """
+        if isinstance(data, unicode):
+            data = data.encode('utf-8')
+        root = fromstring(data, parser=self._xml_parser)
+        self.response_objects = [response_from_element(element)
+                                 for element in root.iterchildren(RESPONSE)]
+        return self.response_objects
+
+
+class IterParser(object):
+    """ Incremental parser for the Webdav replies. Rather than building the
+        whole multistatus tree first, it reads the reply from a file like
+        object (such as the raw stream of a response) and yields a Response
+        for each resource as soon as its element is complete. Elements are
+        thrown away once they have been turned into a Response, so memory
+        use does not grow with the number of resources in the reply.
+    """
+    def __init__(self):
+        """ No inputs
+
+        """
+        self.response_objects = []
+
+    def iterparse(self, source):
+        """ Parse a webdav reply, yielding a Response for each resource.
+
+            :param source: The webdav reply to parse
+            :type source: file like object or String
+
+        """
+        if isinstance(source, basestring):
+            source = StringIO(source)
+        for event, element in iterparse(source, events=('end',),
+                                        tag=RESPONSE, resolve_entities=False,
+                                        no_network=True):
+            new_response = response_from_element(element)
+            # Free the element and any siblings already dealt with
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+            yield new_response
+
+    def parse(self, data):
+        """ Parse a webdav reply. Retrieve any resources as objects
+            and return them as a list.
+
+            :param data: The webdav reply to parse
+            :type data: String
+
+
+            :return: self.response_objects
+
+        """
+        self.response_objects = list(self.iterparse(data))
+        return self.response_objects
@@ -0,0 +1,483 @@
+""" sync.py
+    This file contains the Sync object, which mirrors a local directory to
+    a WebDAV collection (push) or a WebDAV collection to a local directory
+    (pull), moving only what is new or has changed.
+
+    Files are compared on size and modification time. A manifest kept in
+    the local directory also records the ETag each file had after it was
+    last synced, so a change on the server is spotted even when the size
+    and time look the same.
+"""
+import json
+import os
+import shutil
+import tempfile
+import threading
+import urllib
+from multiprocessing.pool import ThreadPool
+
+import requests
+
+import python_webdav.connection as conn
+
+# Name of the manifest file kept in the local directory
+MANIFEST_NAME = '.webdav-sync.json'
+
+# Prefix of the temporary files downloads are written to before being
+# moved into place
+TEMP_PREFIX = '.webdav-sync-'
+
+# Number of files transferred at once
+DEFAULT_SYNC_WORKERS = 4
+
+# Kinds of SyncAction
+UPLOAD = 'upload'
+DOWNLOAD = 'download'
+MAKE_REMOTE_DIR = 'mkdir-remote'
+MAKE_LOCAL_DIR = 'mkdir-local'
+DELETE_REMOTE = 'delete-remote'
+DELETE_LOCAL = 'delete-local'
+
+
+class FileState(object):
+    """ Size, modification time and ETag of a file on one side of a sync
+    """
+    __slots__ = ('size', 'mtime', 'etag')
+
+    def __init__(self, size, mtime, etag=None):
+        self.size = size
+        self.mtime = mtime
+        self.etag = etag
+
+
+class SyncAction(object):
+    """ One step of a sync plan
+
+        :param action: What to do, such as UPLOAD or DELETE_REMOTE
+        :type action: String
+
+        :param path: Path of the file or directory, relative to the
+                     directories being synced and separated by '/'
+        :type path: String
+
+        :param reason: Why it needs doing, for the plan output
+        :type reason: String
+
+        :param state: The FileState of the file being copied, if any
+        :type state: FileState
+    """
+    def __init__(self, action, path, reason='', state=None):
+        self.action = action
+        self.path = path
+        self.reason = reason
+        self.state = state
+        # Set once the action has been carried out
+        self.done = False
+        self.error = None
+
+    def __repr__(self):
+        return '<SyncAction %s %s>' % (self.action, self.path)
+
+    def __str__(self):
+        line = '%-13s %s' % (self.action, self.path)
+        if self.reason:
+            line += ' (%s)' % self.reason
+        if self.error is not None:
+            line += ' FAILED: %s' % (self.error,)
+        return line
+
+
+def format_plan(plan):
+    """ Return a sync plan as text, one action per line
+    """
+    return '\n'.join(str(action) for action in plan)
+
+
+class Manifest(object):
+    """ The state of each file after it was last synced, kept as JSON in
+        the local directory. A manifest written for a different remote
+        collection is ignored.
+
+        :param file_name: Path of the manifest file
+        :type file_name: String
+
+        :param remote: URL of the remote collection
+        :type remote: String
+    """
+    def __init__(self, file_name, remote):
+        self.file_name = file_name
+        self.remote = remote
+        self.entries = {}
+        self._lock = threading.Lock()
+        try:
+            manifest_fd = open(file_name, 'r')
+            try:
+                data = json.load(manifest_fd)
+            finally:
+                manifest_fd.close()
+        except (IOError, ValueError):
+            return
+        if data.get('remote') == remote:
+            for path, (size, mtime, etag) in data.get('files', {}).items():
+                self.entries[path] = FileState(size, mtime, etag)
+
+    def get(self, path):
+        return self.entries.get(path)
+
+    def set(self, path, state):
+        with self._lock:
+            self.entries[path] = state
+
+    def remove(self, path):
+        with self._lock:
+            for entry_path in list(self.entries):
+                if entry_path == path or entry_path.startswith(path + '/'):
+                    del self.entries[entry_path]
+
+    def save(self):
+        """ Write the manifest, replacing the old one in one step
+        """
+        with self._lock:
+            files = dict((path, [state.size, state.mtime, state.etag])
+                         for path, state in self.entries.items())
+        directory = os.path.dirname(self.file_name) or '.'
+        temp_fd, temp_name = tempfile.mkstemp(prefix=TEMP_PREFIX,
+                                              dir=directory)
+        manifest_fd = os.fdopen(temp_fd, 'w')
+        try:
+            json.dump(dict(remote=self.remote, files=files), manifest_fd)
+        finally:
+            manifest_fd.close()
+        os.rename(temp_name, self.file_name)
+
+
+class Sync(object):
+    """ Mirror a local directory and a remote collection in either
+        direction.
+
+        :param connection: Connection object
+        :type connection: Connection
+
+        :param local_dir: Path of the local directory
+        :type local_dir: String
+
+        :param remote_dir: Path of the remote collection, minus the host
+                           section
+        :type remote_dir: String
+
+        :param client: connection.Client to use. A new one is made if not
+                       given.
+        :type client: Client
+
+        :param workers: Number of files transferred at once
+        :type workers: int
+
+        :param delete: If True, files that are only on the side being
+                       synced to are deleted
+        :type delete: Boolean
+
+        :param use_manifest: Set to False to compare on size and time alone
+                             and not keep a manifest
+        :type use_manifest: Boolean
+    """
+    def __init__(self, connection, local_dir, remote_dir, client=None,
+                 workers=DEFAULT_SYNC_WORKERS, delete=False,
+                 use_manifest=True):
+        self.connection = connection
+        self.local_dir = local_dir
+        self.remote_dir = '/' + remote_dir.strip('/')
+        self.client = client or conn.Client()
+        self.workers = workers
+        self.delete = delete
+        self.manifest = None
+        if use_manifest:
+            remote_url = '%s%s' % (connection.host.rstrip('/'),
+                                   self.remote_dir)
+            self.manifest = Manifest(os.path.join(local_dir, MANIFEST_NAME),
+                                     remote_url)
+
+    def _remote_path(self, path):
+        return '%s/%s' % (self.remote_dir.rstrip('/'), path)
+
+    def _local_path(self, path):
+        return os.path.join(self.local_dir, *path.split('/'))
+
+    def _local_tree(self):
+        """ Return a dict of relative path to FileState for the local
+            files, and a set of the relative paths of the directories
+        """
+        files = {}
+        dirs = set()
+        if not os.path.isdir(self.local_dir):
+            return files, dirs
+        for dir_path, dir_names, file_names in os.walk(self.local_dir):
+            relative = os.path.relpath(dir_path, self.local_dir)
+            prefix = '' if relative == '.' else \
+                relative.replace(os.sep, '/') + '/'
+            for dir_name in dir_names:
+                dirs.add(prefix + dir_name)
+            for file_name in file_names:
+                if file_name == MANIFEST_NAME or \
+                        file_name.startswith(TEMP_PREFIX):
+                    continue
+                stat = os.stat(os.path.join(dir_path, file_name))
+                files[prefix + file_name] = FileState(stat.st_size,
+                                                      stat.st_mtime)
+        return files, dirs
+
+    def _remote_tree(self):
+        """ Return a dict of relative path to FileState for the remote
+            files, and a set of the relative paths of the collections.
+            Returns None in place of the set if the collection doesn't
+            exist.
+        """
+        files = {}
+        dirs = set()
+        properties = ['getcontentlength', 'getlastmodified', 'getetag']
+        root = self.remote_dir.rstrip('/')
+        try:
+            for resource in self.client.walk(self.connection,
+                                             self.remote_dir, properties,
+                                             workers=self.workers):
+                path = urllib.unquote(
+                    conn.href_to_path(self.connection, resource.href))
+                path = path[len(root):].strip('/')
+                if not path:
+                    continue
+                if resource.resourcetype == 'collection':
+                    dirs.add(path)
+                    continue
+                try:
+                    size = int(resource.getcontentlength)
+                except (TypeError, ValueError):
+                    size = None
+                files[path] = FileState(
+                    size, conn.parse_http_date(resource.getlastmodified),
+                    resource.getetag)
+        except requests.HTTPError, err:
+            if conn.error_status(err) != 404:
+                raise
+            return files, None
+        return files, dirs
+
+    def _changed(self, path, source, target, push):
+        """ Return why the file at path needs copying from source to
+            target, or None if it doesn't
+        """
+        if source.size != target.size:
+            return 'size differs'
+        if push:
+            local, remote = source, target
+        else:
+            local, remote = target, source
+        entry = self.manifest and self.manifest.get(path)
+        if entry is not None:
+            if (local.size, local.mtime) != (entry.size, entry.mtime):
+                return 'changed locally'
+            if remote.etag and entry.etag and remote.etag != entry.etag:
+                return 'changed remotely'
+            # Both sides are as they were at the last sync. The remote
+            # modification time is when the file was last sent, so it
+            # says nothing about which side is newer.
+            return None
+        if source.mtime is None or target.mtime is None:
+            return None
+        if int(source.mtime) > int(target.mtime):
+            return 'newer'
+        return None
+
+    def _plan(self, source_files, source_dirs, target_files, target_dirs,
+              push):
+        """ Work out the actions that make the target side match the
+            source side
+        """
+        if push:
+            copy, make_dir, remove = UPLOAD, MAKE_REMOTE_DIR, DELETE_REMOTE
+        else:
+            copy, make_dir, remove = DOWNLOAD, MAKE_LOCAL_DIR, DELETE_LOCAL
+        plan = []
+        if target_dirs is None:
+            plan.append(SyncAction(make_dir, '', 'new'))
+            target_dirs = set()
+        for path in sorted(source_dirs - target_dirs,
+                           key=lambda path: (path.count('/'), path)):
+            plan.append(SyncAction(make_dir, path, 'new'))
+        for path in sorted(source_files):
+            source = source_files[path]
+            target = target_files.get(path)
+            if target is None:
+                reason = 'new'
+            else:
+                reason = self._changed(path, source, target, push)
+            if reason:
+                plan.append(SyncAction(copy, path, reason, source))
+        if self.delete:
+            removed_dirs = sorted(target_dirs - source_dirs)
+            # Removing a directory removes everything in it
+            removed_dirs = [path for path in removed_dirs
+                            if not any(path.startswith(other + '/')
+                                       for other in removed_dirs)]
+            for path in sorted(target_files):
+                if path in source_files:
+                    continue
+                if any(path.startswith(other + '/')
+                       for other in removed_dirs):
+                    continue
+                plan.append(SyncAction(remove, path, 'not in source'))
+            for path in removed_dirs:
+                plan.append(SyncAction(remove, path, 'not in source'))
+        return plan
+
+    def plan_push(self):
+        """ Return the list of SyncActions a push would carry out
+        """
+        local_files, local_dirs = self._local_tree()
+        remote_files, remote_dirs = self._remote_tree()
+        return self._plan(local_files, local_dirs, remote_files,
+                          remote_dirs, push=True)
+
+    def plan_pull(self):
+        """ Return the list of SyncActions a pull would carry out
+        """
+        remote_files, remote_dirs = self._remote_tree()
+        if remote_dirs is None:
+            raise requests.HTTPError('%s does not exist' % self.remote_dir)
+        local_files, local_dirs = self._local_tree()
+        if not os.path.isdir(self.local_dir):
+            local_dirs = None
+        return self._plan(remote_files, remote_dirs, local_files,
+                          local_dirs, push=False)
+
+    def push(self, dry_run=False):
+        """ Make the remote collection match the local directory
+
+            :param dry_run: If True, only work out what would be done
+            :type dry_run: Boolean
+
+            Returns the list of SyncActions. Any that failed have their
+            error set.
+        """
+        plan = self.plan_push()
+        if not dry_run:
+            self.execute(plan)
+        return plan
+
+    def pull(self, dry_run=False):
+        """ Make the local directory match the remote collection
+
+            :param dry_run: If True, only work out what would be done
+            :type dry_run: Boolean
+
+            Returns the list of SyncActions. Any that failed have their
+            error set.
+        """
+        plan = self.plan_pull()
+        if not dry_run:
+            self.execute(plan)
+        return plan
+
+    def execute(self, plan):
+        """ Carry out a plan. Directories are made first, then files are
+            transferred, several at a time, then anything to go is
+            deleted. A failed action doesn't stop the others.
+        """
+        make_dirs = [action for action in plan
+                     if action.action in (MAKE_REMOTE_DIR, MAKE_LOCAL_DIR)]
+        transfers = [action for action in plan
+                     if action.action in (UPLOAD, DOWNLOAD)]
+        deletes = [action for action in plan
+                   if action.action in (DELETE_REMOTE, DELETE_LOCAL)]
+
+        for action in make_dirs:
+            self._run(action)
+        if transfers:
+            pool = ThreadPool(self.workers)
+            try:
+                pool.map(self._run, transfers)
+            finally:
+                pool.close()
+                pool.join()
+        for action in deletes:
+            self._run(action)
+
+        if self.manifest is not None and os.path.isdir(self.local_dir):
+            self.manifest.save()
+        return plan
+
+    def _run(self, action):
+        try:
+            getattr(self, '_' + action.action.replace('-', '_'))(action)
+        except (requests.RequestException, IOError, OSError), err:
+            action.error = err
+        else:
+            action.done = True
+
+    def _mkdir_remote(self, action):
+        resp, contents = self.client.make_collection(
+            self.connection, self._remote_path(action.path).rstrip('/'))
+        if resp.status_code < 200 or resp.status_code >= 300:
+            raise requests.HTTPError([resp, contents])
+
+    def _mkdir_local(self, action):
+        local_path = self._local_path(action.path)
+        if not os.path.isdir(local_path):
+            os.makedirs(local_path)
+
+    def _upload(self, action):
+        local_path = self._local_path(action.path)
+        remote_path = self._remote_path(action.path)
+        resp, contents = self.client.send_file(self.connection, remote_path,
+                                               local_path)
+        if resp.status_code < 200 or resp.status_code >= 300:
+            raise requests.HTTPError([resp, contents])
+        if self.manifest is not None:
+            # Most servers don't send the new ETag in the reply to a PUT,
+            # so it is asked for, for the next sync to compare with
+            etag = resp.headers.get('etag')
+            if not etag:
+                try:
+                    etag = self.client.stat(self.connection,
+                                            remote_path).etag
+                except requests.HTTPError:
+                    etag = None
+            self.manifest.set(action.path, FileState(
+                action.state.size, action.state.mtime, etag))
+
+    def _download(self, action):
+        local_path = self._local_path(action.path)
+        temp_fd, temp_name = tempfile.mkstemp(
+            prefix=TEMP_PREFIX, dir=os.path.dirname(local_path))
+        os.close(temp_fd)
+        try:
+            resp = self.client.get_file(self.connection,
+                                        self._remote_path(action.path),
+                                        temp_name, stream=True)
+            if resp.status_code != 200:
+                raise requests.HTTPError([resp, None])
+            if action.state.mtime is not None:
+                os.utime(temp_name, (action.state.mtime, action.state.mtime))
+            os.rename(temp_name, local_path)
+        finally:
+            if os.path.exists(temp_name):
+                os.remove(temp_name)
+        if self.manifest is not None:
+            stat = os.stat(local_path)
+            self.manifest.set(action.path, FileState(
+                stat.st_size, stat.st_mtime, action.state.etag))
+
+    def _delete_remote(self, action):
+        resp, contents = self.client.delete_resource(
+            self.connection, self._remote_path(action.path))
+        if resp.status_code < 200 or resp.status_code >= 300:
+            raise requests.HTTPError([resp, contents])
+        if self.manifest is not None:
+            self.manifest.remove(action.path)
+
+    def _delete_local(self, action):
+        local_path = self._local_path(action.path)
+        if os.path.isdir(local_path):
+            shutil.rmtree(local_path)
+        else:
+            os.remove(local_path)
+        if self.manifest is not None:
+            self.manifest.remove(action.path)
@@ -0,0 +1,87 @@
+import unittest
+import os
+import shutil
+import tempfile
+import threading
+
+import requests
+
+import python_webdav.async_connection as async_connection
+from dav_server import DavServer
+
+
+class TestAsyncConnection(unittest.TestCase):
+    """ AsyncConnection and AsyncClient against the in-process DavServer
+    """
+    def setUp(self):
+        self.server_root = tempfile.mkdtemp()
+        self.server = DavServer(self.server_root).start()
+        settings = dict(username='', password='', realm='', port=0,
+                        host=self.server.url, path='/')
+        self.connection_obj = async_connection.AsyncConnection(
+            settings, max_workers=4)
+        self.client = async_connection.AsyncClient(self.connection_obj)
+
+    def tearDown(self):
+        self.connection_obj.close()
+        self.server.stop()
+        shutil.rmtree(self.server_root)
+
+    def test_many_requests(self):
+        puts = [self.connection_obj.send_put('/file%02d.txt' % number,
+                                             'data %d' % number)
+                for number in range(40)]
+        self.assertEqual(
+            [resp.status_code for resp, content in
+             async_connection.gather(puts)], [201] * 40)
+        gets = [self.connection_obj.send_get('/file%02d.txt' % number)
+                for number in range(40)]
+        self.assertEqual([content for resp, content in
+                          async_connection.gather(gets)],
+                         ['data %d' % number for number in range(40)])
+
+    def test_callback(self):
+        done = threading.Event()
+        replies = []
+
+        def callback(reply):
+            replies.append(reply)
+            done.set()
+
+        self.connection_obj.send_mkcol('/newdir', callback=callback)
+        done.wait(5)
+        self.assertEqual(replies[0][0].status_code, 201)
+        self.assertTrue(os.path.isdir(os.path.join(self.server_root,
+                                                   'newdir')))
+
+    def test_streaming(self):
+        body = iter(['chunk one, ', 'chunk two'])
+        resp, content = self.connection_obj.send_put('/streamed.txt',
+                                                     body).get(5)
+        self.assertEqual(resp.status_code, 201)
+        resp, content = self.connection_obj.send_get(
+            '/streamed.txt', stream=True, chunk_size=5).get(5)
+        self.assertEqual(''.join(content), 'chunk one, chunk two')
+
+    def test_client(self):
+        local_file = os.path.join(self.server_root, 'local.txt')
+        local_fd = open(local_file, 'w')
+        local_fd.write('hello')
+        local_fd.close()
+        async_connection.gather([
+            self.client.make_collection('/dir'),
+            self.client.send_file('/uploaded.txt', local_file)])
+        self.client.copy_resource('/uploaded.txt', '/dir/copy.txt').get(5)
+        listing = self.client.get_properties('/dir').get(5)
+        self.assertEqual([resource.href for resource in listing],
+                         ['/dir/', '/dir/copy.txt'])
+        self.assertEqual(
+            self.client.get_property('/dir/copy.txt',
+                                     'getcontentlength').get(5), '5')
+        self.client.delete_resource('/uploaded.txt').get(5)
+        self.assertFalse(os.path.exists(os.path.join(self.server_root,
+                                                     'uploaded.txt')))
+
+    def test_errors_are_raised_by_get(self):
+        result = self.client.get_properties('/missing')
+        self.assertRaises(requests.HTTPError, result.get, 5)
@@ -0,0 +1,148 @@
+import unittest
+import os
+import shutil
+import tempfile
+from multiprocessing.pool import ThreadPool
+
+import python_webdav.auth
+import python_webdav.connection
+from dav_server import DavServer
+
+
+class TestDigestAuth(unittest.TestCase):
+    """ Digest authentication against the in-process DavServer
+    """
+    def setUp(self):
+        self.server_root = tempfile.mkdtemp()
+        for number in range(8):
+            file_fd = open(os.path.join(self.server_root,
+                                        'file%d.txt' % number), 'w')
+            file_fd.write('data %d' % number)
+            file_fd.close()
+        self.local_file = os.path.join(self.server_root, 'local.txt')
+        file_fd = open(self.local_file, 'w')
+        file_fd.write('x' * 1000)
+        file_fd.close()
+        self.server = DavServer(self.server_root,
+                                digest=('wibble', 'fish')).start()
+        self.connection_obj = self._connection('fish')
+        self.client = python_webdav.connection.Client()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.server_root)
+
+    def _connection(self, password):
+        settings = dict(username='wibble', password=password, realm='',
+                        port=0, host=self.server.url, path='/',
+                        auth='digest')
+        return python_webdav.connection.Connection(settings)
+
+    def _received(self, method):
+        return [path for request_method, path, headers in self.server.requests
+                if request_method == method]
+
+    def test_auth_object(self):
+        self.assertTrue(isinstance(self.connection_obj.httpcon.auth,
+                                   python_webdav.auth.DigestAuth))
+
+    def test_one_challenge_for_all_threads(self):
+        pool = ThreadPool(4)
+        try:
+            replies = pool.map(self.connection_obj.send_get,
+                               ['/file%d.txt' % number
+                                for number in range(8)] * 3)
+        finally:
+            pool.close()
+            pool.join()
+        self.assertEqual([content for resp, content in replies],
+                         ['data %d' % number for number in range(8)] * 3)
+        # Only the first request, or the ones racing it, are refused
+        refused = len(self.server.unauthorized)
+        self.assertTrue(1 <= refused <= 4)
+        self.connection_obj.send_get('/file0.txt')
+        self.assertEqual(len(self.server.unauthorized), refused)
+
+    def test_streamed_put_sent_once(self):
+        local_fd = open(self.local_file, 'rb')
+        try:
+            resp, content = self.connection_obj.send_put('/uploaded.txt',
+                                                         local_fd)
+        finally:
+            local_fd.close()
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(self.server.unauthorized,
+                         [('OPTIONS', '/uploaded.txt')])
+        self.assertEqual(self._received('PUT'), ['/uploaded.txt'])
+
+        resp, content = self.connection_obj.send_put(
+            '/chunked.txt', iter(['one', 'two']))
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(len(self.server.unauthorized), 1)
+
+    def _open_server(self, *open_methods):
+        self.server.stop()
+        self.server = DavServer(self.server_root, digest=('wibble', 'fish'),
+                                open_methods=open_methods).start()
+        return self._connection('fish')
+
+    def _uploaded(self):
+        uploaded_fd = open(os.path.join(self.server_root, 'uploaded.txt'))
+        try:
+            return uploaded_fd.read()
+        finally:
+            uploaded_fd.close()
+
+    def test_primed_past_open_options(self):
+        connection_obj = self._open_server('OPTIONS')
+        resp, content = connection_obj.send_put('/uploaded.txt',
+                                                iter(['one', 'two']))
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(self.server.unauthorized,
+                         [('PROPFIND', '/uploaded.txt')])
+        self.assertEqual(self._uploaded(), 'onetwo')
+
+    def test_body_kept_when_priming_fails(self):
+        connection_obj = self._open_server('OPTIONS', 'PROPFIND')
+        resp, content = connection_obj.send_put('/uploaded.txt',
+                                                iter(['one', 'two']))
+        # Refused once, then sent again from the copy
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(self.server.unauthorized,
+                         [('PUT', '/uploaded.txt')])
+        self.assertEqual(self._uploaded(), 'onetwo')
+
+    def test_stale_nonce(self):
+        self.connection_obj.send_get('/file0.txt')
+        self.server.expire_nonce()
+        resp, content = self.connection_obj.send_get('/file1.txt')
+        self.assertEqual((resp.status_code, content), (200, 'data 1'))
+        self.assertEqual(self.connection_obj.httpcon.auth.challenges, 2)
+
+    def test_file_resent_after_stale_nonce(self):
+        resp, content = self.client.send_file(
+            self.connection_obj, '/uploaded.txt', self.local_file)
+        self.assertEqual(resp.status_code, 201)
+        self.server.expire_nonce()
+        resp, content = self.client.send_file(
+            self.connection_obj, '/uploaded.txt', self.local_file)
+        self.assertEqual(resp.status_code, 204)
+        self.assertEqual(self._uploaded(), 'x' * 1000)
+        self.assertEqual(self.connection_obj.httpcon.auth.challenges, 2)
+
+    def test_parts_resent_after_stale_nonce(self):
+        self.connection_obj.send_get('/file0.txt')
+        self.server.expire_nonce()
+        resp, content = self.client.send_file_in_parts(
+            self.connection_obj, '/parts.txt', self.local_file,
+            part_size=400, retry_delay=0)
+        self.assertEqual(resp.status_code, 204)
+        parts_fd = open(os.path.join(self.server_root, 'parts.txt'))
+        self.assertEqual(parts_fd.read(), 'x' * 1000)
+        parts_fd.close()
+
+    def test_wrong_password(self):
+        connection_obj = self._connection('cake')
+        resp, content = connection_obj.send_get('/file0.txt')
+        self.assertEqual(resp.status_code, 401)
+        self.assertEqual(len(self.server.unauthorized), 2)
@@ -0,0 +1,161 @@
+import unittest
+import os
+import shutil
+import tempfile
+import mock
+
+import python_webdav.cache
+
+
+class MockConnection(object):
+    host = 'http://localhost:8008'
+    port = 80
+
+
+class TestPropertyCache(unittest.TestCase):
+    def setUp(self):
+        self.connection_obj = MockConnection()
+        self.cache = python_webdav.cache.PropertyCache(ttl=10, max_entries=3)
+
+    def _key(self, path, depth='1'):
+        return self.cache.make_key(self.connection_obj, path, depth, None)
+
+    def test_path_spellings_share_a_key(self):
+        self.assertEquals(self._key('webdav/dir/'), self._key('/webdav/dir'))
+
+    def test_hit_and_miss(self):
+        self.assertEquals(self.cache.get(self._key('/a')), None)
+        self.cache.set(self._key('/a'), ['a'])
+        self.assertEquals(self.cache.get(self._key('/a')), ['a'])
+        self.assertEquals(self.cache.hits, 1)
+        self.assertEquals(self.cache.misses, 1)
+
+    @mock.patch('time.time')
+    def test_expiry(self, mock_time):
+        mock_time.return_value = 100
+        self.cache.set(self._key('/a'), ['a'], etag='"1"')
+        mock_time.return_value = 109
+        self.assertEquals(self.cache.get(self._key('/a')), ['a'])
+        mock_time.return_value = 110
+        self.assertEquals(self.cache.get(self._key('/a')), None)
+        # Without validate, an expired entry's ETag isn't offered
+        self.assertEquals(self.cache.get_stale_etag(self._key('/a')), None)
+
+    @mock.patch('time.time')
+    def test_refresh(self, mock_time):
+        self.cache.validate = True
+        mock_time.return_value = 100
+        self.cache.set(self._key('/a'), ['a'], etag='"1"')
+        mock_time.return_value = 200
+        self.assertEquals(self.cache.get(self._key('/a')), None)
+        self.assertEquals(self.cache.get_stale_etag(self._key('/a')), '"1"')
+        self.assertEquals(self.cache.refresh(self._key('/a')), ['a'])
+        self.assertEquals(self.cache.get(self._key('/a')), ['a'])
+        self.assertEquals(self.cache.stats(),
+                          dict(hits=2, misses=0, revalidations=1,
+                               evictions=0, entries=1))
+
+    def test_least_recently_used_is_evicted(self):
+        for path in ('/a', '/b', '/c'):
+            self.cache.set(self._key(path), [path])
+        self.cache.get(self._key('/a'))
+        self.cache.set(self._key('/d'), ['/d'])
+        self.assertEquals(len(self.cache), 3)
+        self.assertEquals(self.cache.evictions, 1)
+        self.assertEquals(self.cache.get(self._key('/b')), None)
+        self.assertEquals(self.cache.get(self._key('/a')), ['/a'])
+
+    def test_invalidate(self):
+        self.cache.max_entries = 10
+        for path in ('/dir', '/dir/file.txt', '/dir/sub/other.txt',
+                     '/dir2', '/'):
+            self.cache.set(self._key(path), [path])
+        self.cache.invalidate('dir/sub')
+        self.assertEquals(self.cache.get(self._key('/dir/sub/other.txt')),
+                          None)
+        self.assertEquals(self.cache.get(self._key('/dir')), None)
+        self.assertEquals(self.cache.get(self._key('/dir/file.txt')),
+                          ['/dir/file.txt'])
+        self.assertEquals(self.cache.get(self._key('/dir2')), ['/dir2'])
+        self.assertEquals(self.cache.get(self._key('/')), ['/'])
+
+    def test_invalidate_other_host(self):
+        self.cache.set(self._key('/a'), ['a'])
+        self.cache.invalidate('/a', host='http://elsewhere')
+        self.assertEquals(self.cache.get(self._key('/a')), ['a'])
+        self.cache.invalidate('/a', host=self.connection_obj.host)
+        self.assertEquals(self.cache.get(self._key('/a')), None)
+
+
+class TestContentCache(unittest.TestCase):
+    URL = 'http://localhost:8008/webdav/file.txt'
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = python_webdav.cache.ContentCache(
+            os.path.join(self.directory, 'cache'), max_size=10)
+        self.local_file = os.path.join(self.directory, 'file.txt')
+        self._write(self.local_file, 'hello')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _write(self, file_name, data):
+        file_fd = open(file_name, 'wb')
+        file_fd.write(data)
+        file_fd.close()
+
+    def _read(self, file_name):
+        file_fd = open(file_name, 'rb')
+        data = file_fd.read()
+        file_fd.close()
+        return data
+
+    def test_conditional_headers(self):
+        self.assertEquals(self.cache.conditional_headers(self.URL), {})
+        self.cache.store(self.URL, self.local_file, etag='"abc"',
+                         last_modified='Wed, 02 Sep 2009 20:31:52 GMT')
+        self.assertEquals(self.cache.conditional_headers(self.URL),
+                          {'If-None-Match': '"abc"',
+                           'If-Modified-Since':
+                               'Wed, 02 Sep 2009 20:31:52 GMT'})
+
+    def test_copy_to(self):
+        copy_name = os.path.join(self.directory, 'copy.txt')
+        self.assertFalse(self.cache.copy_to(self.URL, copy_name))
+        self.cache.store(self.URL, self.local_file, etag='"abc"')
+        self.assertTrue(self.cache.copy_to(self.URL, copy_name))
+        self.assertEquals(self._read(copy_name), 'hello')
+        self.assertEquals((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_needs_a_validator(self):
+        self.assertFalse(self.cache.store(self.URL, self.local_file))
+        self.assertEquals(self.cache.conditional_headers(self.URL), {})
+
+    def test_too_large(self):
+        self._write(self.local_file, 'x' * 11)
+        self.assertFalse(self.cache.store(self.URL, self.local_file,
+                                          etag='"abc"'))
+        self.assertEquals(self.cache.size(), 0)
+
+    def test_least_recently_used_is_evicted(self):
+        for number in range(2):
+            url = '%s.%d' % (self.URL, number)
+            self.cache.store(url, self.local_file, etag='"%d"' % number)
+            os.utime(self.cache._paths(url)[0], (number, number))
+        # Using the first one makes the second the least recently used
+        self.cache.copy_to(self.URL + '.0',
+                           os.path.join(self.directory, 'copy.txt'))
+        self.cache.store(self.URL + '.2', self.local_file, etag='"2"')
+        self.assertEquals(self.cache.size(), 10)
+        self.assertEquals(self.cache.evictions, 1)
+        self.assertEquals(
+            self.cache.conditional_headers(self.URL + '.1'), {})
+        self.assertEquals(
+            self.cache.conditional_headers(self.URL + '.0'),
+            {'If-None-Match': '"0"'})
+
+    def test_forget(self):
+        self.cache.store(self.URL, self.local_file, etag='"abc"')
+        self.cache.forget(self.URL)
+        self.assertEquals(self.cache.conditional_headers(self.URL), {})
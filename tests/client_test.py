@@ -2,9 +2,13 @@ import unittest
 import os
 import re
 import mock
+import shutil
+import tempfile
 from datetime import datetime
 
+import python_webdav.cache
 import python_webdav.client as webdav_client
+from dav_server import DavServer
 
 class TestClient(unittest.TestCase):
     """ Test case for the client
@@ -44,6 +48,29 @@ class TestClient(unittest.TestCase):
         os.remove(written_file)
         self.assertEqual(data, 'Test file\n')
 
+    def test_download_file_stream(self):
+        """ Download a file in chunks rather than in one read
+        """
+        mock_resp = mock.Mock()
+        self.client.connection.send_get = mock.Mock()
+        self.client.connection.send_get.return_value = (
+            mock_resp, iter(['Test ', 'file', '\n']))
+        dest_path = os.path.join(os.path.dirname(__file__), 'test_data')
+        resp, content = self.client.download_file('test_file1.txt',
+                                                  dest_path=dest_path,
+                                                  stream=True, chunk_size=4)
+        written_file = os.path.join(dest_path, 'test_file1.txt')
+        file_fd = open(written_file, 'r')
+        data = file_fd.read()
+        file_fd.close()
+        os.remove(written_file)
+        self.assertEqual(data, 'Test file\n')
+        self.assertEqual(content, None)
+        self.assertEqual(
+            self.client.connection.send_get.call_args[1],
+            {'stream': True, 'chunk_size': 4})
+        self.assertTrue(mock_resp.close.called)
+
     def test_chdir(self):
         """ test_chdir
         """
@@ -200,12 +227,30 @@ class TestClient(unittest.TestCase):
         result = self.client.ls(list_format=tuple())
         self.assertEqual(result, [[], [], [], [], [], []])
 
+    def test_iter_ls(self):
+        mock_prop1 = mock.Mock()
+        mock_prop1.href = '/webdav/'
+        mock_prop1.getetag = '"123-abc"'
+        mock_prop2 = mock.Mock()
+        mock_prop2.href = '/webdav/test_file1.txt'
+        mock_prop2.getetag = None
+        self.client.client.iter_properties = mock.Mock()
+        self.client.client.iter_properties.return_value = iter([mock_prop1,
+                                                               mock_prop2])
+        self.client.connection.path = 'webdav'
+        result = self.client.iter_ls(list_format=('F', 'E'))
+        self.assertEqual(next(result), ['/webdav/', '123-abc'])
+        self.assertEqual(next(result), ['/webdav/test_file1.txt', ''])
+        self.assertEqual(
+            self.client.client.iter_properties.call_args[0][1], 'webdav')
+
     def test_mkdir(self):
         """ test_mkdir
 
             Test for making directories (collections)
         """
         self.client.connection.send_mkcol = mock.Mock()
+        self.client.connection.send_mkcol.return_value = (201, '')
         self.client.connection.path = 'myWebDAV'
         self.client.mkdir('newpath')
         self.assertEqual(self.client.connection.send_mkcol.call_args_list,
@@ -217,11 +262,25 @@ class TestClient(unittest.TestCase):
             Test for removing directories
         """
         self.client.connection.send_rmcol = mock.Mock()
+        self.client.connection.send_rmcol.return_value = (201, '')
         self.client.connection.path = 'myWebDAV'
         self.client.rmdir('new_dir')
         self.assertEqual([(('myWebDAV/new_dir',), {})],
                           self.client.connection.send_rmcol.call_args_list)
 
+    def test_connection_settings(self):
+        """ Extra settings are passed on to the connection
+        """
+        client = webdav_client.Client(
+            'http://localhost:8008/webdav',
+            connection_settings=dict(pool_maxsize=25, keep_alive=False))
+        client.set_connection()
+        adapter = client.connection.httpcon.get_adapter(
+            'http://localhost:8008/webdav/')
+        self.assertEqual(adapter._pool_maxsize, 25)
+        self.assertEqual(client.connection.httpcon.headers['Connection'],
+                         'close')
+
     def test_pwd(self):
         """ test_pwd
 
@@ -275,4 +334,151 @@ class TestClient(unittest.TestCase):
                 fd1.close()
                 os.remove(file_name)
         self.assertEqual(file_name,
-                          self.client.connection.send_put.call_args[0][0])
\ No newline at end of file
+                          self.client.connection.send_put.call_args[0][0])
+
+
+class TestContentCache(unittest.TestCase):
+    """ Downloads through a content cache, against the in-process DavServer
+    """
+    def setUp(self):
+        self.server_root = tempfile.mkdtemp()
+        self.local_dir = tempfile.mkdtemp()
+        self.remote_file = os.path.join(self.server_root, 'config.txt')
+        self._write(self.remote_file, 'version 1\n')
+        self.server = DavServer(self.server_root).start()
+        self.content_cache = python_webdav.cache.ContentCache(
+            os.path.join(self.local_dir, 'cache'))
+        self.client = webdav_client.Client(self.server.url, webdav_path='/',
+                                           content_cache=self.content_cache)
+        self.client.set_connection()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.server_root)
+        shutil.rmtree(self.local_dir)
+
+    def _write(self, file_name, data):
+        file_fd = open(file_name, 'wb')
+        file_fd.write(data)
+        file_fd.close()
+
+    def _gets(self):
+        return [headers for method, path, headers in self.server.requests
+                if method == 'GET']
+
+    def test_not_modified_served_from_cache(self):
+        resp, content = self.client.download_file('config.txt',
+                                                  dest_path=self.local_dir)
+        self.assertEqual((resp.status_code, content), (200, 'version 1\n'))
+        os.remove(os.path.join(self.local_dir, 'config.txt'))
+
+        resp, content = self.client.download_file('config.txt',
+                                                  dest_path=self.local_dir)
+        self.assertEqual((resp.status_code, content), (304, 'version 1\n'))
+        local_fd = open(os.path.join(self.local_dir, 'config.txt'), 'rb')
+        self.assertEqual(local_fd.read(), 'version 1\n')
+        local_fd.close()
+        first, second = self._gets()
+        self.assertFalse('if-none-match' in first)
+        self.assertEqual(second['if-none-match'],
+                         resp.headers['etag'])
+        self.assertEqual((self.content_cache.hits, self.content_cache.misses),
+                         (1, 1))
+
+    def test_modified_is_downloaded(self):
+        self.client.download_file('config.txt', dest_path=self.local_dir)
+        self._write(self.remote_file, 'version 2, longer\n')
+        resp, content = self.client.download_file('config.txt',
+                                                   dest_path=self.local_dir,
+                                                   stream=True)
+        self.assertEqual((resp.status_code, content), (200, None))
+        local_fd = open(os.path.join(self.local_dir, 'config.txt'), 'rb')
+        self.assertEqual(local_fd.read(), 'version 2, longer\n')
+        local_fd.close()
+
+        # The new version replaced the old one in the cache
+        resp, content = self.client.download_file('config.txt',
+                                                  dest_path=self.local_dir)
+        self.assertEqual((resp.status_code, content),
+                         (304, 'version 2, longer\n'))
+
+    def test_missing_cached_copy_is_refetched(self):
+        self.client.download_file('config.txt', dest_path=self.local_dir)
+        # As if the copy went missing after the request was made
+        self.content_cache.copy_to = mock.Mock(return_value=False)
+        resp, content = self.client.download_file('config.txt',
+                                                  dest_path=self.local_dir)
+        self.assertEqual((resp.status_code, content), (200, 'version 1\n'))
+        self.assertFalse('if-none-match' in self._gets()[-1])
+
+
+class TestFind(unittest.TestCase):
+    """ find against the in-process DavServer
+    """
+    def setUp(self):
+        self.server_root = tempfile.mkdtemp()
+        for dir_name in ('docs', 'docs/old'):
+            os.mkdir(os.path.join(self.server_root, dir_name))
+            for file_name in ('notes.txt', 'image.png'):
+                open(os.path.join(self.server_root, dir_name, file_name),
+                     'w').close()
+        self.server = DavServer(self.server_root,
+                                allow_infinity=False).start()
+        self.client = webdav_client.Client(self.server.url, webdav_path='/')
+        self.client.set_connection()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.server_root)
+
+    def test_find_pattern(self):
+        self.assertEqual(sorted(self.client.find('docs', pattern='*.txt')),
+                         ['/docs/notes.txt', '/docs/old/notes.txt'])
+
+    def test_find_type(self):
+        self.assertEqual(sorted(self.client.find('docs', resource_type='d')),
+                         ['/docs/', '/docs/old/'])
+        self.assertEqual(len(list(self.client.find('docs',
+                                                   resource_type='f'))), 4)
+
+
+class TestLs(unittest.TestCase):
+    """ ls against the in-process DavServer
+    """
+    def setUp(self):
+        self.server_root = tempfile.mkdtemp()
+        open(os.path.join(self.server_root, 'a.txt'), 'w').close()
+        self.server = DavServer(self.server_root).start()
+        self.client = webdav_client.Client(self.server.url, webdav_path='/')
+        self.client.set_connection()
+        self.send_propfind = mock.Mock(
+            wraps=self.client.connection.send_propfind)
+        self.client.connection.send_propfind = self.send_propfind
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.server_root)
+
+    def _requested(self):
+        body = self.send_propfind.call_args[1]['body']
+        return re.findall(r'<\w+:(\w+)/>', body)
+
+    def test_only_needed_properties(self):
+        result = self.client.ls('/', list_format=('F', 'T', 'E'),
+                                display=False)
+        self.assertEqual(self._requested(), ['resourcetype', 'getetag'])
+        self.assertEqual(result[1][:2], ['/a.txt', 'resource'])
+        self.assertTrue(result[1][2])
+        list(self.client.iter_ls('/', list_format=('F', 'A')))
+        self.assertEqual(self._requested(), ['resourcetype', 'executable'])
+
+    def test_no_format(self):
+        self.assertEqual(self.client.ls('/', list_format=(), display=False),
+                         [[], []])
+        self.assertEqual(self._requested(), ['resourcetype'])
+
+    def test_allprop(self):
+        result = self.client.ls('/', list_format=('F', 'C'), display=False,
+                                allprop=True)
+        self.assertEqual(self._requested(), ['allprop'])
+        self.assertEqual(result[1], ['/a.txt', 'text/plain'])
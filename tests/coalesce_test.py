@@ -0,0 +1,161 @@
+import unittest
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import mock
+
+import python_webdav.coalesce
+import python_webdav.connection
+from dav_server import DavServer
+
+
+def wait_for(condition, timeout=5):
+    """ Wait until condition() is true, failing after timeout seconds
+    """
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError('Timed out waiting')
+        time.sleep(0.001)
+
+
+def run_threads(count, func):
+    """ Call func in count threads, returning a list of their results (or
+        of the exceptions they raised) and the threads
+    """
+    results = []
+
+    def run():
+        try:
+            results.append(func())
+        except Exception, err:
+            results.append(err)
+
+    threads = [threading.Thread(target=run) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return results, threads
+
+
+class TestSingleFlight(unittest.TestCase):
+    def setUp(self):
+        self.single_flight = python_webdav.coalesce.SingleFlight()
+        self.release = threading.Event()
+
+    def _blocked(self, result):
+        self.release.wait(5)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def test_shared_result(self):
+        func = mock.Mock(side_effect=self._blocked)
+        result = object()
+        results, threads = run_threads(5, lambda: self.single_flight.do(
+            'key', func, result))
+        wait_for(lambda: self.single_flight.shared == 4)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEquals(results, [result] * 5)
+        self.assertEquals(func.call_count, 1)
+        self.assertEquals(self.single_flight.stats(),
+                          dict(calls=1, shared=4, in_flight=0))
+
+    def test_shared_error(self):
+        error = ValueError('failed')
+        results, threads = run_threads(3, lambda: self.single_flight.do(
+            'key', self._blocked, error))
+        wait_for(lambda: self.single_flight.shared == 2)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEquals(results, [error] * 3)
+        self.assertEquals(self.single_flight.stats()['in_flight'], 0)
+
+    def test_finished_calls_not_shared(self):
+        func = mock.Mock(return_value='result')
+        self.single_flight.do('key', func)
+        self.single_flight.do('key', func)
+        self.single_flight.do('other', func)
+        self.assertEquals(func.call_count, 3)
+        self.assertEquals(self.single_flight.shared, 0)
+
+
+class TestCoalescingConnection(unittest.TestCase):
+    """ Coalesced requests against the in-process DavServer
+    """
+    def setUp(self):
+        self.server_root = tempfile.mkdtemp()
+        for number in range(5):
+            file_fd = open(os.path.join(self.server_root,
+                                        'file%d.txt' % number), 'w')
+            file_fd.write('data %d' % number)
+            file_fd.close()
+        self.server = DavServer(self.server_root).start()
+        settings = dict(username='', password='', realm='', port=0,
+                        host=self.server.url, path='/', coalesce=True)
+        self.connection_obj = python_webdav.connection.Connection(settings)
+        self.client = python_webdav.connection.Client()
+
+        # Hold every request until released, so that they pile up
+        self.release = threading.Event()
+        send_request = self.connection_obj._send_request
+
+        def held(*args, **kwargs):
+            self.release.wait(5)
+            return send_request(*args, **kwargs)
+        self.connection_obj._send_request = held
+
+    def tearDown(self):
+        self.release.set()
+        self.server.stop()
+        shutil.rmtree(self.server_root)
+
+    def _run(self, count, func, shared):
+        results, threads = run_threads(count, func)
+        wait_for(lambda: self.connection_obj.single_flight.shared == shared)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_not_coalesced_by_default(self):
+        settings = dict(username='', password='', realm='', port=0,
+                        host=self.server.url, path='/')
+        connection_obj = python_webdav.connection.Connection(settings)
+        self.assertTrue(connection_obj.single_flight is None)
+
+    def test_get_properties(self):
+        results = self._run(4, lambda: self.client.get_properties(
+            self.connection_obj, '/', ['getetag']), shared=3)
+        self.assertEquals(len(results[0]), 6)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEquals([request[0] for request in self.server.requests],
+                          ['PROPFIND'])
+
+    def test_send_get(self):
+        results = self._run(4, lambda: self.connection_obj.send_get(
+            '/file1.txt'), shared=3)
+        self.assertEquals([content for resp, content in results],
+                          ['data 1'] * 4)
+        self.assertEquals(len(self.server.requests), 1)
+
+        # Different headers make a different request
+        self.release.clear()
+        self.connection_obj.single_flight.shared = 0
+        results = self._run(2, lambda: self.connection_obj.send_get(
+            '/file1.txt', headers={'X-Caller': str(threading.current_thread()
+                                                   .ident)}), shared=0)
+        self.assertEquals(len(self.server.requests), 3)
+
+    def test_stream_not_coalesced(self):
+        self.release.set()
+        for _ in range(2):
+            resp, content = self.connection_obj.send_get('/file1.txt',
+                                                         stream=True)
+            self.assertEquals(''.join(content), 'data 1')
+        self.assertEquals(self.connection_obj.single_flight.calls, 0)
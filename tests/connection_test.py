@@ -12,8 +12,14 @@ import mock
 import requests
 import shutil
 import subprocess
+import tempfile
 import time
+from xml.etree import cElementTree as ElementTree
+import python_webdav.cache
 import python_webdav.connection
+import python_webdav.file_wrapper
+import python_webdav.parse
+from dav_server import DavServer
 
 # Some WebDAV server settings.
 LOCAL_DAV_DIR = "/tmp/"
@@ -97,6 +103,18 @@ class TestConnection(unittest.TestCase):
         resp, content = self.connection_obj.send_get(path)
         self.assertEquals(resp.status_code, 200)
 
+    def test_send_get_stream(self):
+        self.connection_obj.httpcon = mock.Mock()
+        mock_resp = mock.Mock()
+        mock_resp.iter_content.return_value = iter(['Test ', 'file'])
+        self.connection_obj.httpcon.request.return_value = mock_resp
+        resp, content = self.connection_obj.send_get('', stream=True,
+                                                     chunk_size=5)
+        self.assertEquals(
+            self.connection_obj.httpcon.request.call_args[1]['stream'], True)
+        mock_resp.iter_content.assert_called_with(5)
+        self.assertEquals(list(content), ['Test ', 'file'])
+
     def test_send_get_raises_error(self):
         path = 'cake'
         self.assertRaises(requests.ConnectionError,
@@ -112,6 +130,26 @@ class TestConnection(unittest.TestCase):
         resp, content = self.connection_obj.send_put(path, body=body)
         self.assertTrue(resp.status_code in [201, 204])
 
+    def test_send_put_file_streams(self):
+        self.connection_obj.httpcon = mock.Mock()
+        test_file = os.path.join(os.path.dirname(__file__),
+                                 'test_data', 'test_file_post.txt')
+        file_to_send = open(test_file, 'rb')
+        self.connection_obj.send_put('/test_file_post.txt', file_to_send)
+        file_to_send.close()
+        body = self.connection_obj.httpcon.request.call_args[1]['data']
+        self.assertTrue(isinstance(body,
+                                   python_webdav.file_wrapper.ChunkedReader))
+        self.assertEquals(len(body), os.path.getsize(test_file))
+
+    def test_send_put_iterable_chunked(self):
+        self.connection_obj.httpcon = mock.Mock()
+        self.connection_obj.send_put('/test_file_post.txt',
+                                     iter(['Hello', ' World!']),
+                                     chunk_size=4)
+        body = self.connection_obj.httpcon.request.call_args[1]['data']
+        self.assertEquals(list(body), ['Hell', 'o Wo', 'rld!'])
+
     def test_send_put_raises(self):
         self.connection_obj.host = 'http://imnothere-haghashkddshkahdskhds.com'
         path = '/webdav/test_file_post.txt'
@@ -458,6 +496,29 @@ class TestClient(unittest.TestCase):
         os.remove('local_file.txt')
         self.assertEquals(file_data, 'Data')
 
+    def test_get_file_stream(self):
+        settings = dict(username='wibble',
+                        password='fish',
+                        realm='test-realm',
+                        port=PORT,
+                        host='http://localhost:%d/webdav' % PORT,
+                        path='webdav')
+        connection_obj = python_webdav.connection.Connection(settings)
+
+        connection_obj.send_get = mock.Mock()
+        mock_resp = mock.Mock()
+        connection_obj.send_get.return_value = (mock_resp, iter(['Da', 'ta']))
+        client = python_webdav.connection.Client()
+        client.get_file(connection_obj, 'webdav/test_file1.txt',
+                        'local_file.txt', stream=True, chunk_size=2)
+        file_fd = open('local_file.txt', 'r')
+        file_data = file_fd.read()
+        file_fd.close()
+        os.remove('local_file.txt')
+        self.assertEquals(file_data, 'Data')
+        self.assertEquals(connection_obj.send_get.call_args[1]['stream'], True)
+        self.assertTrue(mock_resp.close.called)
+
     def test_send_file(self):
         settings = dict(username='wibble',
                         password='fish',
@@ -607,6 +668,1077 @@ class TestClient(unittest.TestCase):
     #assert 1 == 2
 
 
+class TestListing(unittest.TestCase):
+    """ PROPFIND listings against the in-process DavServer
+    """
+    def setUp(self):
+        self.server_root = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.server_root, 'listing'))
+        for number in range(50):
+            file_name = os.path.join(self.server_root, 'listing',
+                                     'file%02d.txt' % number)
+            open(file_name, 'w').close()
+        self.server = DavServer(self.server_root).start()
+        settings = dict(username='', password='', realm='', port=0,
+                        host=self.server.url, path='/')
+        self.connection_obj = python_webdav.connection.Connection(settings)
+        self.client = python_webdav.connection.Client()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.server_root)
+
+    def test_iter_properties(self):
+        result = self.client.iter_properties(self.connection_obj, 'listing')
+        first = next(result)
+        self.assertEquals(first.href, '/listing/')
+        self.assertEquals(first.resourcetype, 'collection')
+        hrefs = [resource.href for resource in result]
+        self.assertEquals(hrefs, ['/listing/file%02d.txt' % number
+                                  for number in range(50)])
+
+    def test_matches_get_properties(self):
+        expected = self.client.get_properties(self.connection_obj, 'listing',
+                                              ['getetag'])
+        result = self.client.iter_properties(self.connection_obj, 'listing',
+                                             ['getetag'])
+        self.assertEquals([(resource.href, resource.getetag)
+                           for resource in result],
+                          [(resource.href, resource.getetag)
+                           for resource in expected])
+
+    def test_not_found(self):
+        result = self.client.iter_properties(self.connection_obj, 'missing')
+        self.assertRaises(requests.HTTPError, list, result)
+
+    def test_get_properties_compact(self):
+        expected = self.client.get_properties(self.connection_obj, 'listing')
+        result = self.client.get_properties(self.connection_obj, 'listing',
+                                            compact=True)
+        self.assertTrue(isinstance(result,
+                                   python_webdav.parse.ListingResult))
+        self.assertEquals([(resource.href, resource.getcontentlength,
+                            resource.resourcetype) for resource in result],
+                          [(resource.href, resource.getcontentlength,
+                            resource.resourcetype) for resource in expected])
+
+    def test_get_properties_parser(self):
+        expected = self.client.get_properties(self.connection_obj, 'listing')
+        result = self.client.get_properties(
+            self.connection_obj, 'listing',
+            parser=python_webdav.parse.FastParser)
+        self.assertEquals(len(result), 51)
+        self.assertEquals([(resource.href, resource.getetag,
+                            resource.resourcetype) for resource in result],
+                          [(resource.href, resource.getetag,
+                            resource.resourcetype) for resource in expected])
+
+
+    def test_projection(self):
+        send_propfind = mock.Mock(wraps=self.connection_obj.send_propfind)
+        self.connection_obj.send_propfind = send_propfind
+        listing = self.client.get_properties(
+            self.connection_obj, '/listing',
+            ['getetag', 'executable', '{urn:example}colour'])
+        body = ElementTree.fromstring(send_propfind.call_args[1]['body'])
+        self.assertEqual([child.tag for child in body.find('{DAV:}prop')],
+                         ['{DAV:}resourcetype', '{DAV:}getetag',
+                          '{%s}executable' % python_webdav.parse.APACHE_NS,
+                          '{urn:example}colour'])
+        self.assertEqual(len(listing), 51)
+        self.assertEqual(listing[0].resourcetype, 'collection')
+        self.assertTrue(listing[1].getetag)
+        self.assertEqual(listing[1].getcontenttype, None)
+
+    def test_allprop(self):
+        body = python_webdav.connection._propfind_body(None)
+        self.assertTrue(ElementTree.fromstring(body).find('{DAV:}allprop')
+                        is not None)
+
+    def test_stat(self):
+        file_fd = open(os.path.join(self.server_root, 'listing',
+                                    'file07.txt'), 'w')
+        file_fd.write('seven')
+        file_fd.close()
+        stat = self.client.stat(self.connection_obj, '/listing/file07.txt')
+        self.assertEqual(self.server.requests[-1][:2],
+                         ('PROPFIND', '/listing/file07.txt'))
+        self.assertEqual(self.server.requests[-1][2]['depth'], '0')
+        self.assertEqual((stat.href, stat.is_collection, stat.size,
+                          stat.content_type),
+                         ('/listing/file07.txt', False, 5, 'text/plain'))
+        self.assertTrue(stat.etag)
+        self.assertEqual(int(stat.mtime), int(os.path.getmtime(
+            os.path.join(self.server_root, 'listing', 'file07.txt'))))
+
+        stat = self.client.stat(self.connection_obj, '/listing')
+        self.assertEqual((stat.href, stat.is_collection, stat.size),
+                         ('/listing/', True, None))
+        self.assertRaises(requests.HTTPError, self.client.stat,
+                          self.connection_obj, '/listing/missing.txt')
+
+    def test_stat_head(self):
+        stat = self.client.stat(self.connection_obj, '/listing/file01.txt',
+                                head=True)
+        self.assertEqual(self.server.requests[-1][0], 'HEAD')
+        self.assertEqual((stat.size, stat.is_collection), (0, None))
+        self.assertEqual(stat.etag, self.client.stat(
+            self.connection_obj, '/listing/file01.txt').etag)
+        self.assertRaises(requests.HTTPError, self.client.stat,
+                          self.connection_obj, '/listing/missing.txt',
+                          head=True)
+
+    def test_get_properties_many(self):
+        open(os.path.join(self.server_root, 'top.txt'), 'w').close()
+        paths = ['/listing/file01.txt', 'listing/file02.txt',
+                 '/listing/missing.txt', '/top.txt', '/gone/file.txt']
+        del self.server.requests[:]
+        result = self.client.get_properties_many(self.connection_obj, paths,
+                                                 ['getetag'])
+        self.assertEqual(sorted(result), sorted(paths[:2] + ['/top.txt']))
+        self.assertEqual(result['listing/file02.txt'].href,
+                         '/listing/file02.txt')
+        self.assertTrue(result['/top.txt'].getetag)
+        # One listing for the two files in /listing, and a Depth 0 request
+        # for each of the others
+        self.assertEqual(sorted((path, headers['depth'])
+                                for method, path, headers
+                                in self.server.requests),
+                         [('/gone/file.txt', '0'), ('/listing/', '1'),
+                          ('/top.txt', '0')])
+        self.assertEqual(self.client.get_properties_many(
+            self.connection_obj, [], ['getetag']), {})
+
+    def test_get_property_depth_zero(self):
+        value = self.client.get_property(self.connection_obj,
+                                         '/listing/file01.txt',
+                                         'getcontentlength')
+        self.assertEqual(value, '0')
+        self.assertEqual(self.server.requests[-1][:2],
+                         ('PROPFIND', '/listing/file01.txt'))
+        self.assertEqual(self.server.requests[-1][2]['depth'], '0')
+
+class TestSegmentedDownload(unittest.TestCase):
+    """ Segmented downloads against a mocked connection serving byte ranges
+        of DATA
+    """
+    DATA = ''.join(chr(ord('a') + i % 26) for i in range(1000))
+
+    def setUp(self):
+        self.local_file = os.path.join(os.path.dirname(__file__),
+                                       'test_data', 'segmented.txt')
+        self.connection_obj = mock.Mock()
+        self.connection_obj.send_get.side_effect = self._send_get
+        self.client = python_webdav.connection.Client()
+        self.client._fetch_properties = mock.Mock()
+        self.etag = '"1"'
+        mock_prop = MockProperty()
+        mock_prop.getcontentlength = str(len(self.DATA))
+        mock_prop.getetag = self.etag
+        self.client._fetch_properties.return_value = [mock_prop]
+        self.honour_range = True
+        self.status = None
+
+    def tearDown(self):
+        if os.path.exists(self.local_file):
+            os.remove(self.local_file)
+
+    def _send_get(self, path, headers=None, stream=False, chunk_size=None):
+        mock_resp = mock.Mock()
+        mock_resp.headers = {'etag': self.etag}
+        byte_range = headers.get('Range')
+        if self.status is not None:
+            data = 'Error page'
+            mock_resp.status_code = self.status
+        elif byte_range and self.honour_range and \
+                headers.get('If-Range') in (None, self.etag):
+            start, end = byte_range.split('=')[1].split('-')
+            data = self.DATA[int(start):int(end) + 1]
+            mock_resp.status_code = 206
+            mock_resp.headers['content-range'] = 'bytes %s-%s/%d' % (
+                start, end, len(self.DATA))
+        else:
+            data = self.DATA
+            mock_resp.status_code = 200
+        chunks = [data[i:i + chunk_size]
+                  for i in range(0, len(data), chunk_size)]
+        return mock_resp, iter(chunks)
+
+    def _read_local_file(self):
+        file_fd = open(self.local_file, 'rb')
+        data = file_fd.read()
+        file_fd.close()
+        return data
+
+    def test_segments(self):
+        resp = self.client.get_file_segmented(self.connection_obj,
+                                              'webdav/big.txt',
+                                              self.local_file, segments=3,
+                                              chunk_size=64,
+                                              min_segment_size=100)
+        self.assertEquals(resp.status_code, 206)
+        self.assertEquals(self._read_local_file(), self.DATA)
+        ranges = sorted(call[1]['headers']['Range'] for call in
+                        self.connection_obj.send_get.call_args_list)
+        self.assertEquals(ranges, ['bytes=0-333', 'bytes=334-667',
+                                   'bytes=668-999'])
+        self.assertEquals(set(call[1]['headers']['If-Range'] for call in
+                              self.connection_obj.send_get.call_args_list),
+                          set([self.etag]))
+
+    def test_changed_during_download(self):
+        send_get = self._send_get
+
+        def changing_send_get(*args, **kwargs):
+            resp, chunks = send_get(*args, **kwargs)
+            # Changed as soon as the first segment has been sent
+            self.etag = '"2"'
+            return resp, chunks
+
+        self.connection_obj.send_get.side_effect = changing_send_get
+        self.assertRaises(requests.HTTPError,
+                          self.client.get_file_segmented,
+                          self.connection_obj, 'webdav/big.txt',
+                          self.local_file, segments=3, chunk_size=64,
+                          min_segment_size=100)
+        self.assertFalse(os.path.exists(self.local_file))
+
+    def test_error_not_written(self):
+        self.status = 500
+        self.assertRaises(requests.HTTPError,
+                          self.client.get_file_segmented,
+                          self.connection_obj, 'webdav/big.txt',
+                          self.local_file, segments=3,
+                          min_segment_size=100)
+        self.assertFalse(os.path.exists(self.local_file))
+        self.status = 404
+        self.assertRaises(requests.HTTPError,
+                          self.client.get_file_segmented,
+                          self.connection_obj, 'webdav/big.txt',
+                          self.local_file, segments=4)
+        self.assertFalse(os.path.exists(self.local_file))
+
+    def test_weak_etag_single_stream(self):
+        self.client._fetch_properties.return_value[0].getetag = 'W/"1"'
+        self.client.get_file_segmented(self.connection_obj, 'webdav/big.txt',
+                                       self.local_file, segments=3,
+                                       min_segment_size=100)
+        self.assertEquals(self._read_local_file(), self.DATA)
+        self.assertEquals(self.connection_obj.send_get.call_count, 1)
+        self.assertFalse('Range' in
+                         self.connection_obj.send_get.call_args[1]['headers'])
+
+    def test_range_ignored(self):
+        self.honour_range = False
+        resp = self.client.get_file_segmented(self.connection_obj,
+                                              'webdav/big.txt',
+                                              self.local_file, segments=4,
+                                              chunk_size=64,
+                                              min_segment_size=100)
+        self.assertEquals(resp.status_code, 200)
+        self.assertEquals(self._read_local_file(), self.DATA)
+        self.assertEquals(self.connection_obj.send_get.call_count, 1)
+
+    def test_small_file_single_stream(self):
+        self.client.get_file_segmented(self.connection_obj, 'webdav/big.txt',
+                                       self.local_file, segments=4)
+        self.assertEquals(self._read_local_file(), self.DATA)
+        self.assertFalse('Range' in
+                         self.connection_obj.send_get.call_args[1]['headers'])
+
+    def test_split_ranges(self):
+        self.assertEquals(python_webdav.connection._split_ranges(10, 3),
+                          [(0, 3), (4, 7), (8, 9)])
+        self.assertEquals(python_webdav.connection._split_ranges(4, 4),
+                          [(0, 0), (1, 1), (2, 2), (3, 3)])
+
+
+class TestResumableDownload(unittest.TestCase):
+    """ Resumable downloads against a mocked connection serving DATA with
+        the ETag self.etag
+    """
+    DATA = 'Hello World! ' * 10
+
+    def setUp(self):
+        self.local_file = os.path.join(os.path.dirname(__file__),
+                                       'test_data', 'resumable.txt')
+        self.etag_file = (self.local_file +
+                          python_webdav.connection.RESUME_ETAG_SUFFIX)
+        self.etag = '"abc-123"'
+        self.connection_obj = mock.Mock()
+        self.connection_obj.send_get.side_effect = self._send_get
+        self.client = python_webdav.connection.Client()
+
+    def tearDown(self):
+        for file_name in [self.local_file, self.etag_file]:
+            if os.path.exists(file_name):
+                os.remove(file_name)
+
+    def _send_get(self, path, headers=None, stream=False, chunk_size=None):
+        mock_resp = mock.Mock()
+        mock_resp.headers = {'etag': self.etag}
+        byte_range = headers.get('Range')
+        if byte_range and headers.get('If-Range') == self.etag:
+            start = int(byte_range.split('=')[1].rstrip('-'))
+            if start >= len(self.DATA):
+                mock_resp.status_code = 416
+                return mock_resp, None
+            mock_resp.status_code = 206
+            mock_resp.headers['content-range'] = 'bytes %d-%d/%d' % (
+                start, len(self.DATA) - 1, len(self.DATA))
+            return mock_resp, iter([self.DATA[start:]])
+        mock_resp.status_code = 200
+        return mock_resp, iter([self.DATA])
+
+    def _write(self, file_name, data):
+        file_fd = open(file_name, 'wb')
+        file_fd.write(data)
+        file_fd.close()
+
+    def _read_local_file(self):
+        file_fd = open(self.local_file, 'rb')
+        data = file_fd.read()
+        file_fd.close()
+        return data
+
+    def test_fresh_download(self):
+        resp = self.client.get_file(self.connection_obj, 'webdav/big.txt',
+                                    self.local_file, resume=True)
+        self.assertEquals(resp.status_code, 200)
+        self.assertEquals(self._read_local_file(), self.DATA)
+        self.assertFalse(os.path.exists(self.etag_file))
+
+    def test_resumes_partial_file(self):
+        self._write(self.local_file, self.DATA[:50])
+        self._write(self.etag_file, self.etag)
+        resp = self.client.get_file_resumable(self.connection_obj,
+                                              'webdav/big.txt',
+                                              self.local_file)
+        headers = self.connection_obj.send_get.call_args[1]['headers']
+        self.assertEquals(headers['Range'], 'bytes=50-')
+        self.assertEquals(headers['If-Range'], self.etag)
+        self.assertEquals(resp.status_code, 206)
+        self.assertEquals(self._read_local_file(), self.DATA)
+        self.assertFalse(os.path.exists(self.etag_file))
+
+    def test_restarts_when_changed(self):
+        self._write(self.local_file, 'Stale data from an old version')
+        self._write(self.etag_file, '"old-etag"')
+        resp = self.client.get_file_resumable(self.connection_obj,
+                                              'webdav/big.txt',
+                                              self.local_file)
+        self.assertEquals(resp.status_code, 200)
+        self.assertEquals(self._read_local_file(), self.DATA)
+
+    def test_partial_file_without_etag_restarts(self):
+        self._write(self.local_file, self.DATA[:50])
+        self.client.get_file_resumable(self.connection_obj, 'webdav/big.txt',
+                                       self.local_file)
+        headers = self.connection_obj.send_get.call_args[1]['headers']
+        self.assertFalse('Range' in headers)
+        self.assertEquals(self._read_local_file(), self.DATA)
+
+    def test_already_complete(self):
+        self._write(self.local_file, self.DATA)
+        self._write(self.etag_file, self.etag)
+        resp = self.client.get_file_resumable(self.connection_obj,
+                                              'webdav/big.txt',
+                                              self.local_file)
+        self.assertEquals(resp.status_code, 416)
+        self.assertEquals(self._read_local_file(), self.DATA)
+        self.assertFalse(os.path.exists(self.etag_file))
+
+    def test_etag_kept_when_interrupted(self):
+        def broken_chunks():
+            yield self.DATA[:20]
+            raise requests.ConnectionError('Connection reset')
+        mock_resp = mock.Mock()
+        mock_resp.status_code = 200
+        mock_resp.headers = {'etag': self.etag}
+        self.connection_obj.send_get.side_effect = None
+        self.connection_obj.send_get.return_value = (mock_resp,
+                                                     broken_chunks())
+        self.assertRaises(requests.ConnectionError,
+                          self.client.get_file_resumable, self.connection_obj,
+                          'webdav/big.txt', self.local_file)
+        self.assertEquals(self._read_local_file(), self.DATA[:20])
+        etag_fd = open(self.etag_file, 'r')
+        self.assertEquals(etag_fd.read(), self.etag)
+        etag_fd.close()
+
+
+class TestPartUpload(unittest.TestCase):
+    """ Uploads in parts against the in-process DavServer
+    """
+    DATA = ''.join(chr(ord('a') + i % 26) for i in range(1000))
+
+    def setUp(self):
+        self.server_root = tempfile.mkdtemp()
+        self.server = DavServer(self.server_root).start()
+        settings = dict(username='', password='', realm='', port=0,
+                        host=self.server.url, path='/')
+        self.connection_obj = python_webdav.connection.Connection(settings)
+        self.client = python_webdav.connection.Client()
+        local_file_fd = tempfile.NamedTemporaryFile(delete=False)
+        local_file_fd.write(self.DATA)
+        local_file_fd.close()
+        self.local_file = local_file_fd.name
+        self.remote_file = os.path.join(self.server_root, 'big.txt')
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.server_root)
+        os.remove(self.local_file)
+        journal_file_name = (self.local_file +
+                             python_webdav.connection.RESUME_UPLOAD_SUFFIX)
+        if os.path.exists(journal_file_name):
+            os.remove(journal_file_name)
+
+    def _remote_data(self):
+        remote_fd = open(self.remote_file, 'rb')
+        data = remote_fd.read()
+        remote_fd.close()
+        return data
+
+    def _put_ranges(self):
+        return [headers.get('content-range')
+                for method, path, headers in self.server.requests
+                if method == 'PUT']
+
+    def test_send_in_parts(self):
+        resp, contents = self.client.send_file(self.connection_obj,
+                                               '/big.txt', self.local_file,
+                                               part_size=300)
+        self.assertEquals(resp.status_code, 204)
+        self.assertEquals(self._remote_data(), self.DATA)
+        self.assertEquals(self._put_ranges(),
+                          [None, 'bytes 300-599/1000', 'bytes 600-899/1000',
+                           'bytes 900-999/1000'])
+
+    def test_replaces_longer_resource(self):
+        remote_fd = open(self.remote_file, 'wb')
+        remote_fd.write('x' * 2000)
+        remote_fd.close()
+        self.client.send_file_in_parts(self.connection_obj, '/big.txt',
+                                       self.local_file, part_size=300)
+        self.assertEquals(self._remote_data(), self.DATA)
+
+    def _interrupted_upload(self):
+        """ Send the first two parts, then fail on the third
+        """
+        send_put = self.connection_obj.send_put
+
+        def failing_send_put(path, body, headers=None):
+            if headers.get('Content-Range', '').startswith('bytes 600-'):
+                raise requests.ConnectionError('Connection reset')
+            return send_put(path, body, headers=headers)
+
+        self.connection_obj.send_put = failing_send_put
+        self.assertRaises(requests.ConnectionError,
+                          self.client.send_file_in_parts, self.connection_obj,
+                          '/big.txt', self.local_file, part_size=300,
+                          retries=0)
+        self.connection_obj.send_put = send_put
+        del self.server.requests[:]
+
+    def test_resume(self):
+        self._interrupted_upload()
+        self.assertTrue(os.path.exists(
+            self.local_file + python_webdav.connection.RESUME_UPLOAD_SUFFIX))
+        self.client.send_file_in_parts(self.connection_obj, '/big.txt',
+                                       self.local_file, part_size=300,
+                                       resume=True)
+        self.assertEquals(self._remote_data(), self.DATA)
+        self.assertEquals(self._put_ranges(),
+                          ['bytes 600-899/1000', 'bytes 900-999/1000'])
+        self.assertFalse(os.path.exists(
+            self.local_file + python_webdav.connection.RESUME_UPLOAD_SUFFIX))
+
+    def test_resume_nothing_uploaded(self):
+        self.client.send_file_in_parts(self.connection_obj, '/big.txt',
+                                       self.local_file, part_size=300,
+                                       resume=True)
+        self.assertEquals(self._remote_data(), self.DATA)
+        self.assertEquals(self._put_ranges()[0], None)
+
+    def test_resume_without_record(self):
+        # Something that looks like the start of the file, but nothing
+        # shows it was sent by an upload of this one
+        remote_fd = open(self.remote_file, 'wb')
+        remote_fd.write(self.DATA[:700])
+        remote_fd.close()
+        self.client.send_file_in_parts(self.connection_obj, '/big.txt',
+                                       self.local_file, part_size=300,
+                                       resume=True)
+        self.assertEquals(self._remote_data(), self.DATA)
+        self.assertEquals(self._put_ranges()[0], None)
+
+    def test_resume_local_file_changed(self):
+        self._interrupted_upload()
+        data = self.DATA.upper()
+        local_file_fd = open(self.local_file, 'wb')
+        local_file_fd.write(data)
+        local_file_fd.close()
+        os.utime(self.local_file, (0, 0))
+        self.client.send_file_in_parts(self.connection_obj, '/big.txt',
+                                       self.local_file, part_size=300,
+                                       resume=True)
+        self.assertEquals(self._remote_data(), data)
+        self.assertEquals(self._put_ranges()[0], None)
+
+    def test_resume_remote_shorter(self):
+        self._interrupted_upload()
+        remote_fd = open(self.remote_file, 'wb')
+        remote_fd.write('unrelated')
+        remote_fd.close()
+        self.client.send_file_in_parts(self.connection_obj, '/big.txt',
+                                       self.local_file, part_size=300,
+                                       resume=True)
+        self.assertEquals(self._remote_data(), self.DATA)
+        self.assertEquals(self._put_ranges()[0], None)
+
+    def test_content_range_ignored(self):
+        # A server that takes every part for the whole file
+        send_put = self.connection_obj.send_put
+
+        def ignoring_send_put(path, body, headers=None):
+            headers = dict(headers)
+            headers.pop('Content-Range', None)
+            return send_put(path, body, headers=headers)
+
+        self.connection_obj.send_put = ignoring_send_put
+        self.assertRaises(requests.HTTPError, self.client.send_file_in_parts,
+                          self.connection_obj, '/big.txt', self.local_file,
+                          part_size=300)
+        self.assertEquals(len(self._remote_data()), 100)
+
+    def test_part_retried(self):
+        send_put = self.connection_obj.send_put
+        failures = []
+
+        def flaky_send_put(path, body, headers=None):
+            if headers.get('Content-Range', '').startswith('bytes 300-') \
+                    and not failures:
+                failures.append(path)
+                raise requests.ConnectionError('Connection reset')
+            return send_put(path, body, headers=headers)
+
+        self.connection_obj.send_put = flaky_send_put
+        self.client.send_file_in_parts(self.connection_obj, '/big.txt',
+                                       self.local_file, part_size=300,
+                                       retry_delay=0)
+        self.assertEquals(failures, ['/big.txt'])
+        self.assertEquals(self._remote_data(), self.DATA)
+
+    def test_gives_up_after_retries(self):
+        self.connection_obj.send_put = mock.Mock()
+        self.connection_obj.send_put.side_effect = requests.ConnectionError()
+        self.assertRaises(requests.ConnectionError,
+                          self.client.send_file_in_parts, self.connection_obj,
+                          '/big.txt', self.local_file, part_size=300,
+                          retries=2, retry_delay=0)
+        self.assertEquals(self.connection_obj.send_put.call_count, 3)
+
+    def test_partial_put_not_supported(self):
+        self.server.partial_put = False
+        self.assertRaises(requests.HTTPError, self.client.send_file_in_parts,
+                          self.connection_obj, '/big.txt', self.local_file,
+                          part_size=300, retry_delay=0)
+
+
+class TestPropertyCache(unittest.TestCase):
+    """ connection.Client with a PropertyCache, against the in-process
+        DavServer
+    """
+    def setUp(self):
+        self.server_root = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.server_root, 'listing'))
+        for number in range(3):
+            file_name = os.path.join(self.server_root, 'listing',
+                                     'file%02d.txt' % number)
+            open(file_name, 'w').close()
+        self.server = DavServer(self.server_root).start()
+        settings = dict(username='', password='', realm='', port=0,
+                        host=self.server.url, path='/')
+        self.connection_obj = python_webdav.connection.Connection(settings)
+        self.cache = python_webdav.cache.PropertyCache()
+        self.client = python_webdav.connection.Client(cache=self.cache)
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.server_root)
+
+    def _propfinds(self):
+        return [(path, headers.get('depth'))
+                for method, path, headers in self.server.requests
+                if method == 'PROPFIND']
+
+    def _hrefs(self):
+        return [resource.href for resource in
+                self.client.get_properties(self.connection_obj, 'listing')]
+
+    def test_repeat_is_cached(self):
+        first = self.client.get_properties(self.connection_obj, 'listing')
+        second = self.client.get_properties(self.connection_obj, '/listing/')
+        self.assertTrue(first is second)
+        self.assertEquals(len(self._propfinds()), 1)
+        self.assertEquals((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_properties_cached_apart(self):
+        self.client.get_properties(self.connection_obj, 'listing')
+        self.client.get_properties(self.connection_obj, 'listing',
+                                   ['getetag'])
+        self.client.get_properties(self.connection_obj, 'listing',
+                                   depth='0')
+        self.assertEquals(len(self._propfinds()), 3)
+
+    def test_put_invalidates(self):
+        self.assertEquals(len(self._hrefs()), 4)
+        local_file = os.path.join(self.server_root, 'upload.txt')
+        open(local_file, 'w').close()
+        self.client.send_file(self.connection_obj, 'listing/new.txt',
+                              local_file)
+        self.assertTrue('/listing/new.txt' in self._hrefs())
+        self.assertEquals(len(self._propfinds()), 2)
+
+    def test_delete_invalidates(self):
+        self.assertEquals(len(self._hrefs()), 4)
+        self.client.delete_resource(self.connection_obj,
+                                    'listing/file00.txt')
+        self.assertFalse('/listing/file00.txt' in self._hrefs())
+
+    def test_copy_and_mkcol_invalidate(self):
+        self.assertEquals(len(self._hrefs()), 4)
+        self.client.make_collection(self.connection_obj, 'listing/sub')
+        self.assertTrue('/listing/sub/' in self._hrefs())
+        self.client.copy_resource(self.connection_obj, 'listing/file00.txt',
+                                  'listing/copy.txt')
+        self.assertTrue('/listing/copy.txt' in self._hrefs())
+        self.assertEquals(len(self._propfinds()), 3)
+
+    def test_revalidation(self):
+        self.cache.ttl = 0
+        self.cache.validate = True
+        first = self.client.get_properties(self.connection_obj, 'listing')
+        second = self.client.get_properties(self.connection_obj, 'listing')
+        self.assertTrue(first is second)
+        self.assertEquals(self._propfinds(), [('/listing/', '1'),
+                                              ('/listing/', '1')])
+        self.assertEquals(self.cache.revalidations, 1)
+
+        # A change made by someone else shows up in the collection's ETag
+        time.sleep(0.01)
+        open(os.path.join(self.server_root, 'listing', 'other.txt'),
+             'w').close()
+        self.assertTrue('/listing/other.txt' in self._hrefs())
+        self.assertEquals(len(self._propfinds()), 4)
+
+
+    def test_revalidation_sees_member_change(self):
+        self.cache.ttl = 0
+        self.cache.validate = True
+        collection = os.path.join(self.server_root, 'listing')
+        member = os.path.join(collection, 'file01.txt')
+        file_fd = open(member, 'w')
+        file_fd.write('12345')
+        file_fd.close()
+        listing = self.client.get_properties(self.connection_obj, 'listing')
+        self.assertEquals(listing[2].getcontentlength, '5')
+
+        # Changing a member's content leaves the collection's ETag alone
+        collection_mtime = os.path.getmtime(collection)
+        time.sleep(0.01)
+        file_fd = open(member, 'w')
+        file_fd.write('twenty two bytes long')
+        file_fd.write('!')
+        file_fd.close()
+        self.assertEquals(os.path.getmtime(collection), collection_mtime)
+
+        listing = self.client.get_properties(self.connection_obj, 'listing')
+        self.assertEquals(listing[2].getcontentlength, '22')
+        self.assertEquals(self.cache.revalidations, 0)
+
+    def test_depth_zero_revalidation(self):
+        self.cache.ttl = 0
+        self.cache.validate = True
+        first = self.client.get_properties(self.connection_obj,
+                                           'listing/file00.txt', depth='0')
+        second = self.client.get_properties(self.connection_obj,
+                                            'listing/file00.txt', depth='0')
+        self.assertTrue(first is second)
+        self.assertEquals(self._propfinds()[-1],
+                          ('/listing/file00.txt', '0'))
+
+
+class TestWalk(unittest.TestCase):
+    """ Recursive listings against the in-process DavServer
+    """
+    def setUp(self):
+        self.server_root = tempfile.mkdtemp()
+        self.expected = ['/tree/']
+        for dir_name in ('tree', 'tree/a', 'tree/a/b', 'tree/c'):
+            if dir_name != 'tree':
+                self.expected.append('/%s/' % dir_name)
+            os.mkdir(os.path.join(self.server_root, dir_name))
+            for number in range(3):
+                file_name = '%s/file%d.txt' % (dir_name, number)
+                open(os.path.join(self.server_root, file_name), 'w').close()
+                self.expected.append('/' + file_name)
+        self.expected.sort()
+        self.server = DavServer(self.server_root).start()
+        settings = dict(username='', password='', realm='', port=0,
+                        host=self.server.url, path='/')
+        self.connection_obj = python_webdav.connection.Connection(settings)
+        self.client = python_webdav.connection.Client()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.server_root)
+
+    def _propfind_depths(self):
+        return [headers.get('depth')
+                for method, path, headers in self.server.requests
+                if method == 'PROPFIND']
+
+    def test_depth_infinity(self):
+        hrefs = [resource.href for resource in
+                 self.client.walk(self.connection_obj, 'tree')]
+        self.assertEquals(sorted(hrefs), self.expected)
+        self.assertEquals(self._propfind_depths(), ['infinity'])
+
+    def test_falls_back_to_depth_1(self):
+        self.server.allow_infinity = False
+        resources = list(self.client.walk(self.connection_obj, 'tree',
+                                          ['getcontentlength']))
+        self.assertEquals(sorted(resource.href for resource in resources),
+                          self.expected)
+        self.assertEquals(resources[0].href, '/tree/')
+        self.assertEquals(self._propfind_depths(),
+                          ['infinity', '1', '1', '1', '1'])
+
+    def test_without_depth_infinity(self):
+        hrefs = [resource.href for resource in
+                 self.client.walk(self.connection_obj, '/tree/',
+                                  depth_infinity=False, workers=2)]
+        self.assertEquals(sorted(hrefs), self.expected)
+        self.assertEquals(self._propfind_depths(), ['1', '1', '1', '1'])
+
+    def test_onerror(self):
+        get_properties = self.client.get_properties
+
+        def failing_get_properties(connection, uri, *args, **kwargs):
+            if uri.strip('/') == 'tree/a':
+                raise requests.HTTPError([mock.Mock(status_code=403), ''])
+            return get_properties(connection, uri, *args, **kwargs)
+
+        self.client.get_properties = failing_get_properties
+        walk = self.client.walk(self.connection_obj, 'tree',
+                                depth_infinity=False)
+        self.assertRaises(requests.HTTPError, list, walk)
+
+        errors = []
+        hrefs = [resource.href for resource in
+                 self.client.walk(self.connection_obj, 'tree',
+                                  depth_infinity=False,
+                                  onerror=errors.append)]
+        self.assertEquals(len(errors), 1)
+        self.assertEquals(sorted(hrefs),
+                          [href for href in self.expected
+                           if not href.startswith('/tree/a/') or
+                           href == '/tree/a/'])
+
+
+class TestConnectionPool(unittest.TestCase):
+    """ Pool settings given to Connection
+    """
+    def _connection(self, host='http://pool.example.com/webdav', **extra):
+        settings = dict(username='', password='', realm='', port=80,
+                        host=host, path='/')
+        settings.update(extra)
+        return python_webdav.connection.Connection(settings)
+
+    def _adapter(self, connection_obj):
+        return connection_obj.httpcon.get_adapter(
+            connection_obj.host + '/file.txt')
+
+    def test_defaults(self):
+        adapter = self._adapter(self._connection())
+        self.assertEquals(adapter._pool_maxsize,
+                          python_webdav.connection.DEFAULT_POOL_MAXSIZE)
+        self.assertFalse(adapter._pool_block)
+
+    def test_settings(self):
+        connection_obj = self._connection(pool_connections=2,
+                                          pool_maxsize=32, pool_block=True,
+                                          max_retries=3, keep_alive=False)
+        adapter = self._adapter(connection_obj)
+        self.assertEquals((adapter._pool_connections, adapter._pool_maxsize,
+                           adapter._pool_block, adapter.max_retries.total),
+                          (2, 32, True, 3))
+        self.assertEquals(connection_obj.httpcon.headers['Connection'],
+                          'close')
+
+    def test_shared_pool(self):
+        first = self._connection(share_pool=True, pool_maxsize=20)
+        second = self._connection(host='http://POOL.example.com/other',
+                                  share_pool=True, pool_maxsize=20)
+        self.assertTrue(self._adapter(first) is self._adapter(second))
+        # Different settings or hosts, or no sharing, get their own pool
+        for other in (self._connection(share_pool=True, pool_maxsize=5),
+                      self._connection(host='http://elsewhere.example.com',
+                                       share_pool=True, pool_maxsize=20),
+                      self._connection(pool_maxsize=20)):
+            self.assertFalse(self._adapter(first) is self._adapter(other))
+
+    def test_connections_reused(self):
+        server_root = tempfile.mkdtemp()
+        server = DavServer(server_root).start()
+        try:
+            first = self._connection(host=server.url, share_pool=True)
+            second = self._connection(host=server.url, share_pool=True)
+            first.send_put('/file.txt', 'data')
+            second.send_get('/file.txt')
+            pool = self._adapter(first).poolmanager.connection_from_url(
+                server.url)
+            self.assertEquals(pool.num_connections, 1)
+        finally:
+            server.stop()
+            shutil.rmtree(server_root)
+
+
+class TestBulk(unittest.TestCase):
+    """ Bulk operations against the in-process DavServer
+    """
+    def setUp(self):
+        self.server_root = tempfile.mkdtemp()
+        for number in range(20):
+            file_name = os.path.join(self.server_root, 'file%02d.txt' % number)
+            file_fd = open(file_name, 'w')
+            file_fd.write('data %d' % number)
+            file_fd.close()
+        self.server = DavServer(self.server_root).start()
+        settings = dict(username='', password='', realm='', port=0,
+                        host=self.server.url, path='/')
+        self.connection_obj = python_webdav.connection.Connection(settings)
+        self.client = python_webdav.connection.Client()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.server_root)
+
+    def test_bulk_delete(self):
+        paths = ['/file%02d.txt' % number for number in range(20)]
+        paths.insert(5, '/missing.txt')
+        results = self.client.bulk_delete(self.connection_obj, paths,
+                                          workers=4)
+        self.assertEquals([result.item for result in results], paths)
+        failed = [result for result in results if not result.ok]
+        self.assertEquals([result.item for result in failed],
+                          ['/missing.txt'])
+        self.assertEquals(failed[0].status_code, 404)
+        self.assertTrue(isinstance(failed[0].error, requests.HTTPError))
+        self.assertEquals(os.listdir(self.server_root), [])
+
+    def test_bulk_copy(self):
+        pairs = [('/file%02d.txt' % number, '/copy%02d.txt' % number)
+                 for number in range(3)]
+        pairs.append(('/file00.txt', '/nowhere/copy.txt'))
+        results = self.client.bulk_copy(self.connection_obj, pairs)
+        self.assertEquals([result.ok for result in results],
+                          [True, True, True, False])
+        self.assertEquals(results[3].item, pairs[3])
+        copy_fd = open(os.path.join(self.server_root, 'copy02.txt'))
+        self.assertEquals(copy_fd.read(), 'data 2')
+        copy_fd.close()
+
+    def test_bulk_mkdir(self):
+        paths = ['/a/b/c', '/a', '/a/b', '/d', '/file00.txt']
+        results = self.client.bulk_mkdir(self.connection_obj, paths)
+        self.assertEquals([result.item for result in results], paths)
+        self.assertEquals([result.ok for result in results],
+                          [True, True, True, True, False])
+        self.assertTrue(os.path.isdir(os.path.join(self.server_root,
+                                                   'a', 'b', 'c')))
+
+    def test_connection_errors_are_reported(self):
+        self.server.stop()
+        results = self.client.bulk_delete(self.connection_obj,
+                                          ['/file00.txt'])
+        self.assertFalse(results[0].ok)
+        self.assertEquals(results[0].status_code, None)
+        self.assertTrue(isinstance(results[0].error,
+                                   requests.ConnectionError))
+
+
+class TestCopyMove(unittest.TestCase):
+    """ COPY and MOVE against the in-process DavServer
+    """
+    def setUp(self):
+        self.server_root = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.server_root, 'dir'))
+        for name in ('dir/a.txt', 'b.txt'):
+            file_fd = open(os.path.join(self.server_root, name), 'w')
+            file_fd.write(name)
+            file_fd.close()
+        self.server = DavServer(self.server_root).start()
+        settings = dict(username='', password='', realm='', port=0,
+                        host=self.server.url, path='/')
+        self.connection_obj = python_webdav.connection.Connection(settings)
+        self.client = python_webdav.connection.Client()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.server_root)
+
+    def _exists(self, path):
+        return os.path.exists(os.path.join(self.server_root, path))
+
+    def test_copy_headers(self):
+        self.client.copy_resource(self.connection_obj, '/b.txt',
+                                  '/new name.txt')
+        headers = self.server.requests[-1][2]
+        self.assertEquals(headers['destination'],
+                          self.server.url + '/new%20name.txt')
+        self.assertEquals(headers['depth'], 'infinity')
+        self.assertEquals(headers['overwrite'], 'T')
+        self.assertTrue(self._exists('new name.txt'))
+
+    def test_copy_depth_0(self):
+        resp, contents = self.client.copy_resource(
+            self.connection_obj, '/dir', '/dir2', depth='0')
+        self.assertEquals(resp.status_code, 201)
+        self.assertTrue(self._exists('dir2'))
+        self.assertFalse(self._exists('dir2/a.txt'))
+
+    def test_no_overwrite(self):
+        resp, contents = self.client.copy_resource(
+            self.connection_obj, '/b.txt', '/dir/a.txt', overwrite=False)
+        self.assertEquals(resp.status_code, 412)
+        resp, contents = self.client.move_resource(
+            self.connection_obj, '/b.txt', '/dir/a.txt', overwrite=False)
+        self.assertEquals(resp.status_code, 412)
+        self.assertTrue(self._exists('b.txt'))
+
+    def test_move(self):
+        resp, contents = self.client.move_resource(self.connection_obj,
+                                                   '/dir', '/renamed')
+        self.assertEquals(resp.status_code, 201)
+        method, path, headers = self.server.requests[-1]
+        self.assertEquals((method, path), ('MOVE', '/dir'))
+        self.assertFalse('depth' in headers)
+        self.assertFalse(self._exists('dir'))
+        self.assertTrue(self._exists('renamed/a.txt'))
+
+    def test_move_invalidates_cache(self):
+        self.client.cache = python_webdav.cache.PropertyCache()
+        listing = self.client.get_properties(self.connection_obj, '/dir')
+        self.assertEquals(len(listing), 2)
+        self.client.move_resource(self.connection_obj, '/dir/a.txt',
+                                  '/a.txt')
+        listing = self.client.get_properties(self.connection_obj, '/dir')
+        self.assertEquals(len(listing), 1)
+
+    def test_bulk_move(self):
+        results = self.client.bulk_move(
+            self.connection_obj, [('/b.txt', '/dir/b.txt'),
+                                  ('/missing.txt', '/other.txt')])
+        self.assertEquals([result.ok for result in results], [True, False])
+        self.assertEquals(results[1].status_code, 404)
+        self.assertTrue(self._exists('dir/b.txt'))
+
+
+class TestCompression(unittest.TestCase):
+    """ Compressed replies and uploads against the in-process DavServer
+    """
+    def setUp(self):
+        self.server_root = tempfile.mkdtemp()
+        for number in range(20):
+            file_fd = open(os.path.join(self.server_root,
+                                        'file%02d.txt' % number), 'w')
+            file_fd.write('data ' * 100)
+            file_fd.close()
+        self.server = DavServer(self.server_root, compress=True).start()
+        self.connection_obj = self._connection()
+        self.client = python_webdav.connection.Client()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.server_root)
+
+    def _connection(self, **settings):
+        settings.update(username='', password='', realm='', port=0,
+                        host=self.server.url, path='/')
+        return python_webdav.connection.Connection(settings)
+
+    def _read(self, name):
+        file_fd = open(os.path.join(self.server_root, name))
+        data = file_fd.read()
+        file_fd.close()
+        return data
+
+    def test_compressed_propfind(self):
+        resp, content = self.connection_obj.send_propfind('/')
+        self.assertEquals(resp.headers['content-encoding'], 'gzip')
+        self.assertEquals(self.server.requests[-1][2]['accept-encoding'],
+                          python_webdav.connection.ACCEPT_ENCODING)
+        listing = self.client.get_properties(self.connection_obj, '/')
+        self.assertEquals(len(listing), 21)
+        # The streaming parser is fed the decompressed reply
+        names = [resource.href for resource in
+                 self.client.iter_properties(self.connection_obj, '/')]
+        self.assertEquals(names[1:3], ['/file00.txt', '/file01.txt'])
+
+    def test_compressed_get(self):
+        resp, content = self.connection_obj.send_get('/file00.txt')
+        self.assertEquals(resp.headers['content-encoding'], 'gzip')
+        self.assertEquals(content, 'data ' * 100)
+        resp, chunks = self.connection_obj.send_get('/file00.txt',
+                                                    stream=True)
+        self.assertEquals(''.join(chunks), 'data ' * 100)
+
+    def test_range_is_not_compressed(self):
+        resp, content = self.connection_obj.send_get(
+            '/file00.txt', headers={'Range': 'bytes=0-3'})
+        self.assertEquals(resp.status_code, 206)
+        self.assertEquals(content, 'data')
+        self.assertEquals(self.server.requests[-1][2]['accept-encoding'],
+                          'identity')
+
+    def test_compression_off(self):
+        connection_obj = self._connection(compression=False)
+        resp, content = connection_obj.send_propfind('/')
+        self.assertFalse('content-encoding' in resp.headers)
+        self.assertEquals(self.server.requests[-1][2]['accept-encoding'],
+                          'identity')
+
+    def test_compressed_put(self):
+        resp, content = self.connection_obj.send_put('/plain.txt', 'x' * 1000,
+                                                     compress=True)
+        self.assertEquals(resp.status_code, 201)
+        headers = self.server.requests[-1][2]
+        self.assertEquals(headers['content-encoding'], 'gzip')
+        self.assertTrue(int(headers['content-length']) < 100)
+        self.assertEquals(self._read('plain.txt'), 'x' * 1000)
+
+    def test_compressed_streamed_upload(self):
+        local_file = os.path.join(self.server_root, 'file00.txt')
+        connection_obj = self._connection(compress_uploads=True)
+        resp, contents = self.client.send_file(connection_obj,
+                                               '/uploaded.txt', local_file)
+        self.assertEquals(resp.status_code, 201)
+        headers = self.server.requests[-1][2]
+        self.assertEquals(headers['content-encoding'], 'gzip')
+        self.assertEquals(headers['transfer-encoding'], 'chunked')
+        self.assertEquals(self._read('uploaded.txt'), 'data ' * 100)
+
+    def test_partial_put_is_not_compressed(self):
+        connection_obj = self._connection(compress_uploads=True)
+        resp, content = connection_obj.send_put(
+            '/file00.txt', 'DATA', headers={'Content-Range': 'bytes 0-3/500'})
+        self.assertFalse('content-encoding' in self.server.requests[-1][2])
+        self.assertEquals(self._read('file00.txt'), 'DATA ' + 'data ' * 99)
+
+
 class MockProperty(object):
     def __init__(self):
         pass
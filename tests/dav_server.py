@@ -0,0 +1,601 @@
+""" dav_server.py
+    A small WebDAV server that serves a local directory. It runs in a thread
+    inside the test process so that tests can talk to a real server without
+    anything having to be installed or started by hand.
+
+    It only implements as much of WebDAV as the client uses:
+    GET / HEAD (with Range, If-Range, If-None-Match and If-Modified-Since),
+    PUT (including Content-Range
+    partial updates and chunked bodies), PROPFIND (Depth 0, 1 and infinity),
+    MKCOL, DELETE, COPY, MOVE, LOCK and UNLOCK. Requests can be required
+    to carry Digest authentication, and GET and PROPFIND replies can be
+    gzip compressed. Gzip encoded PUT bodies are always accepted.
+
+    Usage::
+
+        server = DavServer('/tmp/dav-root')
+        server.start()
+        ... use server.url ...
+        server.stop()
+"""
+import BaseHTTPServer
+import SocketServer
+import email.utils
+import gzip
+import hashlib
+import os
+import shutil
+import threading
+import time
+import urllib
+import urlparse
+import uuid
+import zlib
+from cStringIO import StringIO
+from xml.etree import cElementTree as ElementTree
+from xml.sax.saxutils import escape
+
+import requests.utils
+
+DAV_NS = 'DAV:'
+
+# Properties the server knows about. Anything else asked for is reported
+# with a 404 propstat.
+LIVE_PROPERTIES = ['resourcetype', 'creationdate', 'getcontentlength',
+                   'getlastmodified', 'getetag', 'getcontenttype',
+                   'supportedlock', 'lockdiscovery']
+
+
+class DavRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """ Request handler for DavServer
+    """
+    protocol_version = 'HTTP/1.1'
+    # Send each reply in one go, rather than a write per header, and
+    # without waiting for the client to acknowledge the last packet
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    @property
+    def dav(self):
+        return self.server.dav
+
+    def log_message(self, format, *args):
+        pass
+
+    def parse_request(self):
+        """ Parse the request line and headers, then refuse the request
+            with a Digest challenge if it isn't authenticated
+        """
+        if not BaseHTTPServer.BaseHTTPRequestHandler.parse_request(self):
+            return False
+        if self.dav.digest is None or self.command in self.dav.open_methods:
+            return True
+        stale = self._check_digest()
+        if stale is None:
+            return True
+        self.dav.record_unauthorized(self.command, self.path)
+        # The body hasn't been read, so the connection can't be used again
+        self.close_connection = 1
+        challenge = ('Digest realm="%s", nonce="%s", qop="auth", '
+                     'algorithm=MD5' % (self.dav.realm, self.dav.nonce))
+        if stale:
+            challenge += ', stale=true'
+        self._send(401, headers={'WWW-Authenticate': challenge,
+                                 'Connection': 'close'})
+        return False
+
+    def _check_digest(self):
+        """ Return None if the request has valid Digest authentication,
+            otherwise whether it failed only because the nonce is stale
+        """
+        header = self.headers.get('authorization', '')
+        if not header.lower().startswith('digest '):
+            return False
+        values = requests.utils.parse_dict_header(header[7:])
+        username, password = self.dav.digest
+        md5 = lambda value: hashlib.md5(value).hexdigest()
+        ha1 = md5('%s:%s:%s' % (username, self.dav.realm, password))
+        ha2 = md5('%s:%s' % (self.command, values.get('uri')))
+        expected = md5(':'.join([ha1, values.get('nonce', ''),
+                                 values.get('nc', ''),
+                                 values.get('cnonce', ''), 'auth', ha2]))
+        if values.get('response') != expected or \
+                values.get('username') != username:
+            return False
+        if values.get('nonce') != self.dav.nonce:
+            return True
+        # A nonce count may only be used once
+        if not self.dav.use_nonce_count(values.get('nc')):
+            return False
+        return None
+
+    # ------------------------------------------------------------------ #
+    # Helpers
+
+    def _local_path(self, path=None):
+        """ Map a request path (or the path of this request) on to the
+            served directory
+        """
+        if path is None:
+            path = self.path
+        path = urllib.unquote(urlparse.urlparse(path).path)
+        parts = [part for part in path.split('/') if part not in ('', '.')]
+        if '..' in parts:
+            return None
+        return os.path.join(self.dav.root, *parts)
+
+    def _href(self, local_path):
+        relative = os.path.relpath(local_path, self.dav.root)
+        href = '/' if relative == '.' else '/' + relative.replace(os.sep, '/')
+        if os.path.isdir(local_path) and not href.endswith('/'):
+            href += '/'
+        return urllib.quote(href)
+
+    def _read_body(self):
+        """ Read the request body, whether it is sent with a Content-Length
+            or chunked
+        """
+        if self.headers.get('transfer-encoding', '').lower() == 'chunked':
+            data = []
+            while True:
+                size = int(self.rfile.readline().split(';')[0].strip(), 16)
+                if not size:
+                    # Trailer, ending with a blank line
+                    while self.rfile.readline().strip():
+                        pass
+                    break
+                data.append(self.rfile.read(size))
+                self.rfile.readline()
+            return ''.join(data)
+        length = int(self.headers.get('content-length') or 0)
+        return self.rfile.read(length) if length else ''
+
+    def _wants_gzip(self):
+        """ Whether the reply to this request should be gzip compressed
+        """
+        accept = self.headers.get('accept-encoding', '')
+        return self.dav.compress and 'gzip' in [
+            coding.split(';')[0].strip().lower()
+            for coding in accept.split(',')]
+
+    def _send_compressed(self, status, body, headers):
+        """ Send a reply, gzip compressed if the client asked for that
+        """
+        if self._wants_gzip():
+            buffer_fd = StringIO()
+            gzip_fd = gzip.GzipFile(fileobj=buffer_fd, mode='wb')
+            gzip_fd.write(body)
+            gzip_fd.close()
+            body = buffer_fd.getvalue()
+            headers = dict(headers, **{'Content-Encoding': 'gzip',
+                                       'Vary': 'Accept-Encoding'})
+        self._send(status, body, headers)
+
+    def _send(self, status, body='', headers=None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body and self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _etag(self, local_path):
+        stat = os.stat(local_path)
+        return '"%x-%x-%x"' % (stat.st_ino, stat.st_size,
+                               int(stat.st_mtime * 1000000))
+
+    def _record(self):
+        self.dav.record(self.command, self.path, self.headers)
+
+    # ------------------------------------------------------------------ #
+    # Methods
+
+    def do_OPTIONS(self):
+        self._record()
+        self._read_body()
+        self._send(200, headers={'DAV': '1, 2', 'Allow': ', '.join(
+            ['OPTIONS', 'GET', 'HEAD', 'PUT', 'DELETE', 'PROPFIND', 'MKCOL',
+             'COPY', 'MOVE', 'LOCK', 'UNLOCK'])})
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        self._record()
+        self._read_body()
+        local_path = self._local_path()
+        if local_path is None or not os.path.exists(local_path):
+            return self._send(404)
+        if os.path.isdir(local_path):
+            return self._send(200, headers={'Content-Type': 'text/plain'})
+
+        size = os.path.getsize(local_path)
+        etag = self._etag(local_path)
+        headers = {'ETag': etag,
+                   'Last-Modified': email.utils.formatdate(
+                       os.path.getmtime(local_path), usegmt=True),
+                   'Content-Type': 'application/octet-stream',
+                   'Accept-Ranges': 'bytes' if self.dav.ranges else 'none'}
+
+        if_none_match = self.headers.get('if-none-match')
+        if if_none_match:
+            not_modified = etag in [tag.strip()
+                                    for tag in if_none_match.split(',')]
+        else:
+            not_modified = (self.headers.get('if-modified-since') ==
+                            headers['Last-Modified'])
+        if not_modified:
+            del headers['Content-Type']
+            return self._send(304, headers=headers)
+
+        start, end = 0, size - 1
+        status = 200
+        byte_range = self.headers.get('range')
+        if_range = self.headers.get('if-range')
+        if (byte_range and self.dav.ranges and
+                (not if_range or if_range == etag)):
+            first, last = byte_range.split('=', 1)[1].split(',')[0].split('-')
+            if not first:
+                start = max(size - int(last), 0)
+            else:
+                start = int(first)
+                if last:
+                    end = min(int(last), size - 1)
+            if start >= size:
+                headers['Content-Range'] = 'bytes */%d' % size
+                return self._send(416, headers=headers)
+            status = 206
+            headers['Content-Range'] = 'bytes %d-%d/%d' % (start, end, size)
+        elif self.command == 'GET' and self._wants_gzip():
+            file_fd = open(local_path, 'rb')
+            try:
+                return self._send_compressed(200, file_fd.read(), headers)
+            finally:
+                file_fd.close()
+
+        length = max(end - start + 1, 0)
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(length))
+        self.end_headers()
+        if self.command == 'HEAD':
+            return
+        file_fd = open(local_path, 'rb')
+        try:
+            file_fd.seek(start)
+            while length:
+                data = file_fd.read(min(length, 64 * 1024))
+                if not data:
+                    break
+                self.wfile.write(data)
+                length -= len(data)
+        finally:
+            file_fd.close()
+
+    def do_PUT(self):
+        self._record()
+        body = self._read_body()
+        encoding = self.headers.get('content-encoding', '').lower()
+        if encoding == 'gzip':
+            body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+        elif encoding not in ('', 'identity'):
+            return self._send(415)
+        local_path = self._local_path()
+        if local_path is None or os.path.isdir(local_path):
+            return self._send(405)
+        if not os.path.isdir(os.path.dirname(local_path)):
+            return self._send(409)
+        created = not os.path.exists(local_path)
+
+        content_range = self.headers.get('content-range')
+        if content_range:
+            if not self.dav.partial_put:
+                return self._send(400)
+            positions = content_range.split()[1].split('/')[0]
+            start = int(positions.split('-')[0])
+            mode = 'wb' if created else 'r+b'
+        else:
+            start = 0
+            mode = 'wb'
+
+        file_fd = open(local_path, mode)
+        try:
+            file_fd.seek(start)
+            file_fd.write(body)
+        finally:
+            file_fd.close()
+        self._send(201 if created else 204)
+
+    def do_DELETE(self):
+        self._record()
+        self._read_body()
+        local_path = self._local_path()
+        if local_path is None or not os.path.exists(local_path):
+            return self._send(404)
+        if os.path.isdir(local_path):
+            shutil.rmtree(local_path)
+        else:
+            os.remove(local_path)
+        self._send(204)
+
+    def do_MKCOL(self):
+        self._record()
+        self._read_body()
+        local_path = self._local_path()
+        if local_path is None or os.path.exists(local_path):
+            return self._send(405)
+        if not os.path.isdir(os.path.dirname(local_path.rstrip(os.sep))):
+            return self._send(409)
+        os.mkdir(local_path)
+        self._send(201)
+
+    def _copy_or_move(self, move):
+        self._record()
+        self._read_body()
+        source = self._local_path()
+        destination = self._local_path(self.headers.get('destination', ''))
+        if source is None or not os.path.exists(source):
+            return self._send(404)
+        if destination is None:
+            return self._send(400)
+        if not os.path.isdir(os.path.dirname(destination.rstrip(os.sep))):
+            return self._send(409)
+        existed = os.path.exists(destination)
+        if existed:
+            if self.headers.get('overwrite', 'T').upper() == 'F':
+                return self._send(412)
+            if os.path.isdir(destination):
+                shutil.rmtree(destination)
+            else:
+                os.remove(destination)
+
+        if move:
+            shutil.move(source, destination)
+        elif os.path.isdir(source):
+            if self.headers.get('depth', 'infinity') == '0':
+                os.mkdir(destination)
+            else:
+                shutil.copytree(source, destination)
+        else:
+            shutil.copy2(source, destination)
+        self._send(204 if existed else 201)
+
+    def do_COPY(self):
+        self._copy_or_move(False)
+
+    def do_MOVE(self):
+        self._copy_or_move(True)
+
+    def do_LOCK(self):
+        self._record()
+        self._read_body()
+        local_path = self._local_path()
+        if local_path is None:
+            return self._send(404)
+        token = 'opaquelocktoken:%s' % uuid.uuid4()
+        self.dav.locks[local_path] = token
+        body = ('<?xml version="1.0" encoding="utf-8"?>'
+                '<D:prop xmlns:D="DAV:"><D:lockdiscovery><D:activelock>'
+                '<D:locktype><D:write/></D:locktype>'
+                '<D:lockscope><D:exclusive/></D:lockscope>'
+                '<D:depth>0</D:depth>'
+                '<D:locktoken><D:href>%s</D:href></D:locktoken>'
+                '</D:activelock></D:lockdiscovery></D:prop>' % token)
+        self._send(200, body, {'Lock-Token': '<%s>' % token,
+                               'Content-Type': 'text/xml; charset="utf-8"'})
+
+    def do_UNLOCK(self):
+        self._record()
+        self._read_body()
+        local_path = self._local_path()
+        token = self.headers.get('lock-token', '').strip('<>')
+        if self.dav.locks.get(local_path) != token:
+            return self._send(409)
+        del self.dav.locks[local_path]
+        self._send(204)
+
+    def do_PROPFIND(self):
+        self._record()
+        body = self._read_body()
+        local_path = self._local_path()
+        if local_path is None or not os.path.exists(local_path):
+            return self._send(404)
+
+        depth = self.headers.get('depth', 'infinity').lower()
+        if depth == 'infinity' and not self.dav.allow_infinity:
+            error = ('<?xml version="1.0" encoding="utf-8"?>'
+                     '<D:error xmlns:D="DAV:"><D:propfind-finite-depth/>'
+                     '</D:error>')
+            return self._send(403, error,
+                              {'Content-Type': 'text/xml; charset="utf-8"'})
+
+        requested = None
+        if body.strip():
+            root = ElementTree.fromstring(body)
+            prop = root.find('{DAV:}prop')
+            if prop is not None:
+                requested = [(child.tag[1:].split('}')[0],
+                              child.tag.split('}')[-1]) for child in prop]
+
+        paths = [local_path]
+        if os.path.isdir(local_path) and depth != '0':
+            if depth == '1':
+                paths.extend(os.path.join(local_path, name)
+                             for name in sorted(os.listdir(local_path)))
+            else:
+                for dir_path, dir_names, file_names in os.walk(local_path):
+                    dir_names.sort()
+                    paths.extend(os.path.join(dir_path, name)
+                                 for name in sorted(dir_names + file_names))
+
+        parts = ['<?xml version="1.0" encoding="utf-8"?>'
+                 '<D:multistatus xmlns:D="DAV:">']
+        for path in paths:
+            parts.append(self._response_xml(path, requested))
+        parts.append('</D:multistatus>')
+        self._send_compressed(207, ''.join(parts),
+                              {'Content-Type': 'text/xml; charset="utf-8"'})
+
+    def _property_values(self, local_path):
+        stat = os.stat(local_path)
+        values = {
+            'creationdate': time.strftime('%Y-%m-%dT%H:%M:%SZ',
+                                          time.gmtime(stat.st_ctime)),
+            'getlastmodified': email.utils.formatdate(stat.st_mtime,
+                                                      usegmt=True),
+            'getetag': escape(self._etag(local_path)),
+            'supportedlock': ('<D:lockentry><D:lockscope><D:exclusive/>'
+                              '</D:lockscope><D:locktype><D:write/>'
+                              '</D:locktype></D:lockentry>'),
+            'lockdiscovery': '',
+        }
+        if os.path.isdir(local_path):
+            values['resourcetype'] = '<D:collection/>'
+            values['getcontenttype'] = 'httpd/unix-directory'
+        else:
+            values['resourcetype'] = ''
+            values['getcontentlength'] = str(stat.st_size)
+            values['getcontenttype'] = 'text/plain'
+        return values
+
+    def _response_xml(self, local_path, requested):
+        values = self._property_values(local_path)
+        found = []
+        missing = []
+        if requested is None:
+            found = [(DAV_NS, name) for name in LIVE_PROPERTIES
+                     if name in values]
+        else:
+            for namespace, name in requested:
+                if namespace == DAV_NS and name in values:
+                    found.append((namespace, name))
+                else:
+                    missing.append((namespace, name))
+
+        parts = ['<D:response><D:href>%s</D:href>' % self._href(local_path)]
+        if found:
+            parts.append('<D:propstat><D:prop>')
+            for namespace, name in found:
+                if values[name]:
+                    parts.append('<D:%s>%s</D:%s>' % (name, values[name],
+                                                      name))
+                else:
+                    # Empty properties are sent the way Apache sends them
+                    parts.append('<D:%s/>' % name)
+            parts.append('</D:prop><D:status>HTTP/1.1 200 OK</D:status>'
+                         '</D:propstat>')
+        if missing:
+            parts.append('<D:propstat><D:prop>')
+            for namespace, name in missing:
+                parts.append('<X:%s xmlns:X="%s"/>' % (name, namespace))
+            parts.append('</D:prop><D:status>HTTP/1.1 404 Not Found'
+                         '</D:status></D:propstat>')
+        parts.append('</D:response>')
+        return ''.join(parts)
+
+
+class _ThreadingHTTPServer(SocketServer.ThreadingMixIn,
+                           BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class DavServer(object):
+    """ A WebDAV server for a local directory, running in a background
+        thread on an unused port of localhost.
+
+        :param root: Directory to serve
+        :type root: String
+
+        :param ranges: Whether Range requests are honoured on GET
+        :type ranges: Boolean
+
+        :param partial_put: Whether PUT accepts Content-Range to update
+                            part of a resource
+        :type partial_put: Boolean
+
+        :param allow_infinity: Whether Depth: infinity PROPFINDs are allowed
+        :type allow_infinity: Boolean
+
+        :param digest: (username, password) to require Digest
+                       authentication with
+        :type digest: Tuple
+
+        :param open_methods: Methods answered without Digest
+                             authentication
+        :type open_methods: Tuple
+
+        :param compress: Whether GET and PROPFIND replies are gzip
+                         compressed for clients that accept it
+        :type compress: Boolean
+    """
+    realm = 'dav-server'
+
+    def __init__(self, root, ranges=True, partial_put=True,
+                 allow_infinity=True, digest=None, compress=False,
+                 open_methods=()):
+        self.root = os.path.abspath(root)
+        self.ranges = ranges
+        self.partial_put = partial_put
+        self.allow_infinity = allow_infinity
+        self.digest = digest
+        self.open_methods = open_methods
+        self.compress = compress
+        self.nonce = uuid.uuid4().hex
+        self.unauthorized = []
+        self._nonce_counts = set()
+        self.locks = {}
+        self.requests = []
+        self._requests_lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+        self.url = None
+
+    def record(self, method, path, headers):
+        """ Keep a note of each request, for tests to inspect
+        """
+        with self._requests_lock:
+            self.requests.append((method, path, dict(headers)))
+
+    def record_unauthorized(self, method, path):
+        with self._requests_lock:
+            self.unauthorized.append((method, path))
+
+    def use_nonce_count(self, nonce_count):
+        """ Note a nonce count as used. Returns False if it already was.
+        """
+        with self._requests_lock:
+            if nonce_count in self._nonce_counts:
+                return False
+            self._nonce_counts.add(nonce_count)
+            return True
+
+    def expire_nonce(self):
+        """ Start using a new nonce. Requests with the old one are refused
+            as stale.
+        """
+        with self._requests_lock:
+            self.nonce = uuid.uuid4().hex
+            self._nonce_counts = set()
+
+    def start(self):
+        if not os.path.isdir(self.root):
+            os.makedirs(self.root)
+        self._httpd = _ThreadingHTTPServer(('127.0.0.1', 0),
+                                           DavRequestHandler)
+        self._httpd.dav = self
+        self._thread = threading.Thread(target=self._httpd.serve_forever,
+                                        kwargs={'poll_interval': 0.05})
+        self._thread.daemon = True
+        self._thread.start()
+        self.url = 'http://127.0.0.1:%d' % self._httpd.server_address[1]
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._thread.join()
+            self._httpd = None
@@ -0,0 +1,113 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+import mock
+import requests
+
+import python_webdav.connection
+import python_webdav.instrument as instrument
+from dav_server import DavServer
+
+
+class TestInstrumentation(unittest.TestCase):
+    """ Instrumentation hooks against the in-process DavServer
+    """
+    def setUp(self):
+        self.server_root = tempfile.mkdtemp()
+        for number in range(5):
+            file_fd = open(os.path.join(self.server_root,
+                                        'file%d.txt' % number), 'w')
+            file_fd.write('data %d' % number)
+            file_fd.close()
+        self.server = DavServer(self.server_root).start()
+        self.collector = instrument.Collector(keep=100)
+        self.connection_obj = self._connection(hooks=[self.collector])
+        self.client = python_webdav.connection.Client()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.server_root)
+
+    def _connection(self, **settings):
+        settings.update(username='', password='', realm='', port=0,
+                        host=self.server.url, path='/')
+        return python_webdav.connection.Connection(settings)
+
+    def test_no_hooks(self):
+        connection_obj = self._connection()
+        with mock.patch.object(connection_obj,
+                               '_send_timed_request') as timed:
+            resp, content = connection_obj.send_get('/file0.txt')
+        self.assertEquals(content, 'data 0')
+        self.assertFalse(timed.called)
+
+    def test_request_timings(self):
+        self.connection_obj.send_put('/new.txt', 'hello')
+        self.connection_obj.send_get('/new.txt')
+        put, get = self.collector.timings
+        self.assertEquals((put.kind, put.method, put.path, put.status),
+                          (instrument.REQUEST, 'PUT', '/new.txt', 201))
+        self.assertEquals((put.bytes_sent, get.bytes_received), (5, 5))
+        # The first request opens a connection, the second reuses it
+        self.assertTrue(put.connect_time is not None)
+        self.assertTrue(get.connect_time is None)
+        self.assertTrue(0 <= get.ttfb <= get.total_time)
+
+    def test_chunked_body_counted(self):
+        self.connection_obj.send_put('/chunked.txt', iter(['one', 'two']))
+        self.assertEquals(self.collector.timings[-1].bytes_sent, 6)
+
+    def test_parse_timings(self):
+        self.client.get_properties(self.connection_obj, '/')
+        list(self.client.iter_properties(self.connection_obj, '/'))
+        parses = [timing for timing in self.collector.timings
+                  if timing.kind == instrument.PARSE]
+        self.assertEquals([(timing.method, timing.resources)
+                           for timing in parses],
+                          [('PROPFIND', 6), ('PROPFIND', 6)])
+        self.assertTrue(all(timing.parse_time >= 0 for timing in parses))
+        summary = self.collector.summary()
+        self.assertEquals(summary[(instrument.REQUEST, 'PROPFIND')]['count'],
+                          2)
+        self.assertEquals(summary[(instrument.PARSE, 'PROPFIND')]['resources'],
+                          12)
+
+    def test_failed_request(self):
+        self.server.stop()
+        self.assertRaises(requests.ConnectionError,
+                          self.connection_obj.send_get, '/file0.txt')
+        timing = self.collector.timings[-1]
+        self.assertTrue(timing.status is None)
+        self.assertTrue(isinstance(timing.error, requests.ConnectionError))
+        self.assertEquals(self.collector.summary()[
+            (instrument.REQUEST, 'GET')]['errors'], 1)
+
+    def test_remove_hook(self):
+        self.connection_obj.remove_hook(self.collector)
+        self.connection_obj.send_get('/file0.txt')
+        self.assertEquals(self.collector.timings, [])
+        hook = mock.Mock()
+        self.connection_obj.add_hook(hook)
+        self.connection_obj.send_get('/file0.txt')
+        self.assertEquals(hook.call_args[0][0].path, '/file0.txt')
+
+
+class TestCollector(unittest.TestCase):
+    def test_summary(self):
+        collector = instrument.Collector(keep=1)
+        for seconds, status in ((0.5, 200), (1.5, 404)):
+            collector(instrument.Timing(instrument.REQUEST, 'GET', '/a',
+                                        status=status, bytes_received=10,
+                                        total_time=seconds))
+        self.assertEquals(len(collector.timings), 1)
+        totals = collector.summary()[(instrument.REQUEST, 'GET')]
+        self.assertEquals((totals['count'], totals['bytes_received']),
+                          (2, 20))
+        self.assertEquals((totals['mean'], totals['min'], totals['max']),
+                          (1.0, 0.5, 1.5))
+        self.assertEquals(totals['statuses'], {200: 1, 404: 1})
+        self.assertTrue('GET' in collector.report())
+        collector.reset()
+        self.assertEquals(collector.summary(), {})
@@ -0,0 +1,234 @@
+import unittest
+import os
+import sys
+
+import python_webdav.parse
+
+MULTISTATUS = os.path.join(os.path.dirname(__file__), 'test_data',
+                           'multistatus.xml')
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..',
+                                'benchmarks'))
+import corpus
+
+
+def _as_dict(response):
+    """ Response attributes as a dict, with locks as (type, scope) pairs
+    """
+    result = dict(response.__dict__)
+    result['locks'] = [(lock.locktype, lock.lockscope)
+                       for lock in response.locks]
+    return result
+
+
+class SlowReader(object):
+    """ File like object handing out data a few bytes at a time, counting
+        how much has been read
+    """
+    def __init__(self, data, block_size=64):
+        self.data = data
+        self.block_size = block_size
+        self.position = 0
+
+    def read(self, size=-1):
+        size = self.block_size if size < 0 else min(size, self.block_size)
+        data = self.data[self.position:self.position + size]
+        self.position += len(data)
+        return data
+
+
+class TestFastParser(unittest.TestCase):
+    def setUp(self):
+        xml_fd = open(MULTISTATUS, 'r')
+        self.xml = xml_fd.read()
+        xml_fd.close()
+
+    def test_matches_lxml_parser(self):
+        expected = python_webdav.parse.LxmlParser().parse(self.xml)
+        result = python_webdav.parse.FastParser().parse(self.xml)
+        self.assertEqual([_as_dict(resp) for resp in result],
+                         [_as_dict(resp) for resp in expected])
+
+    def test_unicode_input(self):
+        result = python_webdav.parse.FastParser().parse(
+            self.xml.decode('utf-8'))
+        self.assertEqual(len(result), 3)
+
+    def test_response_objects(self):
+        parser = python_webdav.parse.FastParser()
+        parser.parse(self.xml)
+        self.assertEqual([resp.href for resp in parser.response_objects],
+                         ['/webdav/', '/webdav/foobag.txt', '/webdav/cake/'])
+
+    def test_collection_has_no_executable(self):
+        xml = ('<D:multistatus xmlns:D="DAV:" '
+               'xmlns:A="http://apache.org/dav/props/">'
+               '<D:response><D:href>/c/</D:href><D:propstat><D:prop>'
+               '<D:resourcetype><D:collection/></D:resourcetype>'
+               '<A:executable>T</A:executable></D:prop>'
+               '<D:status>HTTP/1.1 200 OK</D:status></D:propstat>'
+               '</D:response></D:multistatus>')
+        result = python_webdav.parse.FastParser().parse(xml)
+        self.assertEqual(result[0].resourcetype, 'collection')
+        self.assertEqual(result[0].executable, None)
+
+
+class TestIterParser(unittest.TestCase):
+    def setUp(self):
+        xml_fd = open(MULTISTATUS, 'r')
+        self.xml = xml_fd.read()
+        xml_fd.close()
+
+    def test_matches_lxml_parser(self):
+        expected = python_webdav.parse.LxmlParser().parse(self.xml)
+        result = python_webdav.parse.IterParser().parse(self.xml)
+        self.assertEqual([_as_dict(resp) for resp in result],
+                         [_as_dict(resp) for resp in expected])
+
+    def test_properties(self):
+        result = python_webdav.parse.IterParser().parse(self.xml)
+        self.assertEqual(len(result), 3)
+        self.assertEqual(_as_dict(result[1]),
+                         {'getetag': '"314189-7-4729e2837fe00"',
+                          'status': 'HTTP/1.1 200 OK',
+                          'getlastmodified': 'Wed, 02 Sep 2009 20:31:52 GMT',
+                          'resourcetype': 'resource',
+                          'href': '/webdav/foobag.txt',
+                          'getcontenttype': 'text/plain',
+                          'locks': [('write', 'exclusive'),
+                                    ('write', 'shared')],
+                          'executable': 'F',
+                          'getcontentlength': '7',
+                          'creationdate': '2009-09-02T20:31:52Z'})
+
+    def test_yields_before_reading_everything(self):
+        reader = SlowReader(self.xml)
+        responses = python_webdav.parse.IterParser().iterparse(reader)
+        first = next(responses)
+        self.assertEqual(first.href, '/webdav/')
+        self.assertTrue(reader.position < len(self.xml))
+        self.assertEqual([resp.href for resp in responses],
+                         ['/webdav/foobag.txt', '/webdav/cake/'])
+
+    def test_namespaces(self):
+        """ Properties are matched on namespace, not on prefix
+        """
+        xml = ('<?xml version="1.0" encoding="utf-8"?>'
+               '<multistatus xmlns="DAV:" xmlns:X="urn:example">'
+               '<response><href>/a.txt</href><propstat><prop>'
+               '<getetag>"1"</getetag><X:getcontentlength>99'
+               '</X:getcontentlength></prop>'
+               '<status>HTTP/1.1 200 OK</status></propstat></response>'
+               '</multistatus>')
+        result = python_webdav.parse.IterParser().parse(xml)
+        self.assertEqual(result[0].href, '/a.txt')
+        self.assertEqual(result[0].getetag, '"1"')
+        self.assertEqual(result[0].getcontentlength, None)
+
+
+class TestSoupParser(unittest.TestCase):
+    def test_empty_resourcetype(self):
+        xml = ('<D:multistatus xmlns:D="DAV:"><D:response>'
+               '<D:href>/a.txt</D:href><D:propstat><D:prop>'
+               '<D:resourcetype></D:resourcetype><D:getetag>"1"</D:getetag>'
+               '</D:prop></D:propstat></D:response><D:response>'
+               '<D:href>/b.txt</D:href><D:propstat><D:prop>'
+               '<D:resourcetype/><D:getetag>"2"</D:getetag>'
+               '</D:prop></D:propstat></D:response></D:multistatus>')
+        result = python_webdav.parse.SoupParser().parse(xml)
+        self.assertEqual([resp.resourcetype for resp in result],
+                         ['resource', 'resource'])
+
+
+class TestCorpus(unittest.TestCase):
+    """ Every parser reads the benchmark corpus the same way, so the
+        benchmarks compare like with like
+    """
+    def _summary(self, responses):
+        return [(unicode(resp.href), resp.resourcetype,
+                 resp.getetag and unicode(resp.getetag),
+                 resp.getcontentlength and unicode(resp.getcontentlength),
+                 len(resp.locks)) for resp in responses]
+
+    def test_parsers_agree(self):
+        for kind in corpus.KINDS:
+            data = corpus.make_corpus(kind, 60)
+            expected = self._summary(
+                python_webdav.parse.FastParser().parse(data))
+            self.assertEqual(len(expected), 60)
+            for parser_class in (python_webdav.parse.IterParser,
+                                 python_webdav.parse.LxmlParser):
+                self.assertEqual(self._summary(parser_class().parse(data)),
+                                 expected, '%s on %s' % (
+                                     parser_class.__name__, kind))
+            soup = python_webdav.parse.SoupParser().parse(data)
+            self.assertEqual([resp.resourcetype for resp in soup],
+                             [row[1] for row in expected])
+
+    def test_kinds(self):
+        locks = python_webdav.parse.FastParser().parse(
+            corpus.make_corpus('locks', 2, lockentries=5))
+        self.assertEqual([len(resp.locks) for resp in locks], [5, 5])
+        self.assertEqual(locks[0].resourcetype, 'collection')
+        self.assertEqual(corpus.make_corpus('dead', 3),
+                         ''.join(corpus.iter_corpus('dead', 3)))
+        self.assertRaises(ValueError, corpus.make_corpus, 'wibble', 1)
+
+
+class TestListingResult(unittest.TestCase):
+    def setUp(self):
+        xml_fd = open(MULTISTATUS, 'r')
+        self.responses = python_webdav.parse.FastParser().parse(xml_fd.read())
+        xml_fd.close()
+        self.listing = python_webdav.parse.ListingResult(self.responses)
+
+    def test_rows_match_responses(self):
+        self.assertEqual(len(self.listing), 3)
+        self.assertEqual([_as_dict(resp) for resp in self.responses],
+                         [_as_row_dict(row) for row in self.listing])
+
+    def test_indexing(self):
+        self.assertEqual(self.listing[1].href, '/webdav/foobag.txt')
+        self.assertEqual(self.listing[-1].href, '/webdav/cake/')
+        self.assertRaises(IndexError, self.listing.__getitem__, 3)
+
+    def test_content_length(self):
+        self.assertEqual(self.listing[0].getcontentlength, None)
+        self.assertEqual(self.listing[1].getcontentlength, '7')
+
+    def test_unknown_attribute(self):
+        self.assertEqual(getattr(self.listing[0], 'wibble', None), None)
+        self.assertRaises(AttributeError, getattr, self.listing[0], 'wibble')
+
+    def test_shared_values(self):
+        self.assertTrue(self.listing.columns['getcontenttype'][0] is
+                        self.listing.columns['getcontenttype'][2])
+        self.assertTrue(self.listing.lock_column[0] is
+                        self.listing.lock_column[1])
+
+    def test_append(self):
+        response = python_webdav.parse.Response()
+        response.href = '/webdav/new.txt'
+        response.getcontentlength = '12'
+        self.listing.append(response)
+        self.assertEqual(len(self.listing), 4)
+        self.assertEqual(self.listing[3].href, '/webdav/new.txt')
+        self.assertEqual(self.listing[3].getcontentlength, '12')
+        self.assertEqual(self.listing[3].locks, [])
+
+    def test_large_content_length(self):
+        # Beyond what a 32 bit long holds
+        response = python_webdav.parse.Response()
+        response.href = '/webdav/large.iso'
+        response.getcontentlength = str(5 * 1024 ** 3 + 1)
+        self.listing.append(response)
+        self.assertEqual(self.listing[3].getcontentlength, '5368709121')
+
+
+def _as_row_dict(row):
+    """ The attributes of a ListingRow as a dict, like _as_dict
+    """
+    result = dict((name, getattr(row, name)) for name in
+                  python_webdav.parse.Response().__dict__)
+    result['locks'] = [(lock.locktype, lock.lockscope) for lock in row.locks]
+    return result
@@ -0,0 +1,176 @@
+import unittest
+import os
+import shutil
+import tempfile
+import time
+
+import python_webdav.connection
+import python_webdav.sync as sync
+from dav_server import DavServer
+
+
+def _write(file_name, data, mtime=None):
+    directory = os.path.dirname(file_name)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    file_fd = open(file_name, 'wb')
+    file_fd.write(data)
+    file_fd.close()
+    if mtime is not None:
+        os.utime(file_name, (mtime, mtime))
+
+
+def _read(file_name):
+    file_fd = open(file_name, 'rb')
+    data = file_fd.read()
+    file_fd.close()
+    return data
+
+
+def _actions(plan):
+    return sorted((action.action, action.path) for action in plan)
+
+
+class TestSync(unittest.TestCase):
+    """ Push and pull against the in-process DavServer
+    """
+    def setUp(self):
+        self.server_root = tempfile.mkdtemp()
+        self.local_dir = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.server_root, 'mirror'))
+        self.server = DavServer(self.server_root).start()
+        settings = dict(username='', password='', realm='', port=0,
+                        host=self.server.url, path='/')
+        self.connection_obj = python_webdav.connection.Connection(settings)
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.server_root)
+        shutil.rmtree(self.local_dir)
+
+    def _sync(self, **kwargs):
+        return sync.Sync(self.connection_obj, self.local_dir, 'mirror',
+                         **kwargs)
+
+    def _puts(self):
+        return sorted(path for method, path, headers in self.server.requests
+                      if method == 'PUT')
+
+    def _remote(self, path):
+        return os.path.join(self.server_root, 'mirror', path)
+
+    def test_push(self):
+        _write(os.path.join(self.local_dir, 'a.txt'), 'aaa')
+        _write(os.path.join(self.local_dir, 'sub', 'b.txt'), 'bbb')
+        plan = self._sync().push()
+        self.assertEquals(_actions(plan),
+                          [('mkdir-remote', 'sub'), ('upload', 'a.txt'),
+                           ('upload', 'sub/b.txt')])
+        self.assertTrue(all(action.done for action in plan))
+        self.assertEquals(_read(self._remote('sub/b.txt')), 'bbb')
+
+        # Nothing has changed, so nothing is sent
+        self.assertEquals(self._sync().push(), [])
+        self.assertEquals(len(self._puts()), 2)
+
+    def test_push_changed_only(self):
+        _write(os.path.join(self.local_dir, 'a.txt'), 'aaa')
+        _write(os.path.join(self.local_dir, 'b.txt'), 'bbb')
+        self._sync().push()
+        _write(os.path.join(self.local_dir, 'b.txt'), 'BBB',
+               mtime=time.time() + 10)
+        plan = self._sync().push()
+        self.assertEquals(_actions(plan), [('upload', 'b.txt')])
+        self.assertEquals(plan[0].reason, 'changed locally')
+        self.assertEquals(_read(self._remote('b.txt')), 'BBB')
+
+    def test_pull_after_push(self):
+        hour_ago = time.time() - 3600
+        _write(os.path.join(self.local_dir, 'a.txt'), 'aaa', mtime=hour_ago)
+        _write(os.path.join(self.local_dir, 'b.txt'), 'bbb', mtime=hour_ago)
+        self._sync().push()
+        # The ETags were asked for after the PUTs, which don't carry them
+        manifest = self._sync().manifest
+        self.assertTrue(all(manifest.get(path).etag
+                            for path in ('a.txt', 'b.txt')))
+        self.assertEquals(self._sync().pull(dry_run=True), [])
+
+        # A change made on the server afterwards is still seen
+        _write(self._remote('b.txt'), 'BBB')
+        self.assertEquals(_actions(self._sync().pull(dry_run=True)),
+                          [('download', 'b.txt')])
+
+    def test_push_to_missing_collection(self):
+        shutil.rmtree(self._remote(''))
+        _write(os.path.join(self.local_dir, 'a.txt'), 'aaa')
+        plan = self._sync().push()
+        self.assertEquals(_actions(plan), [('mkdir-remote', ''),
+                                           ('upload', 'a.txt')])
+        self.assertEquals(_read(self._remote('a.txt')), 'aaa')
+
+    def test_push_delete(self):
+        _write(os.path.join(self.local_dir, 'a.txt'), 'aaa')
+        _write(self._remote('old.txt'), 'old')
+        _write(self._remote('olddir/x.txt'), 'x')
+        self.assertEquals(_actions(self._sync().push(dry_run=True)),
+                          [('upload', 'a.txt')])
+        plan = self._sync(delete=True).push(dry_run=True)
+        self.assertEquals(_actions(plan),
+                          [('delete-remote', 'old.txt'),
+                           ('delete-remote', 'olddir'),
+                           ('upload', 'a.txt')])
+        # A dry run changes nothing
+        self.assertEquals(self._puts(), [])
+        self.assertTrue(os.path.exists(self._remote('old.txt')))
+
+        self._sync(delete=True).execute(plan)
+        self.assertFalse(os.path.exists(self._remote('old.txt')))
+        self.assertFalse(os.path.exists(self._remote('olddir')))
+
+    def test_pull(self):
+        _write(self._remote('a.txt'), 'aaa', mtime=1000000000)
+        _write(self._remote('sub/b.txt'), 'bbb')
+        plan = self._sync().pull()
+        self.assertEquals(_actions(plan),
+                          [('download', 'a.txt'), ('download', 'sub/b.txt'),
+                           ('mkdir-local', 'sub')])
+        self.assertEquals(_read(os.path.join(self.local_dir, 'sub',
+                                             'b.txt')), 'bbb')
+        # The local copy takes the server's modification time
+        self.assertEquals(
+            os.path.getmtime(os.path.join(self.local_dir, 'a.txt')),
+            1000000000)
+        self.assertEquals(self._sync().pull(), [])
+
+    def test_pull_remote_change_same_size(self):
+        _write(self._remote('a.txt'), 'aaa', mtime=1000000000)
+        self._sync().pull()
+        # Same size and an older time, but a different ETag
+        _write(self._remote('a.txt'), 'AAA', mtime=900000000)
+        plan = self._sync().pull()
+        self.assertEquals(_actions(plan), [('download', 'a.txt')])
+        self.assertEquals(plan[0].reason, 'changed remotely')
+        self.assertEquals(_read(os.path.join(self.local_dir, 'a.txt')),
+                          'AAA')
+        # Without the manifest the change can't be seen
+        _write(self._remote('a.txt'), 'aaA', mtime=800000000)
+        self.assertEquals(self._sync(use_manifest=False).pull(), [])
+
+    def test_pull_delete(self):
+        _write(self._remote('a.txt'), 'aaa')
+        _write(os.path.join(self.local_dir, 'extra.txt'), 'extra')
+        plan = self._sync(delete=True).pull()
+        self.assertEquals(_actions(plan), [('delete-local', 'extra.txt'),
+                                           ('download', 'a.txt')])
+        self.assertEquals(sorted(os.listdir(self.local_dir)),
+                          [sync.MANIFEST_NAME, 'a.txt'])
+
+    def test_failures_are_recorded(self):
+        _write(os.path.join(self.local_dir, 'a.txt'), 'aaa')
+        plan = self._sync().plan_push()
+        shutil.rmtree(self._remote(''))
+        # The collection has gone, so the upload fails
+        self._sync().execute(plan)
+        self.assertFalse(plan[0].done)
+        self.assertTrue(plan[0].error is not None)
+        self.assertTrue('FAILED' in sync.format_plan(plan))
@@ -164,6 +164,83 @@ class FileWrapperTest(unittest.TestCase):
         self.assertEqual(test_callback_obj.percent, 100)
 
 
+class ChunkedReaderTest(unittest.TestCase):
+    def setUp(self):
+        fd1 = open("thing.txt", "w")
+        fd1.write("Hello World!")
+        fd1.close()
+
+    def tearDown(self):
+        if os.path.exists("thing.txt"):
+            os.remove("thing.txt")
+
+    def test_file_length(self):
+        fd1 = open("thing.txt", "rb")
+        fd1.read(6)
+        reader = fw.ChunkedReader(fd1)
+        fd1.close()
+        self.assertEquals(len(reader), 6)
+
+    def test_iterates_file_in_chunks(self):
+        fd1 = open("thing.txt", "rb")
+        reader = fw.ChunkedReader(fd1, chunk_size=5)
+        chunks = list(reader)
+        fd1.close()
+        self.assertEquals(chunks, ['Hello', ' Worl', 'd!'])
+
+    def test_stops_at_length_of_file_wrapper(self):
+        """ A FileWrapper rewinds at EOF, make sure it is only read once
+        """
+        fd1 = fw.FileWrapper("thing.txt", "rb")
+        reader = fw.ChunkedReader(fd1, chunk_size=100)
+        chunks = list(reader)
+        fd1.close()
+        self.assertEquals(chunks, ['Hello World!'])
+
+    def test_iterable_has_no_length(self):
+        reader = fw.ChunkedReader(iter(['Hel', 'lo', ' World!']))
+        self.assertEquals(reader.length, None)
+        self.assertRaises(TypeError, len, reader)
+
+    def test_iterable_rechunked(self):
+        reader = fw.ChunkedReader(iter(['Hel', 'lo', ' World!']),
+                                  chunk_size=4)
+        self.assertEquals(list(reader), ['Hell', 'o Wo', 'rld!'])
+
+    def test_read_sizes(self):
+        reader = fw.ChunkedReader(['Hello World!'], chunk_size=4)
+        self.assertEquals(reader.read(2), 'He')
+        self.assertEquals(reader.read(), 'llo ')
+        self.assertEquals(reader.read(100), 'World!')
+        self.assertEquals(reader.read(), '')
+
+    def test_rewind(self):
+        fd1 = open("thing.txt", "rb")
+        fd1.read(6)
+        reader = fw.ChunkedReader(fd1, chunk_size=4)
+        self.assertEquals(list(reader), ['Worl', 'd!'])
+        self.assertEquals(reader.tell(), 6)
+        reader.seek(0)
+        self.assertEquals(reader.tell(), 0)
+        self.assertEquals(list(reader), ['Worl', 'd!'])
+        fd1.close()
+
+    def test_iterable_not_rewound(self):
+        reader = fw.ChunkedReader(iter(['Hel', 'lo']))
+        reader.read(3)
+        self.assertEquals(reader.tell(), 3)
+        self.assertRaises(IOError, reader.seek, 0)
+
+    def test_spool(self):
+        spool_fd = fw.spool(fw.ChunkedReader(iter(['Hel', 'lo'])))
+        try:
+            self.assertEquals(spool_fd.read(), 'Hello')
+            spool_fd.seek(0)
+            self.assertEquals(spool_fd.read(), 'Hello')
+        finally:
+            spool_fd.close()
+
+
 class DummyObj(object):
     def __init__(self, cb_percent=10):
         self.percent = 0